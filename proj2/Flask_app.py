@@ -5,24 +5,327 @@ import argparse
 import math
 import json
 import calendar
+import bisect
+import gzip
+import hashlib
 from io import BytesIO
 from flask import jsonify
 from sqlite3 import IntegrityError
 from datetime import timedelta, date, datetime
 from proj2.pdf_receipt import generate_order_receipt_pdf
+from proj2.catalog_cache import get_catalog
+from proj2.llm_toolkit import preload_from_env
+from proj2.menu_jobs import ensure_job_table, enqueue_job, get_job, RECOMMENDER_KINDS
+from proj2.meal_plan import ensure_meal_plan_table, load_plan, migrate_user, parse_menu_entries
 from werkzeug.security import check_password_hash, generate_password_hash
-from flask import Flask, render_template, url_for, redirect, request, session, send_file, abort
+from flask import Flask, render_template, url_for, redirect, request, session, send_file, abort, g, make_response
+from werkzeug.http import is_resource_modified
 
 # Use ONLY these helpers for DB access
-from proj2.sqlQueries import create_connection, close_connection, fetch_one, fetch_all, execute_query
+from proj2.sqlQueries import get_pool, resolve_db_profile, start_checkpoint_scheduler, fetch_one, fetch_all, execute_query, execute_returning_id
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key_here'
 
 db_file = os.path.join(os.path.dirname(__file__), 'CSC510_DB.db')
 
+## JSON API paging: default and maximum page size
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+## Fields the catalog API can return (selectable with ?fields=a,b,c)
+API_RESTAURANT_FIELDS = ("rtr_id", "name", "description", "phone", "email", "address", "city",
+                         "state", "zip", "hours", "status", "address_full")
+API_ITEM_FIELDS = ("itm_id", "rtr_id", "name", "price_cents", "calories", "allergens", "description")
+
+## JSON bodies smaller than this are sent uncompressed - gzip overhead outweighs the savings
+GZIP_MIN_BYTES = 1024
+
+## Menu-planning jobs: meals planned when none are requested, and the longest plan one job may cover
+MENU_JOB_MEALS = [1, 2, 3]
+MENU_JOB_MAX_DAYS = 31
+
+## Databases whose MenuJob and MealPlan tables have been created by this process
+_app_tables = set()
+
 # ---------------------- Helpers ----------------------
 
+def get_db():
+    """
+    Borrow a pooled connection for the lifetime of the current request.
+    Args:
+        None
+    Returns:
+        sqlite3.Connection: The request's connection; repeated calls return the same one.
+    """
+    if "db_conn" not in g:
+        g.db_pool = get_pool(db_file)
+        g.db_conn = g.db_pool.acquire()
+    return g.db_conn
+
+@app.teardown_appcontext
+def release_db(exc):
+    """
+    Hand the request's pooled connection (if any) back to its pool.
+    Args:
+        exc (BaseException | None): Unhandled exception from the request, if any.
+    Returns:
+        None
+    """
+    conn = g.pop("db_conn", None)
+    pool = g.pop("db_pool", None)
+    if conn is not None and pool is not None:
+        pool.release(conn)
+
+def start_db_maintenance():
+    """
+    Start this process's WAL checkpoint scheduler when the active database profile uses WAL.
+    Called once at import; pre-fork servers should call it again in each worker (e.g. from a
+    gunicorn post_fork hook), which is safe because schedulers are tracked per process.
+    Args:
+        None
+    Returns:
+        None
+    """
+    if str(resolve_db_profile().get("journal_mode", "")).upper() == "WAL":
+        start_checkpoint_scheduler(db_file)
+
+def start_llm_preload():
+    """
+    Load the menu-planning model at boot when PROJ2_PRELOAD_LLM is set, so the first planning
+    request does not wait for the weights. Workers that never plan menus leave it unset and never
+    import torch. Like start_db_maintenance(), pre-fork servers should call it in each worker.
+    Args:
+        None
+    Returns:
+        None
+    """
+    preload_from_env()
+
+def _etag_for(*parts) -> str:
+    """
+    Build a strong ETag value from JSON-serializable parts.
+    Args:
+        *parts (Any): Values the response body depends on.
+    Returns:
+        str: A hex digest that changes whenever any part changes.
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def _template_stamp(name: str) -> float:
+    """
+    Modification time of a template, so a redeploy with a changed page invalidates old ETags.
+    Args:
+        name (str): Template file name under templates/.
+    Returns:
+        float: The file's mtime, or 0.0 if it cannot be stat'ed.
+    """
+    try:
+        return os.path.getmtime(os.path.join(app.root_path, app.template_folder, name))
+    except OSError:
+        return 0.0
+
+def conditional_response(etag: str, render, last_modified=None):
+    """
+    Answer a GET with 304 Not Modified when the client's validators still match, otherwise
+    render the body. Either way the response carries the validators and a private, revalidate-
+    every-time Cache-Control (the pages are behind login, so shared caches must not store them).
+    Args:
+        etag (str): Strong ETag for the current representation.
+        render (Callable[[], Response | str | bytes]): Builds the full response; skipped on a 304.
+        last_modified (datetime | float | None): Last-Modified time, if known.
+    Returns:
+        Response: A 304 with no body, or the rendered response.
+    """
+    if isinstance(last_modified, (int, float)):
+        last_modified = datetime.fromtimestamp(int(last_modified)).astimezone()
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        resp = app.response_class(status=304)
+    else:
+        resp = make_response(render())
+    resp.set_etag(etag)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+def json_response(payload, status: int = 200):
+    """
+    Serialize a JSON payload compactly, gzip-compressing it when the client accepts gzip.
+    Args:
+        payload (Any): JSON-serializable response body.
+        status (int): HTTP status code.
+    Returns:
+        Response: application/json response, Content-Encoding: gzip when compressed.
+    """
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    resp = app.response_class(body, status=status, mimetype="application/json")
+    resp.vary.add("Accept-Encoding")
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.accept_encodings:
+        resp.set_data(gzip.compress(body, compresslevel=6))
+        resp.headers["Content-Encoding"] = "gzip"
+    return resp
+
+def _page_args(allowed_fields):
+    """
+    Parse ?cursor=, ?limit= and ?fields= for a paginated API endpoint.
+    Args:
+        allowed_fields (tuple[str]): Field names the endpoint can return.
+    Returns:
+        tuple: (cursor or None, limit, fields tuple).
+    Raises:
+        ValueError: If a parameter is malformed or names an unknown field.
+    """
+    cursor = request.args.get("cursor")
+    cursor = int(cursor) if cursor not in (None, "") else None
+    limit = int(request.args.get("limit", API_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, API_MAX_PAGE_SIZE)
+    fields = request.args.get("fields")
+    if not fields:
+        return cursor, limit, allowed_fields
+    fields = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in fields if f not in allowed_fields]
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}")
+    return cursor, limit, fields
+
+def _paginate(rows, keys, cursor, limit, fields):
+    """
+    Return one page of rows whose key is greater than the cursor.
+    Args:
+        rows (list[dict]): Rows sorted by key.
+        keys (list[int]): The sort key of each row, ascending (bisected for the cursor).
+        cursor (int | None): Key of the last row the client already has.
+        limit (int): Maximum rows in the page.
+        fields (tuple[str]): Fields to include in each row.
+    Returns:
+        dict: {"ok": True, "data": [...], "next_cursor": int | None}.
+    """
+    start = 0 if cursor is None else bisect.bisect_right(keys, cursor)
+    page = rows[start:start + limit]
+    more = start + limit < len(rows)
+    return {
+        "ok": True,
+        "data": [{f: row[f] for f in fields} for row in page],
+        "next_cursor": keys[start + limit - 1] if more else None,
+    }
+
+def _menu_job_params(data):
+    """
+    Validate the body of a menu-planning request.
+    Args:
+        data (Mapping): JSON body or form with optional date (YYYY-MM-DD), meal_numbers, number_of_days
+            and recommender ("llm" or "scoring").
+    Returns:
+        dict: update_menu arguments {"date", "meal_numbers", "number_of_days"}, plus "recommender" if given.
+    Raises:
+        ValueError: If a value is malformed or out of range.
+    """
+    day = data.get("date") or date.today().isoformat()
+    date.fromisoformat(day)
+    meals = data.get("meal_numbers") or MENU_JOB_MEALS
+    if isinstance(meals, str):
+        meals = meals.split(",")
+    meals = sorted({int(m) for m in meals})
+    if not set(meals) <= set(MENU_JOB_MEALS):
+        raise ValueError("meal_numbers must be 1 (breakfast), 2 (lunch) or 3 (dinner)")
+    days = int(data.get("number_of_days", 1))
+    if not 1 <= days <= MENU_JOB_MAX_DAYS:
+        raise ValueError(f"number_of_days must be between 1 and {MENU_JOB_MAX_DAYS}")
+    params = {"date": day, "meal_numbers": meals, "number_of_days": days}
+    recommender = data.get("recommender")
+    if recommender:
+        if recommender not in RECOMMENDER_KINDS:
+            raise ValueError(f"recommender must be one of {', '.join(RECOMMENDER_KINDS)}")
+        params["recommender"] = recommender
+    return params
+
+def _tables_conn():
+    """
+    The request's connection, with the MenuJob and MealPlan tables created on first use.
+    Args:
+        None
+    Returns:
+        sqlite3.Connection: The request's pooled connection.
+    """
+    conn = get_db()
+    if db_file not in _app_tables:
+        ensure_job_table(conn)
+        ensure_meal_plan_table(conn)
+        _app_tables.add(db_file)
+    return conn
+
+def _session_usr_id(conn):
+    """
+    The logged-in user's id, resolved by email for sessions that predate usr_id.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+    Returns:
+        int | None: The user id, or None if the user no longer exists.
+    """
+    if session.get("usr_id"):
+        return session["usr_id"]
+    row = fetch_one(conn, 'SELECT usr_id FROM "User" WHERE email = ?', (session.get("Email"),))
+    return row[0] if row else None
+
+def _address(a, c, s, z) -> str:
+    """
+    Safely join address parts that might be None/ints.
+    Args:
+        a (Any): Street address.
+        c (Any): City.
+        s (Any): State/region.
+        z (Any): Zip/postal code.
+    Returns:
+        str: A single formatted address string.
+    """
+    return ", ".join(str(p).strip() for p in (a, c, s, z) if p is not None and str(p).strip())
+
+def _api_catalog(catalog):
+    """
+    Build the API representation of a catalog snapshot (memoize with catalog.view).
+    Args:
+        catalog (CatalogSnapshot): The cached catalog.
+    Returns:
+        dict: "restaurants"/"restaurant_ids" sorted by rtr_id, and "items" mapping
+            rtr_id -> (in-stock item dicts, their itm_ids) sorted by itm_id.
+    """
+    restaurants = [{
+        "rtr_id": r["rtr_id"],
+        "name": r["name"],
+        "description": r["description"] or "",
+        "phone": r["phone"] or "",
+        "email": r["email"] or "",
+        "address": r["address"] or "",
+        "city": r["city"] or "",
+        "state": r["state"] or "",
+        "zip": r["zip"] if r["zip"] is not None else "",
+        "hours": r["hours"] or "",
+        "status": r["status"] or "",
+        "address_full": _address(r["address"], r["city"], r["state"], r["zip"]),
+    } for r in catalog.restaurants]
+    items = {}
+    for m in catalog.in_stock_items:
+        rows, keys = items.setdefault(m["rtr_id"], ([], []))
+        rows.append({
+            "itm_id":      m["itm_id"],
+            "rtr_id":      m["rtr_id"],
+            "name":        m["name"],
+            "price_cents": m["price"] or 0,
+            "calories":    m["calories"] or 0,
+            "allergens":   m["allergens"] or "",
+            "description": m["description"] or "",
+        })
+        keys.append(m["itm_id"])
+    return {
+        "restaurants": restaurants,
+        "restaurant_ids": [r["rtr_id"] for r in restaurants],
+        "items": items,
+    }
+
 def _money(x: float) -> float:
     """
     Safely round a numeric value to two decimal places.
@@ -57,19 +360,10 @@ def parse_generated_menu(gen_str):
     Returns:
         dict: Mapping 'YYYY-MM-DD' -> [{'itm_id': int, 'meal': int}, ...].
     """
-    if not gen_str:
-        return {}
-
-    # date, id, optional meal (1,2,3)
-    pairs = re.findall(r'\[\s*(\d{4}-\d{2}-\d{2})\s*,\s*([0-9]+)\s*(?:,\s*([123])\s*)?\]', gen_str)
     out = {}
-    for d, mid, meal in pairs:
-        try:
-            itm_id = int(mid)
-            meal_i = int(meal) if meal else 3  # default to Dinner for legacy entries
-            out.setdefault(d, []).append({'itm_id': itm_id, 'meal': meal_i})
-        except ValueError:
-            continue
+    # date, id, optional meal (1,2,3) - legacy entries without a meal default to Dinner
+    for d, itm_id, meal in parse_menu_entries(gen_str):
+        out.setdefault(d, []).append({'itm_id': itm_id, 'meal': meal})
     return out
 
 def palette_for_item_ids(item_ids):
@@ -102,20 +396,8 @@ def fetch_menu_items_by_ids(ids):
     """
     if not ids:
         return {}
-    conn = create_connection(db_file)
-    try:
-        qmarks = ",".join(["?"] * len(ids))
-        sql = f"""
-          SELECT m.itm_id, m.rtr_id, m.name, m.description, m.price, m.calories,
-                 m.allergens, r.name AS restaurant_name, r.address, r.city, r.state, r.zip,
-                 r.hours, r.phone
-          FROM MenuItem m
-          JOIN Restaurant r ON r.rtr_id = m.rtr_id
-          WHERE m.itm_id IN ({qmarks})
-        """
-        rows = fetch_all(conn, sql, tuple(ids))
-    finally:
-        close_connection(conn)
+    # Reload (if stale) on the request's own connection rather than borrowing a second one
+    catalog = get_catalog(db_file, get_db())
 
     def _addr(a, c, s, z) -> str:
         parts_raw = [a, c, s, z]
@@ -129,19 +411,23 @@ def fetch_menu_items_by_ids(ids):
         return ", ".join(parts)
 
     out = {}
-    for r in rows:
-        out[r[0]] = {
-            "itm_id": r[0],
-            "rtr_id": r[1],
-            "name": r[2],
-            "description": r[3],
-            "price": r[4],
-            "calories": r[5],
-            "allergens": r[6],
-            "restaurant_name": r[7],
-            "restaurant_address": _addr(r[8], r[9], r[10], r[11]),
-            "restaurant_hours": r[12] or "",
-            "restaurant_phone": r[13] or "",
+    for itm_id in ids:
+        m = catalog.items_by_id.get(itm_id)
+        r = catalog.restaurants_by_id.get(m["rtr_id"]) if m else None
+        if r is None:
+            continue
+        out[itm_id] = {
+            "itm_id": itm_id,
+            "rtr_id": m["rtr_id"],
+            "name": m["name"],
+            "description": m["description"],
+            "price": m["price"],
+            "calories": m["calories"],
+            "allergens": m["allergens"],
+            "restaurant_name": r["name"],
+            "restaurant_address": _addr(r["address"], r["city"], r["state"], r["zip"]),
+            "restaurant_hours": r["hours"] or "",
+            "restaurant_phone": r["phone"] or "",
         }
     return out
 
@@ -211,20 +497,22 @@ def index(year, month):
     if not year or not month:
         year, month = today.year, today.month
 
-    # Load current user's generated_menu
-    conn = create_connection(db_file)
-    try:
-        user = fetch_one(conn, 'SELECT * FROM "User" WHERE email = ?', (session.get("Email"),))
-    finally:
-        close_connection(conn)
+    # Load current user's meal plan - only this month's rows and today's
+    conn = _tables_conn()
+    user = fetch_one(conn, 'SELECT * FROM "User" WHERE email = ?', (session.get("Email"),))
 
     if not user:
         return redirect(url_for("logout"))
 
-    gen_str = user[9] if len(user) > 9 else ""
-    gen_map = parse_generated_menu(gen_str)
+    if len(user) > 9 and user[9]:
+        migrate_user(conn, user[0])
+    month_days = calendar.monthrange(year, month)[1]
+    gen_map = load_plan(conn, user[0], f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{month_days:02d}")
+    today_iso = f"{today.year:04d}-{today.month:02d}-{today.day:02d}"
+    if today_iso not in gen_map:
+        gen_map.update(load_plan(conn, user[0], today_iso, today_iso))
 
-    # All item ids referenced (for the whole plan)
+    # All item ids referenced (this month and today)
     all_item_ids = sorted({e['itm_id'] for entries in gen_map.values() for e in entries})
     items_by_id = fetch_menu_items_by_ids(all_item_ids)
 
@@ -232,7 +520,6 @@ def index(year, month):
     cells = build_calendar_cells(gen_map, year, month, items_by_id)
 
     # Build "today_menu" (Breakfast, Lunch, Dinner if present)
-    today_iso = f"{today.year:04d}-{today.month:02d}-{today.day:02d}"
     today_entries = sorted(gen_map.get(today_iso, []), key=lambda e: e.get('meal', 3))
     today_menu = []
     for e in today_entries:
@@ -277,11 +564,8 @@ def login():
         email = (request.form.get("email") or "").strip().lower()
         password = request.form.get("password") or ""
 
-        conn = create_connection(db_file)
-        try:
-            user = fetch_one(conn, 'SELECT * FROM "User" WHERE email = ?', (email,))
-        finally:
-            close_connection(conn)
+        conn = get_db()
+        user = fetch_one(conn, 'SELECT * FROM "User" WHERE email = ?', (email,))
 
         if user and check_password_hash(user[5], password):
             session["usr_id"] = user[0] 
@@ -348,7 +632,7 @@ def register():
         if len(digits_only) < 7:
             return render_template('register.html', error="Please enter a valid phone number")
 
-        conn = create_connection(db_file)
+        conn = get_db()
         try:
             exists = fetch_one(conn, 'SELECT 1 FROM "User" WHERE email = ?', (email,))
             if exists:
@@ -369,8 +653,6 @@ def register():
             )
         except IntegrityError:
             return render_template('register.html', error="Email already registered")
-        finally:
-            close_connection(conn)
 
         return redirect(url_for('login'))
 
@@ -414,62 +696,59 @@ def profile():
         except Exception:
             return ""
 
-    conn = create_connection(db_file)
-    try:
-        row = fetch_one(conn, 'SELECT usr_id,first_name,last_name,email,phone,password_HS,wallet,preferences,allergies FROM "User" WHERE email = ?', (email,))
-        if not row:
-            return redirect(url_for('logout'))
+    conn = get_db()
+    row = fetch_one(conn, 'SELECT usr_id,first_name,last_name,email,phone,password_HS,wallet,preferences,allergies FROM "User" WHERE email = ?', (email,))
+    if not row:
+        return redirect(url_for('logout'))
 
-        user = {
-            "usr_id":        row[0],
-            "first_name":    row[1],
-            "last_name":     row[2],
-            "email":         row[3],
-            "phone":         row[4],
-            "password_HS":   row[5],
-            "wallet":        (row[6] or 0) / 100.0,
-            "preferences":   row[7] or "",
-            "allergies":     row[8] or "",
-        }
+    user = {
+        "usr_id":        row[0],
+        "first_name":    row[1],
+        "last_name":     row[2],
+        "email":         row[3],
+        "phone":         row[4],
+        "password_HS":   row[5],
+        "wallet":        (row[6] or 0) / 100.0,
+        "preferences":   row[7] or "",
+        "allergies":     row[8] or "",
+    }
 
-        session['usr_id'] = user["usr_id"]
-
-        # Pull orders for this user; details is JSON we will parse
-        order_rows = fetch_all(
-            conn,
-            '''
-            SELECT o.ord_id, o.details, o.status, r.name
-            FROM "Order" o
-            JOIN "Restaurant" r ON o.rtr_id = r.rtr_id
-            WHERE o.usr_id = ?
-            ORDER BY o.ord_id DESC
-            ''',
-            (user["usr_id"],)
-        )
+    session['usr_id'] = user["usr_id"]
+
+    # Pull orders for this user; details is JSON we will parse
+    order_rows = fetch_all(
+        conn,
+        '''
+        SELECT o.ord_id, o.details, o.status, r.name
+        FROM "Order" o
+        JOIN "Restaurant" r ON o.rtr_id = r.rtr_id
+        WHERE o.usr_id = ?
+        ORDER BY o.ord_id DESC
+        ''',
+        (user["usr_id"],)
+    )
 
-        orders = []
-        for ord_id, details, status, r_name in order_rows:
-            placed = ""
-            total = ""
-            if details:
-                try:
-                    j = json.loads(details)
-                    placed = _fmt_date(j.get("placed_at") or j.get("time"))
-                    charges = j.get("charges") or {}
-                    total_val = charges.get("total") or charges.get("grand_total") or charges.get("amount")
-                    total = _fmt_total(total_val) if total_val is not None else ""
-                except Exception:
-                    pass
-
-            orders.append({
-                "id": ord_id,
-                "date": placed,
-                "status": status or "",
-                "restaurant": r_name,
-                "total": total
-            })
-    finally:
-        close_connection(conn)
+    orders = []
+    for ord_id, details, status, r_name in order_rows:
+        placed = ""
+        total = ""
+        if details:
+            try:
+                j = json.loads(details)
+                placed = _fmt_date(j.get("placed_at") or j.get("time"))
+                charges = j.get("charges") or {}
+                total_val = charges.get("total") or charges.get("grand_total") or charges.get("amount")
+                total = _fmt_total(total_val) if total_val is not None else ""
+            except Exception:
+                pass
+
+        orders.append({
+            "id": ord_id,
+            "date": placed,
+            "status": status or "",
+            "restaurant": r_name,
+            "total": total
+        })
 
     pw_updated = request.args.get('pw_updated')
     pw_error   = request.args.get('pw_error')
@@ -499,14 +778,11 @@ def edit_profile():
     if not usr_id:
         return redirect(url_for('logout'))
 
-    conn = create_connection(db_file)
-    try:
-        row = fetch_one(conn, '''
-            SELECT usr_id, first_name, last_name, email, phone, wallet, preferences, allergies
-            FROM "User" WHERE usr_id = ?
-        ''', (usr_id,))
-    finally:
-        close_connection(conn)
+    conn = get_db()
+    row = fetch_one(conn, '''
+        SELECT usr_id, first_name, last_name, email, phone, wallet, preferences, allergies
+        FROM "User" WHERE usr_id = ?
+    ''', (usr_id,))
 
     if not row:
         return redirect(url_for('logout'))
@@ -530,15 +806,12 @@ def edit_profile():
         new_prefs = request.form.get('preferences') or user['preferences']
         new_allergies = request.form.get('allergies') or user['allergies']
 
-        conn = create_connection(db_file)
-        try:
-            execute_query(conn, '''
-                UPDATE "User"
-                SET phone = ?, preferences = ?, allergies = ?
-                WHERE usr_id = ?
-            ''', (new_phone, new_prefs, new_allergies, usr_id))
-        finally:
-            close_connection(conn)
+        conn = get_db()
+        execute_query(conn, '''
+            UPDATE "User"
+            SET phone = ?, preferences = ?, allergies = ?
+            WHERE usr_id = ?
+        ''', (new_phone, new_prefs, new_allergies, usr_id))
 
         # Refresh session values
         session['Phone'] = new_phone
@@ -568,15 +841,12 @@ def change_password():
         email = session.get('Email')
         if not email:
             return redirect(url_for('logout'))
-        conn = create_connection(db_file)
-        try:
-            row = fetch_one(conn, 'SELECT usr_id FROM "User" WHERE email = ?', (email,))
-            if not row:
-                return redirect(url_for('logout'))
-            usr_id = row[0]
-            session['usr_id'] = usr_id
-        finally:
-            close_connection(conn)
+        conn = get_db()
+        row = fetch_one(conn, 'SELECT usr_id FROM "User" WHERE email = ?', (email,))
+        if not row:
+            return redirect(url_for('logout'))
+        usr_id = row[0]
+        session['usr_id'] = usr_id
 
     # Read form fields
     current_password = (request.form.get('current_password') or '').strip()
@@ -594,23 +864,20 @@ def change_password():
         return redirect(url_for('profile', pw_error='same_as_current'))
 
     # Verify current hash & update to new hash
-    conn = create_connection(db_file)
-    try:
-        row = fetch_one(conn, 'SELECT password_HS FROM "User" WHERE usr_id = ?', (usr_id,))
-        if not row:
-            return redirect(url_for('logout'))
+    conn = get_db()
+    row = fetch_one(conn, 'SELECT password_HS FROM "User" WHERE usr_id = ?', (usr_id,))
+    if not row:
+        return redirect(url_for('logout'))
 
-        stored_hash = row[0]
-        if not check_password_hash(stored_hash, current_password):
-            # wrong current password
-            return redirect(url_for('profile', pw_error='incorrect_current'))
+    stored_hash = row[0]
+    if not check_password_hash(stored_hash, current_password):
+        # wrong current password
+        return redirect(url_for('profile', pw_error='incorrect_current'))
 
-        # All good → update
-        new_hash = generate_password_hash(new_password)
-        execute_query(conn, 'UPDATE "User" SET password_HS = ? WHERE usr_id = ?', (new_hash, usr_id))
+    # All good → update
+    new_hash = generate_password_hash(new_password)
+    execute_query(conn, 'UPDATE "User" SET password_HS = ? WHERE usr_id = ?', (new_hash, usr_id))
 
-    finally:
-        close_connection(conn)
 
     # Success
     return redirect(url_for('profile', pw_updated=1))
@@ -632,15 +899,12 @@ def order():
     # Resolve usr_id strictly
     usr_id = session.get("usr_id")
     if not usr_id:
-        conn = create_connection(db_file)
-        try:
-            row = fetch_one(conn, 'SELECT usr_id FROM "User" WHERE email = ?', (session.get('Email'),))
-            if not row:
-                return redirect(url_for("logout"))
-            usr_id = row[0]
-            session["usr_id"] = usr_id
-        finally:
-            close_connection(conn)
+        conn = get_db()
+        row = fetch_one(conn, 'SELECT usr_id FROM "User" WHERE email = ?', (session.get('Email'),))
+        if not row:
+            return redirect(url_for("logout"))
+        usr_id = row[0]
+        session["usr_id"] = usr_id
 
     # ---- POST JSON: place a single order containing ALL items in the restaurant group ----
     if request.method == 'POST' and request.is_json:
@@ -666,17 +930,14 @@ def order():
         if not itm_ids:
             return jsonify({"ok": False, "error": "no_items"}), 400
 
-        conn = create_connection(db_file)
-        try:
-            qmarks = ",".join(["?"] * len(itm_ids))
-            rows = fetch_all(conn, f'''
-                SELECT m.itm_id, m.rtr_id, m.name, m.price, r.name
-                FROM "MenuItem" m
-                JOIN "Restaurant" r ON r.rtr_id = m.rtr_id
-                WHERE m.itm_id IN ({qmarks})
-            ''', tuple(itm_ids))
-        finally:
-            close_connection(conn)
+        conn = get_db()
+        qmarks = ",".join(["?"] * len(itm_ids))
+        rows = fetch_all(conn, f'''
+            SELECT m.itm_id, m.rtr_id, m.name, m.price, r.name
+            FROM "MenuItem" m
+            JOIN "Restaurant" r ON r.rtr_id = m.rtr_id
+            WHERE m.itm_id IN ({qmarks})
+        ''', tuple(itm_ids))
 
         # Validate that all items belong to the same restaurant
         if not rows:
@@ -736,16 +997,11 @@ def order():
         }
 
         # Insert the single order row with status "Ordered"
-        conn = create_connection(db_file)
-        try:
-            execute_query(conn, '''
-                INSERT INTO "Order" (rtr_id, usr_id, details, status)
-                VALUES (?, ?, ?, ?)
-            ''', (rtr_id, usr_id, json.dumps(details), "Ordered"))
-            row = fetch_one(conn, 'SELECT last_insert_rowid()')
-            new_ord_id = row[0] if row else None
-        finally:
-            close_connection(conn)
+        conn = get_db()
+        new_ord_id = execute_returning_id(conn, '''
+            INSERT INTO "Order" (rtr_id, usr_id, details, status)
+            VALUES (?, ?, ?, ?)
+        ''', (rtr_id, usr_id, json.dumps(details), "Ordered"))
 
         return jsonify({"ok": True, "ord_id": new_ord_id})
 
@@ -779,16 +1035,13 @@ def order():
     notes = (request.args.get("notes") or "").strip()
 
     # Look up item & restaurant strictly
-    conn = create_connection(db_file)
-    try:
-        mi = fetch_one(conn, '''
-            SELECT m.itm_id, m.rtr_id, m.name, m.price, r.name
-            FROM "MenuItem" m
-            JOIN "Restaurant" r ON r.rtr_id = m.rtr_id
-            WHERE m.itm_id = ?
-        ''', (itm_id,))
-    finally:
-        close_connection(conn)
+    conn = get_db()
+    mi = fetch_one(conn, '''
+        SELECT m.itm_id, m.rtr_id, m.name, m.price, r.name
+        FROM "MenuItem" m
+        JOIN "Restaurant" r ON r.rtr_id = m.rtr_id
+        WHERE m.itm_id = ?
+    ''', (itm_id,))
     if not mi:
         return redirect(url_for("orders"))
 
@@ -826,16 +1079,11 @@ def order():
         "meal": meal
     }
 
-    conn = create_connection(db_file)
-    try:
-        execute_query(conn, '''
-            INSERT INTO "Order" (rtr_id, usr_id, details, status)
-            VALUES (?, ?, ?, ?)
-        ''', (rtr_id, usr_id, json.dumps(details), "Ordered"))
-        row = fetch_one(conn, 'SELECT last_insert_rowid()')
-        new_ord_id = row[0] if row else None
-    finally:
-        close_connection(conn)
+    conn = get_db()
+    new_ord_id = execute_returning_id(conn, '''
+        INSERT INTO "Order" (rtr_id, usr_id, details, status)
+        VALUES (?, ?, ?, ?)
+    ''', (rtr_id, usr_id, json.dumps(details), "Ordered"))
 
     return redirect(url_for("profile") + (f"?ordered={new_ord_id}" if new_ord_id else ""))
 
@@ -843,70 +1091,44 @@ def order():
 @app.route('/orders')
 def orders():
     """
-    List restaurants and in-stock menu items for browsing.
+    Order page: restaurants are rendered inline, menu items are fetched per restaurant from
+    /api/restaurants/<rtr_id>/items when one is selected.
     Args:
         None
     Returns:
-        Response: HTML page showing restaurants and items (requires login).
+        Response: HTML page listing restaurants (requires login).
     """
     if session.get('Username') is None:
         return redirect(url_for('login'))
 
-    conn = create_connection(db_file)
-    try:
-        # Pull address fields too
-        restaurants = fetch_all(conn, 'SELECT rtr_id, name, address, city, state, zip FROM "Restaurant"')
-        menu_items = fetch_all(conn, '''
-            SELECT itm_id, rtr_id, name, price, calories, allergens, description
-            FROM "MenuItem"
-            WHERE instock IS NULL OR instock = 1
-        ''')
-    finally:
-        close_connection(conn)
-
-    def _addr(a, c, s, z) -> str:
+    def _build(catalog):
         """
-        Safely join address parts that might be None/ints.
+        Build the restaurant dict list rendered by orders.html.
         Args:
-            a (Any): Street address.
-            c (Any): City.
-            s (Any): State/region.
-            z (Any): Zip/postal code.
+            catalog (CatalogSnapshot): The cached catalog.
         Returns:
-            str: A single formatted address string.
+            list[dict]: Restaurants with their address fields.
         """
-        parts_raw = [a, c, s, z]
-        parts = []
-        for p in parts_raw:
-            if p is None:
-                continue
-            # Coerce to string and strip
-            sp = str(p).strip()
-            if sp:
-                parts.append(sp)
-        return ", ".join(parts)
-
-    rest_list = [{
-        "rtr_id": r[0],
-        "name": r[1],
-        "address": r[2] or "",
-        "city": r[3] or "",
-        "state": r[4] or "",
-        "zip": r[5] if r[5] is not None else "",
-        "address_full": _addr(r[2], r[3], r[4], r[5]),
-    } for r in restaurants]
-
-    item_list = [{
-        "itm_id":      m[0],
-        "rtr_id":      m[1],
-        "name":        m[2],
-        "price_cents": m[3] or 0,
-        "calories":    m[4] or 0,
-        "allergens":   m[5] or "",
-        "description": m[6] or "",
-    } for m in menu_items]
-
-    return render_template("orders.html", restaurants=rest_list, items=item_list)
+        return [{
+            "rtr_id": r["rtr_id"],
+            "name": r["name"],
+            "address": r["address"] or "",
+            "city": r["city"] or "",
+            "state": r["state"] or "",
+            "zip": r["zip"] if r["zip"] is not None else "",
+            "address_full": _address(r["address"], r["city"], r["state"], r["zip"]),
+        } for r in catalog.restaurants]
+
+    # Served from the in-process catalog cache; rebuilt only when the catalog changes
+    catalog = get_catalog(db_file, get_db())
+    etag = catalog.view("orders_etag", lambda c: _etag_for("orders", c.restaurants))
+
+    def _render():
+        rest_list = catalog.view("orders_page", _build)
+        return render_template("orders.html", restaurants=rest_list)
+
+    return conditional_response(_etag_for(etag, _template_stamp("orders.html")), _render,
+                                catalog.modified_at)
 
 # Restaurants browse route
 @app.route('/restaurants')
@@ -921,54 +1143,158 @@ def restaurants():
     if session.get('Username') is None:
         return redirect(url_for('login'))
 
-    conn = create_connection(db_file)
+    def _build(catalog):
+        """
+        Build the restaurant/item dict lists rendered by restaurants.html.
+        Args:
+            catalog (CatalogSnapshot): The cached catalog.
+        Returns:
+            tuple: (rest_list, item_list).
+        """
+        def _addr(a, c, s, z) -> str:
+            parts_raw = [a, c, s, z]
+            parts = []
+            for p in parts_raw:
+                if p is None:
+                    continue
+                sp = str(p).strip()
+                if sp:
+                    parts.append(sp)
+            return ", ".join(parts)
+
+        rest_list = [{
+            "rtr_id": r["rtr_id"],
+            "name": r["name"],
+            "description": r["description"] or "",
+            "phone": r["phone"] or "",
+            "email": r["email"] or "",
+            "address": r["address"] or "",
+            "city": r["city"] or "",
+            "state": r["state"] or "",
+            "zip": r["zip"] if r["zip"] is not None else "",
+            "hours": r["hours"] or "",
+            "status": r["status"] or "",
+            "address_full": _addr(r["address"], r["city"], r["state"], r["zip"]),
+        } for r in catalog.restaurants]
+
+        item_list = [{
+            "itm_id":      m["itm_id"],
+            "rtr_id":      m["rtr_id"],
+            "name":        m["name"],
+            "price_cents": m["price"] or 0,
+            "calories":    m["calories"] or 0,
+            "allergens":   m["allergens"] or "",
+            "description": m["description"] or "",
+        } for m in catalog.in_stock_items]
+        return rest_list, item_list
+
+    # Served from the in-process catalog cache; rebuilt only when the catalog changes
+    catalog = get_catalog(db_file, get_db())
+    etag = catalog.view("restaurants_etag", lambda c: _etag_for("restaurants", c.restaurants, c.items))
+
+    def _render():
+        rest_list, item_list = catalog.view("restaurants_page", _build)
+        return render_template("restaurants.html", restaurants=rest_list, items=item_list)
+
+    return conditional_response(_etag_for(etag, _template_stamp("restaurants.html")), _render,
+                                catalog.modified_at)
+
+# Catalog JSON API
+@app.route('/api/restaurants')
+def api_restaurants():
+    """
+    Paginated restaurant list. Query: cursor (last rtr_id seen), limit, fields (comma-separated).
+    Args:
+        None
+    Returns:
+        Response: JSON {"ok", "data", "next_cursor"}; 400 on bad parameters, 401 if not logged in.
+    """
+    if session.get('Username') is None:
+        return json_response({"ok": False, "error": "login_required"}, 401)
     try:
-        restaurants = fetch_all(conn, 'SELECT rtr_id, name, description, phone, email, address, city, state, zip, hours, status FROM "Restaurant"')
-        menu_items = fetch_all(conn, '''
-            SELECT itm_id, rtr_id, name, price, calories, allergens, description
-            FROM "MenuItem"
-            WHERE instock IS NULL OR instock = 1
-        ''')
-    finally:
-        close_connection(conn)
-
-    def _addr(a, c, s, z) -> str:
-        parts_raw = [a, c, s, z]
-        parts = []
-        for p in parts_raw:
-            if p is None:
-                continue
-            sp = str(p).strip()
-            if sp:
-                parts.append(sp)
-        return ", ".join(parts)
-
-    rest_list = [{
-        "rtr_id": r[0],
-        "name": r[1],
-        "description": r[2] or "",
-        "phone": r[3] or "",
-        "email": r[4] or "",
-        "address": r[5] or "",
-        "city": r[6] or "",
-        "state": r[7] or "",
-        "zip": r[8] if r[8] is not None else "",
-        "hours": r[9] or "",
-        "status": r[10] or "",
-        "address_full": _addr(r[5], r[6], r[7], r[8]),
-    } for r in restaurants]
-
-    item_list = [{
-        "itm_id":      m[0],
-        "rtr_id":      m[1],
-        "name":        m[2],
-        "price_cents": m[3] or 0,
-        "calories":    m[4] or 0,
-        "allergens":   m[5] or "",
-        "description": m[6] or "",
-    } for m in menu_items]
-
-    return render_template("restaurants.html", restaurants=rest_list, items=item_list)
+        cursor, limit, fields = _page_args(API_RESTAURANT_FIELDS)
+    except ValueError as e:
+        return json_response({"ok": False, "error": "invalid_input", "detail": str(e)}, 400)
+
+    catalog = get_catalog(db_file, get_db())
+    api = catalog.view("api", _api_catalog)
+    etag = _etag_for(catalog.view("api_etag", lambda c: _etag_for("api", c.restaurants, c.items)),
+                     request.full_path, "gzip" in request.accept_encodings)
+    return conditional_response(etag, lambda: json_response(
+        _paginate(api["restaurants"], api["restaurant_ids"], cursor, limit, fields)))
+
+@app.route('/api/restaurants/<int:rtr_id>/items')
+def api_restaurant_items(rtr_id: int):
+    """
+    Paginated in-stock menu items of one restaurant. Query: cursor (last itm_id seen), limit, fields.
+    Args:
+        rtr_id (int): The restaurant identifier in the path.
+    Returns:
+        Response: JSON {"ok", "data", "next_cursor"}; 400 on bad parameters, 401 if not
+            logged in, 404 for an unknown restaurant.
+    """
+    if session.get('Username') is None:
+        return json_response({"ok": False, "error": "login_required"}, 401)
+    try:
+        cursor, limit, fields = _page_args(API_ITEM_FIELDS)
+    except ValueError as e:
+        return json_response({"ok": False, "error": "invalid_input", "detail": str(e)}, 400)
+
+    catalog = get_catalog(db_file, get_db())
+    if rtr_id not in catalog.restaurants_by_id:
+        return json_response({"ok": False, "error": "restaurant_not_found"}, 404)
+    rows, keys = catalog.view("api", _api_catalog)["items"].get(rtr_id, ([], []))
+    etag = _etag_for(catalog.view("api_etag", lambda c: _etag_for("api", c.restaurants, c.items)),
+                     request.full_path, "gzip" in request.accept_encodings)
+    return conditional_response(etag, lambda: json_response(
+        _paginate(rows, keys, cursor, limit, fields)))
+
+# Menu planning jobs (run by python -m proj2.menu_worker)
+@app.route('/api/menu/jobs', methods=['POST'])
+def api_enqueue_menu_job():
+    """
+    Queue planning of the logged-in user's menu. Body (JSON or form): date, meal_numbers, number_of_days.
+    Args:
+        None
+    Returns:
+        Response: 202 JSON {"ok", "data": job} with a Location to poll; 400 on bad input,
+            401 if not logged in.
+    """
+    if session.get('Username') is None:
+        return json_response({"ok": False, "error": "login_required"}, 401)
+    try:
+        params = _menu_job_params(request.get_json(silent=True) or request.form)
+    except (TypeError, ValueError) as e:
+        return json_response({"ok": False, "error": "invalid_input", "detail": str(e)}, 400)
+
+    conn = _tables_conn()
+    usr_id = _session_usr_id(conn)
+    if usr_id is None:
+        return json_response({"ok": False, "error": "login_required"}, 401)
+    job_id = enqueue_job(conn, usr_id, params)
+    if job_id is None:
+        return json_response({"ok": False, "error": "db_error"}, 500)
+    resp = json_response({"ok": True, "data": get_job(conn, job_id)}, 202)
+    resp.headers["Location"] = url_for("api_menu_job", job_id=job_id)
+    return resp
+
+@app.route('/api/menu/jobs/<int:job_id>')
+def api_menu_job(job_id: int):
+    """
+    Poll a menu-planning job of the logged-in user.
+    Args:
+        job_id (int): The job identifier in the path.
+    Returns:
+        Response: JSON {"ok", "data": job} with status queued, running, done or failed;
+            401 if not logged in, 404 for an unknown job or one of another user.
+    """
+    if session.get('Username') is None:
+        return json_response({"ok": False, "error": "login_required"}, 401)
+    conn = _tables_conn()
+    job = get_job(conn, job_id)
+    if job is None or job["usr_id"] != _session_usr_id(conn):
+        return json_response({"ok": False, "error": "job_not_found"}, 404)
+    return json_response({"ok": True, "data": job})
 
 # Order receipt PDF route
 @app.route('/orders/<int:ord_id>/receipt.pdf')
@@ -985,30 +1311,34 @@ def order_receipt(ord_id: int):
         return redirect(url_for('login'))
 
     # Ensure the order belongs to the logged-in user
-    conn = create_connection(db_file)
-    try:
-        row = fetch_one(conn, 'SELECT usr_id FROM "Order" WHERE ord_id = ?', (ord_id,))
-        if not row:
-            abort(404)
-        if session.get('usr_id') and row[0] != session['usr_id']:
+    conn = get_db()
+    row = fetch_one(conn, 'SELECT usr_id, rtr_id, details, status FROM "Order" WHERE ord_id = ?', (ord_id,))
+    if not row:
+        abort(404)
+    if session.get('usr_id') and row[0] != session['usr_id']:
+        abort(403)
+    # If usr_id not in session (older sessions), compare via email
+    if not session.get('usr_id'):
+        # Resolve current user's usr_id by email
+        urow = fetch_one(conn, 'SELECT usr_id FROM "User" WHERE email = ?', (session.get('Email'),))
+        if not urow or urow[0] != row[0]:
             abort(403)
-        # If usr_id not in session (older sessions), compare via email
-        if not session.get('usr_id'):
-            # Resolve current user's usr_id by email
-            urow = fetch_one(conn, 'SELECT usr_id FROM "User" WHERE email = ?', (session.get('Email'),))
-            if not urow or urow[0] != row[0]:
-                abort(403)
 
+    # The receipt shows the order row plus the user's and restaurant's contact details
+    urow = fetch_one(conn, 'SELECT first_name, last_name, email, phone FROM "User" WHERE usr_id = ?', (row[0],))
+    rrow = fetch_one(conn, 'SELECT name, address, city, state, zip, phone FROM "Restaurant" WHERE rtr_id = ?', (row[1],))
+    etag = _etag_for("receipt", ord_id, row, urow, rrow)
+
+    def _render():
         pdf_bytes = generate_order_receipt_pdf(db_file, ord_id)  # returns bytes
-    finally:
-        close_connection(conn)
-
-    return send_file(
-        BytesIO(pdf_bytes),
-        mimetype='application/pdf',
-        as_attachment=True,
-        download_name=f'order_{ord_id}_receipt.pdf'
-    )
+        return send_file(
+            BytesIO(pdf_bytes),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f'order_{ord_id}_receipt.pdf'
+        )
+
+    return conditional_response(etag, _render)
 
 # Database viewer route (uses helpers only)
 @app.route('/db')
@@ -1023,7 +1353,7 @@ def db_view():
     if session.get('Username') is None:
         return redirect(url_for('login'))
 
-    allowed_tables = {'User', 'Restaurant', 'MenuItem', 'Order', 'Review'}
+    allowed_tables = {'User', 'Restaurant', 'MenuItem', 'Order', 'Review', 'MealPlan'}
     table = request.args.get('t', 'User')
     if table not in allowed_tables:
         table = 'User'
@@ -1035,21 +1365,18 @@ def db_view():
     page = max(page, 1)
     per_page = 10
 
-    conn = create_connection(db_file)
-    try:
-        total_row = fetch_one(conn, f'SELECT COUNT(*) FROM "{table}"')
-        total = (total_row[0] if total_row else 0) or 0
+    conn = _tables_conn()
+    total_row = fetch_one(conn, f'SELECT COUNT(*) FROM "{table}"')
+    total = (total_row[0] if total_row else 0) or 0
 
-        pages = max(math.ceil(total / per_page), 1)
-        page = min(page, pages)
-        offset = (page - 1) * per_page
+    pages = max(math.ceil(total / per_page), 1)
+    page = min(page, pages)
+    offset = (page - 1) * per_page
 
-        col_rows = fetch_all(conn, f'PRAGMA table_info("{table}")')
-        columns = [r[1] for r in col_rows] if col_rows else []
+    col_rows = fetch_all(conn, f'PRAGMA table_info("{table}")')
+    columns = [r[1] for r in col_rows] if col_rows else []
 
-        rows = fetch_all(conn, f'SELECT * FROM "{table}" LIMIT ? OFFSET ?', (per_page, offset))
-    finally:
-        close_connection(conn)
+    rows = fetch_all(conn, f'SELECT * FROM "{table}" LIMIT ? OFFSET ?', (per_page, offset))
 
     start = 0 if total == 0 else offset + 1
     end = min(offset + per_page, total)
@@ -1067,6 +1394,9 @@ def db_view():
         end=end,
     )
 
+start_db_maintenance()
+start_llm_preload()
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Flask App for Meal Planner")
     parser.add_argument('--host', type=str, default='127.0.0.1', help='Host to run the Flask app on')
@@ -0,0 +1,109 @@
+from typing import Iterable, List
+
+import numpy as np
+
+## Masks are stored as uint64 while the vocabulary fits in 64 bits, as Python ints (object arrays) beyond that
+MASK_BITS = 64
+
+
+def split_allergens(value) -> List[str]:
+    """
+    Splits a comma-separated allergen string into normalized allergen names
+
+    Args:
+        value (str | None): e.g. "Gluten, Soy" - None, NaN and empty strings mean no allergens
+
+    Returns:
+        List[str]: The stripped, case-folded allergen names
+    """
+    if not isinstance(value, str):
+        return []
+    return [name.strip().casefold() for name in value.split(",") if name.strip()]
+
+
+class AllergenVocabulary:
+    """
+    Assigns every known allergen a bit so an item's allergens can be stored as one integer mask
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        """
+        Initializes the vocabulary with the given allergen names
+
+        Args:
+            names (Iterable[str]): Allergen names to assign bits to, in order
+        """
+        self.bits = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    def add(self, name: str) -> int:
+        """
+        Assigns the next free bit to an allergen (or returns its existing bit)
+
+        Args:
+            name (str): The allergen name
+
+        Returns:
+            int: The single-bit mask for the allergen
+        """
+        key = name.strip().casefold()
+        if key not in self.bits:
+            self.bits[key] = 1 << len(self.bits)
+        return self.bits[key]
+
+    def mask(self, allergens) -> int:
+        """
+        Builds the mask for a comma-separated allergen string without growing the vocabulary.
+        Allergens no item contains are ignored - they cannot exclude anything.
+
+        Args:
+            allergens (str | None): e.g. a user's allergies, "Peanuts,Shellfish"
+
+        Returns:
+            int: The OR of the bits of every known allergen in the string
+        """
+        result = 0
+        for name in split_allergens(allergens):
+            result |= self.bits.get(name, 0)
+        return result
+
+    def encode(self, values: Iterable) -> np.ndarray:
+        """
+        Builds one mask per allergen string, adding unseen allergens to the vocabulary
+
+        Args:
+            values (Iterable[str | None]): Allergen strings, e.g. the MenuItem.allergens column
+
+        Returns:
+            np.ndarray: One mask per value (uint64, or object if the vocabulary outgrows MASK_BITS)
+        """
+        masks = []
+        for value in values:
+            mask = 0
+            for name in split_allergens(value):
+                mask |= self.add(name)
+            masks.append(mask)
+        dtype = np.uint64 if len(self.bits) <= MASK_BITS else object
+        return np.array(masks, dtype=dtype)
+
+
+def allergen_free(masks: np.ndarray, excluded: int) -> np.ndarray:
+    """
+    Vectorized check of which items contain none of the excluded allergens
+
+    Args:
+        masks (np.ndarray): Per-item masks from AllergenVocabulary.encode
+        excluded (int): Mask of the allergens to avoid, from AllergenVocabulary.mask
+
+    Returns:
+        np.ndarray: Boolean array, True where the item is safe
+    """
+    if not excluded:
+        return np.ones(len(masks), dtype=bool)
+    if masks.dtype != object:
+        excluded = np.uint64(excluded)
+    return (masks & excluded) == 0
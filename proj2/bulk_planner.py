@@ -0,0 +1,241 @@
+"""
+Bulk menu planner for nightly regeneration: shards users across a process pool, each process holding
+one loaded model and one catalog snapshot, and writes the planned meals to MealPlan in batched transactions.
+
+    python -m proj2.bulk_planner --date 2025-11-03 --days 7 --workers 4
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple
+
+from proj2.sqlQueries import create_connection, close_connection, fetch_all, transaction
+from proj2.meal_plan import migrate_generated_menus, prune_meals, retention_start, save_meals
+
+db_file = os.path.join(os.path.dirname(__file__), 'CSC510_DB.db')
+
+## Users handed to a worker process at a time - large enough to fill GENERATE_BATCH_SIZE batches
+SHARD_SIZE = 16
+
+## Users whose planned meals are written per transaction
+COMMIT_EVERY = 64
+
+## The MenuGenerator of this pool process, created by _init_worker
+_generator = None
+
+
+def default_generator(db_path: str, recommender: str = "llm", memo: bool = False, memo_db: str = None, **options):
+    """
+    Creates the generator each pool process plans with
+
+    Args:
+        db_path (str): The database to read the catalog from
+        recommender (str): "llm" (MenuGenerator) or "scoring" (ScoringRecommender - no model, the
+            LLM options are ignored)
+        memo (bool): Reuse picks for identical meals (see RecommendationCache) within this process
+        memo_db (str): SQLite file to share those picks through, between processes and runs - implies memo
+        **options: Extra MenuGenerator arguments (tokens, precision, num_threads, constrained, ...)
+
+    Returns:
+        Recommender: A generator holding the process's shared model, or a ScoringRecommender
+    """
+    from proj2.menu_generation import MenuGenerator, ScoringRecommender
+    from proj2.recommendation_cache import RecommendationCache
+    if recommender == "scoring":
+        return ScoringRecommender(db_file=db_path)
+    if memo or memo_db:
+        options["memo"] = RecommendationCache(db_file=memo_db)
+    return MenuGenerator(db_file=db_path, **options)
+
+
+def _init_worker(factory, db_path: str, options: dict):
+    """
+    Pool initializer: loads the model and catalog once per process
+
+    Args:
+        factory (Callable): Builds the generator, see default_generator
+        db_path (str): The database to read the catalog from
+        options (dict): Keyword arguments for the factory
+    """
+    global _generator
+    _generator = factory(db_path, **options)
+
+
+def _plan_shard(users: List[tuple]) -> List[Tuple[int, list]]:
+    """
+    Plans the missing meals of one shard of users with this process's generator
+
+    Args:
+        users (List[tuple]): (usr_id, preferences, allergies, slots) per user - slots from missing_slots
+
+    Returns:
+        List[Tuple[int, list]]: (usr_id, [(date, meal_number, itm_id), ...]) for each user
+    """
+    picks = _generator.plan_many([{"preferences": preferences or "", "allergens": allergies or "", "slots": slots}
+                                  for _, preferences, allergies, slots in users])
+    return [(usr_id, [(day, meal_number, itm_id) for (day, _, meal_number), itm_id in zip(slots, itm_ids)])
+            for (usr_id, _, _, slots), itm_ids in zip(users, picks)]
+
+
+def write_meals(conn, results: List[Tuple[int, list]]) -> int:
+    """
+    Stores planned meals in one transaction. A slot that got a meal meanwhile (e.g. the user planned
+    it through the web app) keeps that meal.
+
+    Args:
+        conn (sqlite3.Connection): Active database connection
+        results (List[Tuple[int, list]]): (usr_id, [(date, meal_number, itm_id), ...]) per user
+
+    Returns:
+        int: The number of meals added
+    """
+    added = 0
+    with transaction(conn):
+        for usr_id, meals in results:
+            added += save_meals(conn, usr_id, meals)
+    return added
+
+
+def _missing_slots(conn, params: dict) -> List[tuple]:
+    """
+    Lists every user's unplanned slots with one MealPlan query for the whole date range
+
+    Args:
+        conn (sqlite3.Connection): Active database connection
+        params (dict): "date", "meal_numbers" and optionally "number_of_days"
+
+    Returns:
+        List[tuple]: (usr_id, preferences, allergies, slots) for each user with at least one missing meal
+    """
+    from proj2.menu_generation import missing_slots
+    days = params.get("number_of_days", 1)
+    last = (datetime.date.fromisoformat(params["date"]) + datetime.timedelta(days=days - 1)).isoformat()
+    planned = {}
+    for usr_id, day, meal in fetch_all(conn, 'SELECT usr_id, date, meal FROM "MealPlan" WHERE date >= ? AND date <= ?',
+                                       (params["date"], last)) or []:
+        planned.setdefault(usr_id, set()).add((day, meal))
+    users = []
+    for usr_id, preferences, allergies in fetch_all(conn, 'SELECT usr_id, preferences, allergies FROM "User" ORDER BY usr_id') or []:
+        slots = missing_slots(None, params["date"], params["meal_numbers"], days, planned.get(usr_id, set()))
+        if slots:
+            users.append((usr_id, preferences, allergies, slots))
+    return users
+
+
+def plan_all(db_path: str, params: dict, workers: int = None, shard_size: int = SHARD_SIZE,
+             commit_every: int = COMMIT_EVERY, factory=default_generator, options: dict = None,
+             report=print, retention_days: int = None) -> dict:
+    """
+    Plans the missing meals of every user (legacy generated_menu strings are migrated to MealPlan first)
+
+    Args:
+        db_path (str): Path to the SQLite database file
+        params (dict): Slots to plan for every user - "date", "meal_numbers", "number_of_days"
+        workers (int): Worker processes - os.cpu_count() if None, 0 plans in this process
+        shard_size (int): Users per task handed to a worker
+        commit_every (int): Users whose planned meals are written per transaction
+        factory (Callable): Builds each process's generator (must be picklable), see default_generator
+        options (dict): Keyword arguments for the factory - num_threads defaults to an equal share of
+            the CPUs per worker process so the processes do not oversubscribe the cores
+        report (Callable[[str], None]): Receives progress and throughput lines; None for silence
+        retention_days (int): First delete every meal dated more than this many days ago - None keeps them
+
+    Returns:
+        dict: "users" (with missing meals), "meals" (added), "skipped" (slot planned meanwhile),
+            "failed" (users), "pruned" (meals deleted) and "seconds"
+    """
+    options = dict(options or {})
+    conn = create_connection(db_path)
+    start = time.time()
+    migrate_generated_menus(conn)
+    pruned = prune_meals(conn, retention_start(retention_days)) if retention_days is not None else 0
+    users = _missing_slots(conn, params)
+    shards = [users[i:i + shard_size] for i in range(0, len(users), max(1, shard_size))]
+    stats = {"users": len(users), "meals": 0, "skipped": 0, "failed": 0, "pruned": pruned, "seconds": 0.0}
+    pending = []
+    done = 0
+
+    def flush():
+        added = write_meals(conn, pending)
+        stats["meals"] += added
+        stats["skipped"] += sum(len(meals) for _, meals in pending) - added
+        pending.clear()
+
+    def collect(shard, results):
+        nonlocal done
+        if results is None:
+            stats["failed"] += len(shard)
+        else:
+            pending.extend(results)
+            if len(pending) >= commit_every:
+                flush()
+        done += len(shard)
+        if report:
+            elapsed = time.time() - start
+            report(f"Planned {done}/{len(users)} users in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.2f} users/s)")
+
+    try:
+        if workers == 0:
+            _init_worker(factory, db_path, options)
+            for shard in shards:
+                try:
+                    results = _plan_shard(shard)
+                except Exception as e:
+                    print(e)
+                    results = None
+                collect(shard, results)
+        elif shards:
+            processes = min(workers or os.cpu_count(), len(shards))
+            options.setdefault("num_threads", max(1, (os.cpu_count() or 1) // processes))
+            ## spawn, not fork: each process imports torch itself instead of inheriting a forked copy
+            with ProcessPoolExecutor(max_workers=processes,
+                                     mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(factory, db_path, options)) as pool:
+                futures = {pool.submit(_plan_shard, shard): shard for shard in shards}
+                for future in as_completed(futures):
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        print(e)
+                        results = None
+                    collect(futures[future], results)
+        if pending:
+            flush()
+    finally:
+        close_connection(conn)
+    stats["seconds"] = time.time() - start
+    return stats
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Regenerate every user's menu for Meal Planner")
+    parser.add_argument('--db', type=str, default=db_file, help='SQLite database file')
+    parser.add_argument('--date', type=str, default=datetime.date.today().isoformat(), help='First day to plan (YYYY-MM-DD)')
+    parser.add_argument('--days', type=int, default=7, help='Number of days to plan')
+    parser.add_argument('--meals', type=str, default="1,2,3", help='Meals to plan per day (1 breakfast, 2 lunch, 3 dinner)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count, 0: no pool)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Users per worker task')
+    parser.add_argument('--commit-every', type=int, default=COMMIT_EVERY, help='Users whose meals are written per transaction')
+    parser.add_argument('--tokens', type=int, default=500, help='Max tokens generated per LLM call')
+    parser.add_argument('--precision', type=str, default="fp32", choices=("fp32", "bf16", "int8"), help='LLM weight precision')
+    parser.add_argument('--memo', action='store_true', help='Reuse picks for identical meals instead of asking the LLM again')
+    parser.add_argument('--recommender', type=str, default="llm", choices=("llm", "scoring"), help='Plan with the LLM or the model-free scorer')
+    parser.add_argument('--retention-days', type=int, default=None, help='Delete meals older than this many days first')
+    parser.add_argument('--prerank', action='store_true', help='Offer the items most similar to the preferences instead of a random sample')
+    parser.add_argument('--context-tokens', type=int, default=None, help='Token budget of the menu items offered per prompt')
+    parser.add_argument('--memo-db', type=str, default=None, help='SQLite file sharing memoized picks between workers and runs')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    params = {"date": args.date, "meal_numbers": [int(m) for m in args.meals.split(",")], "number_of_days": args.days}
+    stats = plan_all(args.db, params, args.workers, args.shard_size, args.commit_every, options={"tokens": args.tokens, "precision": args.precision,
+                                "memo": args.memo, "memo_db": args.memo_db, "context_tokens": args.context_tokens,
+                                "prerank": args.prerank, "recommender": args.recommender},
+                     retention_days=args.retention_days)
+    print(f"Planned {stats['meals']} meals for {stats['users']} users ({stats['skipped']} planned meanwhile, "
+          f"{stats['failed']} users failed, {stats['pruned']} old meals deleted) in {stats['seconds']:.1f}s")
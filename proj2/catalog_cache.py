@@ -0,0 +1,301 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from proj2.sqlQueries import get_pool, fetch_all, transaction, add_write_listener
+
+## Seconds a catalog snapshot is served before it is re-read from the database unconditionally
+CATALOG_TTL = 300.0
+
+## Minimum seconds between PRAGMA data_version checks - bounds how long a write committed by
+## another process (another gunicorn worker, an admin script) can go unnoticed
+CATALOG_CHECK_INTERVAL = 1.0
+
+## Columns loaded for each table - the snapshot dicts use these names as keys
+RESTAURANT_COLUMNS = ("rtr_id", "name", "description", "phone", "email", "address", "city",
+                      "state", "zip", "hours", "status")
+MENU_ITEM_COLUMNS = ("itm_id", "rtr_id", "name", "description", "price", "calories", "instock",
+                     "restock", "allergens")
+
+## Write statements that change the catalog and must invalidate cached snapshots
+CATALOG_WRITE_MATCH = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)'
+    r'\s+"?(?:MenuItem|Restaurant)"?(?=[\s(]|$)',
+    re.IGNORECASE,
+)
+
+
+def is_in_stock(item: dict) -> bool:
+    """
+    Whether a menu item is orderable (instock is 1, or unset for legacy rows).
+    Args:
+        item (dict): A menu item dict from a CatalogSnapshot.
+    Returns:
+        bool: True if the item is in stock.
+    """
+    return item["instock"] is None or item["instock"] == 1
+
+
+class CatalogSnapshot:
+    """
+    Immutable, in-memory copy of every restaurant and menu item at one point in time.
+    """
+
+    def __init__(self, version: int, restaurants: list, items: list):
+        """
+        Builds the lookup tables for a freshly loaded catalog
+
+        Args:
+            version (int): Cache version this snapshot was loaded under.
+            restaurants (list[dict]): Restaurant rows keyed by RESTAURANT_COLUMNS, ordered by rtr_id.
+            items (list[dict]): MenuItem rows keyed by MENU_ITEM_COLUMNS, ordered by itm_id.
+        """
+        self.version = version
+        ## Wall-clock time this version was first loaded - served as Last-Modified
+        self.modified_at = time.time()
+        ## time.monotonic() of the last load or re-read that found identical rows
+        self.loaded_at = time.monotonic()
+        self.restaurants = restaurants
+        self.items = items
+        self.restaurants_by_id = {r["rtr_id"]: r for r in restaurants}
+        self.items_by_id = {m["itm_id"]: m for m in items}
+        self.in_stock_items = [m for m in items if is_in_stock(m)]
+        self._views = {}
+        self._views_lock = threading.Lock()
+
+    def view(self, name: str, builder):
+        """
+        Memoize a value derived from this snapshot (e.g. the dict lists a route renders).
+        Args:
+            name (str): Key identifying the derived view.
+            builder (Callable[[CatalogSnapshot], Any]): Builds the view on first request.
+        Returns:
+            Any: The cached result of builder(self).
+        """
+        try:
+            return self._views[name]
+        except KeyError:
+            pass
+        value = builder(self)
+        with self._views_lock:
+            return self._views.setdefault(name, value)
+
+
+def catalog_fingerprint(catalog: CatalogSnapshot) -> str:
+    """
+    Content hash of a snapshot - unlike the version counter, equal in every process that loaded the
+    same rows, so it can key data shared between processes. Memoize it with catalog.view().
+    Args:
+        catalog (CatalogSnapshot): The snapshot to hash.
+    Returns:
+        str: Hex sha1 digest of the restaurant and menu item rows.
+    """
+    payload = json.dumps([catalog.restaurants, catalog.items], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class CatalogCache:
+    """
+    Per-database cache of the catalog with a TTL, explicit invalidation and a version counter
+    that increases only when a reload finds different rows.
+
+    Commits from other processes are noticed through PRAGMA data_version on a dedicated
+    connection, checked at most every check_interval seconds; in-process writes through
+    execute_query() invalidate the cache immediately.
+    """
+
+    def __init__(self, db_file: str, ttl: float = CATALOG_TTL,
+                 check_interval: float = CATALOG_CHECK_INTERVAL):
+        """
+        Initializes an empty cache for the given database file
+
+        Args:
+            db_file (str): Path to the SQLite database file.
+            ttl (float): Seconds before a snapshot is re-read regardless of data_version.
+            check_interval (float): Minimum seconds between data_version checks.
+        """
+        self.db_file = db_file
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.version = 0
+        self._snapshot = None
+        self._dirty = True
+        self._checked_at = float("-inf")
+        self._data_version = None
+        self._watch = None
+        self._watch_pid = None
+        self._lock = threading.Lock()
+
+    def _fresh(self, now: float) -> bool:
+        """
+        Whether the current snapshot can be served without touching the database.
+        Args:
+            now (float): Current time.monotonic().
+        Returns:
+            bool: True if a snapshot exists, is not dirty, and neither the TTL nor the check interval has elapsed.
+        """
+        snapshot = self._snapshot
+        return (snapshot is not None and not self._dirty
+                and now - self._checked_at < self.check_interval
+                and now - snapshot.loaded_at < self.ttl)
+
+    def _read_data_version(self) -> int:
+        """
+        Read PRAGMA data_version, which changes whenever another connection commits. Lock must be held.
+        Returns:
+            int: The current data_version of the watch connection.
+        """
+        if self._watch is None or self._watch_pid != os.getpid():
+            ## a connection inherited across fork() must not be used (or closed) by the child
+            self._watch = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._watch_pid = os.getpid()
+        return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def _load(self, conn=None) -> CatalogSnapshot:
+        """
+        Read every restaurant and menu item in one read-only transaction. Lock must be held.
+        Args:
+            conn (sqlite3.Connection | None): Connection to read with; borrows one from the pool if None.
+        Returns:
+            CatalogSnapshot: The current snapshot if the rows are unchanged, otherwise a new one
+                tagged with the next version number.
+        """
+        if conn is None:
+            with get_pool(self.db_file).connection() as pooled:
+                return self._load(pooled)
+        with transaction(conn, read_only=True):
+            rrows = fetch_all(conn, f'SELECT {", ".join(RESTAURANT_COLUMNS)} FROM "Restaurant" ORDER BY rtr_id')
+            mrows = fetch_all(conn, f'SELECT {", ".join(MENU_ITEM_COLUMNS)} FROM "MenuItem" ORDER BY itm_id')
+        restaurants = [dict(zip(RESTAURANT_COLUMNS, r)) for r in rrows]
+        items = [dict(zip(MENU_ITEM_COLUMNS, m)) for m in mrows]
+        previous = self._snapshot
+        if previous is not None and previous.restaurants == restaurants and previous.items == items:
+            previous.loaded_at = time.monotonic()
+            return previous
+        self.version += 1
+        return CatalogSnapshot(self.version, restaurants, items)
+
+    def get(self, conn=None) -> CatalogSnapshot:
+        """
+        Return the current snapshot, re-reading the catalog if it was invalidated, another
+        connection has committed since the last check, or the TTL has elapsed.
+        Args:
+            conn (sqlite3.Connection | None): Connection to reload with, e.g. the request's own.
+        Returns:
+            CatalogSnapshot: The cached catalog.
+        """
+        if self._fresh(time.monotonic()):
+            return self._snapshot
+        with self._lock:
+            now = time.monotonic()
+            if self._fresh(now):
+                return self._snapshot
+            data_version = self._read_data_version()
+            self._checked_at = now
+            snapshot = self._snapshot
+            if (snapshot is None or self._dirty or data_version != self._data_version
+                    or now - snapshot.loaded_at >= self.ttl):
+                self._dirty = False
+                self._data_version = data_version
+                self._snapshot = self._load(conn)
+            return self._snapshot
+
+    def invalidate(self):
+        """
+        Mark the cached snapshot stale so the next get() re-reads the database.
+        Returns:
+            None
+        """
+        with self._lock:
+            self._dirty = True
+
+    def close(self):
+        """
+        Close the data_version watch connection.
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._watch is not None and self._watch_pid == os.getpid():
+                self._watch.close()
+                self._watch = None
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_catalog_cache(db_file: str) -> CatalogCache:
+    """
+    Return the process-wide CatalogCache for a database file, creating it on first use.
+    Args:
+        db_file (str): Path to the SQLite database file.
+    Returns:
+        CatalogCache: The shared cache for db_file.
+    """
+    key = os.path.abspath(db_file)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = CatalogCache(db_file)
+        return cache
+
+
+def get_catalog(db_file: str, conn=None) -> CatalogSnapshot:
+    """
+    Shortcut for get_catalog_cache(db_file).get(conn).
+    Args:
+        db_file (str): Path to the SQLite database file.
+        conn (sqlite3.Connection | None): Connection to reload with if the snapshot is stale.
+    Returns:
+        CatalogSnapshot: The cached catalog for db_file.
+    """
+    return get_catalog_cache(db_file).get(conn)
+
+
+def invalidate_catalog(db_file: str | None = None):
+    """
+    Invalidate the cached catalog for one database, or for every database if db_file is None.
+    Args:
+        db_file (str | None): Path to the SQLite database file.
+    Returns:
+        None
+    """
+    with _caches_lock:
+        caches = list(_caches.values()) if db_file is None else [_caches.get(os.path.abspath(db_file))]
+    for cache in caches:
+        if cache is not None:
+            cache.invalidate()
+
+
+def close_catalog_caches():
+    """
+    Close and forget every cache created by get_catalog_cache().
+    Returns:
+        None
+    """
+    with _caches_lock:
+        caches = list(_caches.values())
+        _caches.clear()
+    for cache in caches:
+        cache.close()
+
+
+def _on_write(conn, query: str):
+    """
+    Write listener: invalidate every catalog cache when a MenuItem/Restaurant write commits.
+    Args:
+        conn (sqlite3.Connection): Connection the write was committed on.
+        query (str): SQL text of the committed statement.
+    Returns:
+        None
+    """
+    if CATALOG_WRITE_MATCH.match(query):
+        invalidate_catalog()
+
+
+add_write_listener(_on_write)
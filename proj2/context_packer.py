@@ -0,0 +1,114 @@
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+
+## Header and menu item columns of the CSV context block offered to the LLM
+CONTEXT_HEADER = "item_id,name,description,price,calories\n"
+CONTEXT_COLUMNS = ["itm_id", "name", "description", "price", "calories"]
+
+## Descriptions longer than this many tokens are cut (at a token boundary) when packing by token budget
+DESCRIPTION_TOKENS = 48
+
+## Appended to a cut description
+TRUNCATION_MARK = "..."
+
+
+def context_lines(menu_items: pd.DataFrame) -> np.ndarray:
+    """
+    Serializes each menu item once as a line of the CSV context block, so building a prompt is a
+    single join over the sampled rows. Fields holding commas, quotes or newlines (e.g. descriptions)
+    are quoted as CSV requires; missing values are left empty; other fields are written as-is.
+
+    Args:
+        menu_items (pd.DataFrame): The DataFrame containing the menu items (CONTEXT_COLUMNS)
+
+    Returns:
+        np.ndarray: One CSV line (newline-terminated) per row, in row order
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    lines = np.empty(len(menu_items), dtype=object)
+    columns = menu_items[CONTEXT_COLUMNS].astype(object)
+    for position, row in enumerate(columns.where(columns.notna(), None).itertuples(index=False, name=None)):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        lines[position] = buffer.getvalue()
+    return lines
+
+
+def truncate_text(tokenizer, text, max_tokens: int) -> str:
+    """
+    Cuts a text to its first {max_tokens} tokens. The same text always gives the same result.
+
+    Args:
+        tokenizer: A Hugging Face tokenizer (anything with encode(text, add_special_tokens=False) and decode(ids))
+        text (str | None): The text to cut
+        max_tokens (int): The number of tokens kept
+
+    Returns:
+        str: {text} unchanged if it fits, else its first tokens followed by TRUNCATION_MARK
+    """
+    if not isinstance(text, str):
+        return text
+    tokens = tokenizer.encode(text, add_special_tokens=False)
+    if len(tokens) <= max_tokens:
+        return text
+    return tokenizer.decode(tokens[:max_tokens]).rstrip() + TRUNCATION_MARK
+
+
+class ContextPacker:
+    """
+    Fits candidate menu items into a token budget instead of a fixed item count, so the prompt's
+    prefill cost is bounded whatever the descriptions' lengths. Each item's line (description cut to
+    DESCRIPTION_TOKENS) and its token count are computed once, when the packer is built.
+    """
+
+    def __init__(self, menu_items: pd.DataFrame, tokenizer, description_tokens: int = DESCRIPTION_TOKENS):
+        """
+        Serializes and counts every menu item
+
+        Args:
+            menu_items (pd.DataFrame): The menu items (CONTEXT_COLUMNS), in the row order pack() refers to
+            tokenizer: The LLM's tokenizer, see truncate_text
+            description_tokens (int): The tokens kept of each description
+        """
+        items = menu_items[CONTEXT_COLUMNS].copy()
+        items["description"] = [truncate_text(tokenizer, description, description_tokens)
+                                for description in items["description"]]
+        self.lines = context_lines(items)
+        self.item_ids = items["itm_id"].to_numpy()
+        self.costs = np.array([len(tokenizer.encode(line, add_special_tokens=False)) for line in self.lines],
+                              dtype=np.int64)
+        self.header_cost = len(tokenizer.encode(CONTEXT_HEADER, add_special_tokens=False))
+
+    def pack(self, rows: np.ndarray, budget: int) -> np.ndarray:
+        """
+        Takes candidates in the given order for as long as their lines fit in the budget
+
+        Args:
+            rows (np.ndarray): Row positions of the candidates, in order of preference (e.g. shuffled)
+            budget (int): Tokens available for the context block, header included
+
+        Returns:
+            np.ndarray: The longest prefix of {rows} that fits - at least one row if {rows} is not empty
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        fits = np.cumsum(self.costs[rows]) <= budget - self.header_cost
+        count = int(np.argmin(fits)) if not fits.all() else len(rows)
+        return rows[:max(count, min(1, len(rows)))]
+
+    def context(self, rows: np.ndarray) -> tuple:
+        """
+        Builds the context block of the given rows
+
+        Args:
+            rows (np.ndarray): Row positions, e.g. from pack()
+
+        Returns:
+            str: The context block in CSV format
+            List[int]: The item_ids offered, in order
+        """
+        return CONTEXT_HEADER + "".join(self.lines[rows]), self.item_ids[rows].tolist()
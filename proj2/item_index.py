@@ -0,0 +1,116 @@
+import re
+from collections import Counter
+from typing import Iterable, List
+
+import numpy as np
+
+## Terms kept in the index (the most frequent ones) - bounds the matrix at items x MAX_FEATURES float32
+MAX_FEATURES = 1024
+
+## Words too common in menus and preferences to tell items apart
+STOP_WORDS = frozenset("a an and or the with of in on to for from by at as is are be no not non".split())
+
+TERM_MATCH = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> List[str]:
+    """
+    Splits a text into index terms: lower-cased words without stop words, with a plural "s" removed
+    so "noodles" matches "noodle"
+
+    Args:
+        text (str | None): e.g. "Spicy noodles, no peanuts"
+
+    Returns:
+        List[str]: The terms, in text order (duplicates kept)
+    """
+    if not isinstance(text, str):
+        return []
+    terms = []
+    for word in TERM_MATCH.findall(text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+class ItemIndex:
+    """
+    TF-IDF vectors of menu items (name and description) in one row-normalized NumPy matrix, so
+    ranking every candidate against a preference string is one matrix-vector product
+    """
+
+    def __init__(self, texts: Iterable[str], max_features: int = MAX_FEATURES):
+        """
+        Builds the vocabulary and the item matrix
+
+        Args:
+            texts (Iterable[str]): One text per item, in the row order rank() refers to
+            max_features (int): Terms kept, most frequent (by number of items containing them) first
+        """
+        documents = [Counter(tokenize(text)) for text in texts]
+        frequency = Counter(term for document in documents for term in document)
+        terms = sorted(frequency, key=lambda term: (-frequency[term], term))[:max_features]
+        self.vocabulary = {term: column for column, term in enumerate(terms)}
+        ## Smoothed idf, as in scikit-learn: terms in every item still count a little
+        df = np.array([frequency[term] for term in terms], dtype=np.float32)
+        self.idf = np.log((1 + len(documents)) / (1 + df)) + 1
+        self.matrix = np.zeros((len(documents), len(terms)), dtype=np.float32)
+        for row, document in enumerate(documents):
+            for term, count in document.items():
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    self.matrix[row, column] = count
+        self.matrix *= self.idf
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        np.divide(self.matrix, norms, out=self.matrix, where=norms > 0)
+
+    def vector(self, text: str) -> np.ndarray:
+        """
+        Embeds a query in the item space
+
+        Args:
+            text (str): e.g. a user's preferences
+
+        Returns:
+            np.ndarray: The unit-length TF-IDF vector of {text} - all zeros if it has no known term
+        """
+        query = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term in tokenize(text):
+            column = self.vocabulary.get(term)
+            if column is not None:
+                query[column] += 1
+        query *= self.idf
+        norm = np.linalg.norm(query)
+        return query / norm if norm > 0 else query
+
+    def scores(self, rows: np.ndarray, text: str) -> np.ndarray:
+        """
+        Cosine similarity of some items to a query
+
+        Args:
+            rows (np.ndarray): Row positions of the items
+            text (str): The query
+
+        Returns:
+            np.ndarray: One score in [0, 1] per row
+        """
+        return self.matrix[rows] @ self.vector(text)
+
+    def rank(self, rows: np.ndarray, text: str) -> np.ndarray:
+        """
+        Orders items by similarity to a query, most similar first; equally similar items (e.g. every
+        item, if the query matches nothing) are shuffled so repeated calls still vary
+
+        Args:
+            rows (np.ndarray): Row positions of the candidates
+            text (str): The query
+
+        Returns:
+            np.ndarray: {rows}, reordered
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        order = np.lexsort((np.random.random(len(rows)), -self.scores(rows, text)))
+        return rows[order]
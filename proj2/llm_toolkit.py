@@ -1,44 +1,393 @@
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
 import os
+import copy
+import functools
 import time
+import threading
+from typing import Iterable, List, Optional, Sequence
 
 from proj2.sqlQueries import create_connection, close_connection, fetch_one, fetch_all, execute_query
 
 
+class TokenTrie:
+    """
+    Prefix tree of token id sequences, used to restrict generation to a fixed set of answers
+    """
+
+    def __init__(self, sequences: Iterable[Sequence[int]]):
+        """
+        Builds the trie
+
+        Args:
+            sequences (Iterable[Sequence[int]]): The allowed token id sequences
+        """
+        self.root = {}
+        self.depth = 0
+        for sequence in sequences:
+            node = self.root
+            for token in sequence:
+                node = node.setdefault(token, {})
+            self.depth = max(self.depth, len(sequence))
+
+    def allowed(self, prefix: Sequence[int]) -> List[int]:
+        """
+        Lists the tokens that may follow a prefix
+
+        Args:
+            prefix (Sequence[int]): The tokens generated so far
+
+        Returns:
+            List[int]: The allowed next tokens - empty if the prefix is complete or not in the trie
+        """
+        node = self.root
+        for token in prefix:
+            node = node.get(token)
+            if node is None:
+                return []
+        return list(node)
+
+
+## Default model - set for testing, use "ibm-granite/granite-4.0-micro" or one of your choice during actual execution
+DEFAULT_MODEL = "ibm-granite/granite-4.0-h-350M"
+
+## Weight precisions: fp32 (default), bf16 (half the memory, fast on CPUs with AVX512-BF16/AMX and
+## recent GPUs) and int8 (Linear layers dynamically quantized with torch.ao - CPU only)
+PRECISIONS = ("fp32", "bf16", "int8")
+
+## Environment variable listing models to load at worker boot - comma-separated names, or "1" for
+## DEFAULT_MODEL, optionally suffixed with a precision (e.g. "1:int8")
+PRELOAD_ENV = "PROJ2_PRELOAD_LLM"
+
+## Process-wide registry of loaded models: model_key() -> {"tokenizer", "model", "device", "refs", "pinned"}.
+## torch and transformers are only imported when the first model is loaded.
+_models = {}
+_models_lock = threading.Lock()
+
+
+def default_device() -> str:
+    """
+    Picks the torch device models are loaded on
+
+    Returns:
+        str: "cuda" if a GPU is available, otherwise "cpu"
+    """
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def configure_threads(num_threads: Optional[int] = None, interop_threads: Optional[int] = None):
+    """
+    Sets how many CPU threads torch uses for inference. Pin these when several processes share the
+    machine (e.g. one per bulk-planner worker) so they do not oversubscribe the cores.
+
+    Args:
+        num_threads (int | None): Threads used inside an operation (torch.set_num_threads) - unchanged if None
+        interop_threads (int | None): Threads running independent operations - unchanged if None.
+            torch only accepts this before its first parallel operation.
+    """
+    if not num_threads and not interop_threads:
+        return
+    import torch
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            print(e)
+
+
+def model_key(name: Optional[str] = None, precision: str = "fp32") -> str:
+    """
+    Names a (model, precision) pair in the registry
+
+    Args:
+        name (str | None): The model name - DEFAULT_MODEL if None
+        precision (str): One of PRECISIONS
+
+    Returns:
+        str: The model name, suffixed with ":<precision>" unless it is fp32
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r} - use one of {', '.join(PRECISIONS)}")
+    name = name or DEFAULT_MODEL
+    return name if precision == "fp32" else f"{name}:{precision}"
+
+
+def _load_model(name: str, precision: str = "fp32") -> tuple:
+    """
+    Loads a tokenizer and model from the Hugging Face hub (or the local cache)
+
+    Args:
+        name (str): The model name
+        precision (str): One of PRECISIONS
+
+    Returns:
+        tuple: (tokenizer, model in eval mode, device name)
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    device = default_device()
+    options = {}
+    if precision == "bf16":
+        if device == "cuda" and not torch.cuda.is_bf16_supported():
+            print("bf16 is not supported on this GPU - loading fp32 weights")
+        else:
+            options["torch_dtype"] = torch.bfloat16
+    elif precision == "int8":
+        ## dynamic quantization only has CPU kernels
+        device = "cpu"
+    tokenizer = AutoTokenizer.from_pretrained(name, cache_dir=os.path.join(os.path.dirname(__file__), '.hf_cache'))
+    model = AutoModelForCausalLM.from_pretrained(name, device_map=device, **options)
+    model.eval()
+    if precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizer, model, device
+
+
+def acquire_model(name: Optional[str] = None, precision: str = "fp32") -> tuple:
+    """
+    Returns a shared model, loading it on first use. Every call must be matched by release_model().
+
+    Args:
+        name (str | None): The model name - DEFAULT_MODEL if None
+        precision (str): One of PRECISIONS - each precision is a separate copy of the weights
+
+    Returns:
+        tuple: (tokenizer, model, device name)
+    """
+    key = model_key(name, precision)
+    with _models_lock:
+        entry = _models.get(key)
+        if entry is None:
+            tokenizer, model, device = _load_model(name or DEFAULT_MODEL, precision)
+            entry = _models[key] = {"tokenizer": tokenizer, "model": model, "device": device,
+                                    "refs": 0, "pinned": False}
+        entry["refs"] += 1
+        return entry["tokenizer"], entry["model"], entry["device"]
+
+
+def release_model(name: Optional[str] = None, precision: str = "fp32"):
+    """
+    Drops one reference to a shared model and unloads it when no references remain, unless it was preloaded
+
+    Args:
+        name (str | None): The model name - DEFAULT_MODEL if None
+        precision (str): One of PRECISIONS
+    """
+    key = model_key(name, precision)
+    with _models_lock:
+        entry = _models.get(key)
+        if entry is None or entry["refs"] == 0:
+            return
+        entry["refs"] -= 1
+        if entry["refs"] == 0 and not entry["pinned"]:
+            del _models[key]
+
+
+def preload_model(name: Optional[str] = None, precision: str = "fp32"):
+    """
+    Loads a model ahead of its first use and keeps it loaded for the life of the process,
+    e.g. at worker boot so the first menu request does not wait for the weights
+
+    Args:
+        name (str | None): The model name - DEFAULT_MODEL if None
+        precision (str): One of PRECISIONS
+    """
+    key = model_key(name, precision)
+    acquire_model(name, precision)
+    with _models_lock:
+        _models[key]["pinned"] = True
+        _models[key]["refs"] -= 1
+
+
+def preload_from_env():
+    """
+    Preloads the models named in the PRELOAD_ENV environment variable, if it is set.
+    Pre-fork servers should call this in each worker (e.g. from a gunicorn post_fork hook).
+    """
+    names = os.environ.get(PRELOAD_ENV, "").strip()
+    if not names or names == "0":
+        return
+    for name in names.split(","):
+        name, precision = name.strip(), "fp32"
+        if name.rpartition(":")[2] in PRECISIONS:
+            name, _, precision = name.rpartition(":")
+        try:
+            preload_model(None if name == "1" else name, precision)
+        except Exception as e:
+            print(e)
+
+
+def loaded_models() -> dict:
+    """
+    Lists the models currently held by the registry
+
+    Returns:
+        dict: model_key() -> number of live references
+    """
+    with _models_lock:
+        return {key: entry["refs"] for key, entry in _models.items()}
+
+
+def unload_models():
+    """
+    Forgets every loaded model, including preloaded ones. LLM instances still holding a model keep
+    working, but the next acquire_model() loads a fresh copy.
+    """
+    with _models_lock:
+        _models.clear()
+
+
+def _inference(method):
+    """
+    Runs an LLM method under torch.inference_mode(), or torch.no_grad() if the LLM was created with
+    inference_mode=False
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        import torch
+        with (torch.inference_mode() if self.inference_mode else torch.no_grad()):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class LLM:
     """
     LLM class for local language model interactions
     """
 
-    ## LLM parameters
-    device = "gpu" if torch.cuda.is_available() else "cpu"
-
-    ## Set for testing - use "ibm-granite/granite-4.0-micro" or one of your choice during actual execution
-    model = "ibm-granite/granite-4.0-h-350M"
+    ## Model used when none is given - see DEFAULT_MODEL
+    model = DEFAULT_MODEL
 
-    def __init__(self, tokens: int = 500):
+    def __init__(self, tokens: int = 500, model_name: Optional[str] = None, precision: str = "fp32",
+                 num_threads: Optional[int] = None, inference_mode: bool = True):
         """
-        Initializes the LLM with the specified number of tokens
+        Initializes the LLM with the specified number of tokens. The weights come from the process-wide
+        registry, so every LLM of the same model and precision shares one copy; call close() when done with it.
 
         Args:
             tokens (int): The max number of generated characters
+            model_name (str | None): The model to use - LLM.model if None
+            precision (str): Weight precision, one of PRECISIONS - "bf16" halves memory, "int8" quantizes
+                the Linear layers for faster CPU inference at a small quality cost
+            num_threads (int | None): CPU threads torch may use (see configure_threads) - torch's default if None
+            inference_mode (bool): Run under torch.inference_mode() rather than torch.no_grad()
         """
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model, cache_dir=os.path.join(os.path.dirname(__file__), '.hf_cache'))
-        # drop device_map if running on CPU
-        if self.device == "cpu":    
-            self.model = AutoModelForCausalLM.from_pretrained(self.model, device_map=self.device)
-        self.model.eval()
+        self.model_name = model_name or self.model
+        self.precision = precision
+        self.inference_mode = inference_mode
+        configure_threads(num_threads)
+        self.tokenizer, self.model, self.device = acquire_model(self.model_name, precision)
         self.tokens = tokens
+        self.closed = False
 
+        ## Prompt prefixes whose key/value cache has been precomputed (see cache_prefix), and the
+        ## number of prompt tokens that did not have to be re-encoded thanks to them
+        self.prefixes = []
+        self.prefill_tokens_saved = 0
+        ## Tokens produced by generate()/generate_batch(), for throughput measurements
+        self.generated_tokens = 0
+
+    def close(self):
+        """
+        Releases this LLM's reference to the shared model - it must not be used afterwards
+        """
+        if not self.closed:
+            self.closed = True
+            release_model(self.model_name, self.precision)
 
-    def generate(self, context: str, prompt: str) -> str:
+    @_inference
+    def cache_prefix(self, context: str, prompt_prefix: str = "") -> int:
+        """
+        Precomputes the key/value cache for a chat prefix shared by many requests - the system context
+        plus the fixed beginning of the user prompt. generate() reuses it whenever a chat starts with
+        that prefix, so only the variable part of the prompt is encoded per request.
+
+        Args:
+            context (str): The system context that will be passed to generate()
+            prompt_prefix (str): The fixed text every user prompt starts with
+
+        Returns:
+            int: The number of prefix tokens cached
+        """
+        ## Render the chat with a marker where the variable part of the prompt begins and cut there,
+        ## so the prefix contains exactly the template tokens generate() will produce
+        marker = "\u2063"
+        chat = self.tokenizer.apply_chat_template([
+            {"role": "system", "content": context},
+            {"role": "user", "content": prompt_prefix + marker},
+        ], tokenize=False, add_generation_prompt=True)
+        text = chat[:chat.index(marker)]
+        input_tokens = self.tokenizer(text, return_tensors="pt").to(self.device)
+        cache = self.model(**input_tokens, use_cache=True).past_key_values
+        self.prefixes.append((text, input_tokens["input_ids"][0], cache))
+        ## Longest prefix first, so the most specific match wins
+        self.prefixes.sort(key=lambda prefix: len(prefix[0]), reverse=True)
+        return int(input_tokens["input_ids"].shape[1])
+
+    def __cached_prefix(self, chat: str, input_ids):
+        """
+        Finds a cached prefix that the tokenized chat starts with
+
+        Args:
+            chat (str): The rendered chat text
+            input_ids (torch.Tensor): The chat's token ids (1-D)
+
+        Returns:
+            tuple | None: (prefix length in tokens, a private copy of its cache), or None
+        """
+        import torch
+        for text, prefix_ids, cache in self.prefixes:
+            length = prefix_ids.shape[0]
+            ## the token ids must match too - a merge across the boundary would make the cache wrong
+            if chat.startswith(text) and input_ids.shape[0] > length and torch.equal(input_ids[:length], prefix_ids):
+                return length, copy.deepcopy(cache)
+        return None
+
+
+    def __constrain(self, choices: List[Optional[Sequence]], prompt_length: int) -> dict:
+        """
+        Builds generate() options that only allow one of the given answers followed by end-of-text
+
+        Args:
+            choices (List[Optional[Sequence]]): The allowed answers (e.g. item ids) for each batch row,
+                or None for a row that may generate freely
+            prompt_length (int): Length of the (padded) prompt, where generation starts
+
+        Returns:
+            dict: prefix_allowed_tokens_fn and max_new_tokens for model.generate
+        """
+        eos = self.tokenizer.eos_token_id
+        tries = [
+            None if row is None else TokenTrie(
+                self.tokenizer.encode(str(choice), add_special_tokens=False) + [eos] for choice in row)
+            for row in choices
+        ]
+
+        def allowed_tokens(batch_id, input_ids):
+            trie = tries[batch_id]
+            if trie is None:
+                return list(range(len(self.tokenizer)))
+            ## Finished rows (and anything off the trie) may only produce end-of-text/padding
+            return trie.allowed(input_ids[prompt_length:].tolist()) or [eos]
+
+        if all(trie is not None for trie in tries):
+            max_new_tokens = max(trie.depth for trie in tries)
+        else:
+            max_new_tokens = self.tokens
+        return {"prefix_allowed_tokens_fn": allowed_tokens, "max_new_tokens": max_new_tokens}
+
+    @_inference
+    def generate(self, context: str, prompt: str, choices: Optional[Sequence] = None) -> str:
         """
         Uses the local LLM to generate text based on the provided context and prompt
 
         Args:
             context (str): The system context to provide to the LLM
             prompt (str): The user prompt to provide to the LLM  
+            choices (Sequence | None): If given, constrains the answer to exactly one of these values
+                (e.g. the item ids offered in the prompt) followed by end-of-text, generating at most as
+                many tokens as the longest choice needs
 
         Returns:
             str: The raw, unformatted output from the LLM
@@ -51,11 +400,130 @@ class LLM:
         chat = self.tokenizer.apply_chat_template(chat, tokenize=False, add_generation_prompt=True)
         # tokenize the text
         input_tokens = self.tokenizer(chat, return_tensors="pt").to(self.device)
-        # generate output tokens
-        output = self.model.generate(**input_tokens, 
-                                    max_new_tokens=self.tokens)
+        options = {"max_new_tokens": self.tokens}
+        if choices is not None:
+            options.update(self.__constrain([choices], input_tokens["input_ids"].shape[1]))
+        # generate output tokens, skipping the prefill of a cached prefix if there is one
+        cached = self.__cached_prefix(chat, input_tokens["input_ids"][0]) if self.prefixes else None
+        output = None
+        if cached is not None:
+            length, past_key_values = cached
+            try:
+                output = self.model.generate(**input_tokens,
+                                            past_key_values=past_key_values,
+                                            **options)
+                self.prefill_tokens_saved += length
+                print("Reused %d cached prefix tokens (%d saved in total)" % (length, self.prefill_tokens_saved))
+            except Exception as e:
+                ## Not every architecture accepts a pre-filled cache in generate(); stop trying
+                print(f"Prefix cache disabled: {e}")
+                self.prefixes.clear()
+        if output is None:
+            output = self.model.generate(**input_tokens, 
+                                        **options)
+        self.generated_tokens += output.shape[1] - input_tokens["input_ids"].shape[1]
         # decode output tokens into text
         output = self.tokenizer.batch_decode(output)[0]
         end = time.time()
         print("Menu Item selected in %.4f seconds" % (end - start))
-        return output
\ No newline at end of file
+        return output
+
+    @_inference
+    def generate_batch(self, contexts: List[str], prompts: List[str], choices: Optional[List[Optional[Sequence]]] = None) -> List[str]:
+        """
+        Uses the local LLM to generate text for several context/prompt pairs in one batched forward pass.
+        Prompts are left-padded so every sequence generates from the same position; finished sequences
+        stop at end-of-text while the rest of the batch keeps going.
+
+        Args:
+            contexts (List[str]): The system context for each request
+            prompts (List[str]): The user prompt for each request
+            choices (List[Sequence | None] | None): Allowed answers per request, as in generate()
+
+        Returns:
+            List[str]: The raw, unformatted output for each request, in the same format as generate()
+        """
+        if len(contexts) != len(prompts) or (choices is not None and len(choices) != len(prompts)):
+            raise ValueError("contexts, prompts and choices must have the same length")
+        if not prompts:
+            return []
+        import torch
+        start = time.time()
+        chats = [
+            self.tokenizer.apply_chat_template([
+                {"role": "system", "content": context},
+                {"role": "user", "content": prompt},
+            ], tokenize=False, add_generation_prompt=True)
+            for context, prompt in zip(contexts, prompts)
+        ]
+        # decoder-only models must be padded on the left so generation continues right after each prompt
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        input_tokens = self.tokenizer(chats, return_tensors="pt", padding=True).to(self.device)
+        options = {"max_new_tokens": self.tokens}
+        if choices is not None:
+            options.update(self.__constrain(choices, input_tokens["input_ids"].shape[1]))
+        output = self.model.generate(**input_tokens,
+                                    pad_token_id=self.tokenizer.pad_token_id,
+                                    eos_token_id=self.tokenizer.eos_token_id,
+                                    **options)
+
+        # strip the left padding and anything after each sequence's end-of-text before decoding
+        prompt_length = input_tokens["input_ids"].shape[1]
+        outputs = []
+        for row, sequence in enumerate(output):
+            padding = prompt_length - int(input_tokens["attention_mask"][row].sum())
+            generated = sequence[prompt_length:]
+            stops = (generated == self.tokenizer.eos_token_id).nonzero()
+            if len(stops) > 0:
+                generated = generated[:int(stops[0]) + 1]
+            self.generated_tokens += len(generated)
+            outputs.append(self.tokenizer.decode(torch.cat([sequence[padding:prompt_length], generated])))
+        end = time.time()
+        print("%d Menu Items selected in %.4f seconds" % (len(outputs), end - start))
+        return outputs
+
+    @_inference
+    def rank(self, context: str, prompt: str, candidates: Sequence) -> List[float]:
+        """
+        Scores each candidate answer by its log-likelihood as the assistant's reply, in a single batched
+        forward pass instead of autoregressive generation
+
+        Args:
+            context (str): The system context to provide to the LLM
+            prompt (str): The user prompt to provide to the LLM
+            candidates (Sequence): The possible answers (e.g. the item ids offered in the prompt)
+
+        Returns:
+            List[float]: The summed log-probability of each candidate's tokens followed by end-of-text,
+                in candidate order (higher is more likely)
+        """
+        if len(candidates) == 0:
+            return []
+        import torch
+        start = time.time()
+        chat = self.tokenizer.apply_chat_template([
+            {"role": "system", "content": context},
+            {"role": "user", "content": prompt},
+        ], tokenize=False, add_generation_prompt=True)
+        prompt_ids = self.tokenizer(chat)["input_ids"]
+        eos = self.tokenizer.eos_token_id
+        pad = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else eos
+        answers = [self.tokenizer.encode(str(candidate), add_special_tokens=False) + [eos] for candidate in candidates]
+        longest = max(len(answer) for answer in answers)
+
+        # every row is prompt + answer, right-padded to the same length (padding never influences earlier positions)
+        input_ids = torch.tensor([prompt_ids + answer + [pad] * (longest - len(answer)) for answer in answers], device=self.device)
+        answer_mask = torch.tensor([[1] * len(answer) + [0] * (longest - len(answer)) for answer in answers], device=self.device)
+        attention_mask = torch.cat([torch.ones((len(answers), len(prompt_ids)), dtype=answer_mask.dtype, device=self.device), answer_mask], dim=1)
+
+        # only the positions that predict answer tokens are needed: the last prompt token onwards
+        logits = self.model(input_ids=input_ids, attention_mask=attention_mask, logits_to_keep=longest + 1).logits
+        log_probs = torch.log_softmax(logits[:, :longest].float(), dim=-1)
+        targets = input_ids[:, len(prompt_ids):]
+        token_scores = log_probs.gather(-1, targets.unsqueeze(-1)).squeeze(-1) * answer_mask
+        scores = token_scores.sum(dim=1).tolist()
+        end = time.time()
+        print("%d candidates ranked in %.4f seconds" % (len(scores), end - start))
+        return scores
@@ -0,0 +1,210 @@
+"""
+Structured storage of generated menus: one MealPlan row per (user, date, meal) instead of the
+"[YYYY-MM-DD,itm_id,meal],..." string in User.generated_menu. Existing strings are moved over by
+
+    python -m proj2.meal_plan [--db PATH]
+
+or one user at a time by migrate_user() the first time their plan is read. Past meals are kept
+until pruned, with --prune (see MEAL_PLAN_RETENTION_DAYS) or by a planner given retention_days.
+"""
+import argparse
+import datetime
+import os
+import re
+from typing import Iterable, List, Tuple
+
+from proj2.sqlQueries import create_connection, close_connection, fetch_all, fetch_one, execute_query, transaction
+
+db_file = os.path.join(os.path.dirname(__file__), 'CSC510_DB.db')
+
+## The primary key doubles as the (usr_id, date) index month views and slot checks use
+MEAL_PLAN_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS "MealPlan" (
+    usr_id INTEGER NOT NULL REFERENCES "User"(usr_id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    meal INTEGER NOT NULL,
+    itm_id INTEGER NOT NULL,
+    PRIMARY KEY (usr_id, date, meal)
+) WITHOUT ROWID'''
+
+## One entry of the legacy string: date, item id and an optional meal number (1, 2 or 3)
+MENU_ENTRY_MATCH = re.compile(r'\[\s*(\d{4}-\d{2}-\d{2})\s*,\s*([0-9]+)\s*(?:,\s*([123])\s*)?\]')
+
+## Legacy entries without a meal number were dinners
+DEFAULT_MEAL = 3
+
+## Days of past meals kept by default when pruning (python -m proj2.meal_plan --prune)
+MEAL_PLAN_RETENTION_DAYS = 90
+
+
+def ensure_meal_plan_table(conn):
+    """
+    Create the MealPlan table if it does not exist yet.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+    Returns:
+        None
+    """
+    execute_query(conn, MEAL_PLAN_TABLE_SQL)
+
+
+def parse_menu_entries(menu: str) -> List[Tuple[str, int, int]]:
+    """
+    Parse a legacy generated-menu string.
+    Args:
+        menu (str | None): A string like "[YYYY-MM-DD,ID,(meal)],..." where meal is 1|2|3 (optional).
+    Returns:
+        list[tuple[str, int, int]]: (date, itm_id, meal) per entry, in string order.
+    """
+    if not menu:
+        return []
+    return [(d, int(itm_id), int(meal) if meal else DEFAULT_MEAL)
+            for d, itm_id, meal in MENU_ENTRY_MATCH.findall(menu)]
+
+
+def load_plan(conn, usr_id: int, start: str | None = None, end: str | None = None) -> dict:
+    """
+    Read a user's planned meals, optionally only those of a date range.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        usr_id (int): The user.
+        start (str | None): First date to include (YYYY-MM-DD), unbounded if None.
+        end (str | None): Last date to include (YYYY-MM-DD), unbounded if None.
+    Returns:
+        dict: Mapping 'YYYY-MM-DD' -> [{'itm_id': int, 'meal': int}, ...] ordered by meal.
+    """
+    rows = fetch_all(conn, 'SELECT date, meal, itm_id FROM "MealPlan" WHERE usr_id = ? AND date >= ? AND date <= ? '
+                           'ORDER BY date, meal', (usr_id, start or "", end or "9999-12-31")) or []
+    plan = {}
+    for d, meal, itm_id in rows:
+        plan.setdefault(d, []).append({"itm_id": itm_id, "meal": meal})
+    return plan
+
+
+def planned_slots(conn, usr_id: int, start: str, end: str) -> set:
+    """
+    The (date, meal) slots of a date range a user already has a meal for.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        usr_id (int): The user.
+        start (str): First date (YYYY-MM-DD).
+        end (str): Last date (YYYY-MM-DD).
+    Returns:
+        set[tuple[str, int]]: The planned slots.
+    """
+    rows = fetch_all(conn, 'SELECT date, meal FROM "MealPlan" WHERE usr_id = ? AND date >= ? AND date <= ?',
+                     (usr_id, start, end)) or []
+    return {(d, meal) for d, meal in rows}
+
+
+def add_meals(conn, usr_id: int, meals: Iterable[Tuple[str, int, int]]) -> List[Tuple[str, int, int]]:
+    """
+    Add planned meals. A slot that already has a meal keeps it.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        usr_id (int): The user.
+        meals (Iterable[tuple[str, int, int]]): (date, meal, itm_id) per new meal.
+    Returns:
+        list[tuple[str, int, int]]: The meals actually added, in order.
+    """
+    added = []
+    with transaction(conn):
+        for d, meal, itm_id in meals:
+            cur = execute_query(conn, 'INSERT OR IGNORE INTO "MealPlan"(usr_id, date, meal, itm_id) VALUES (?, ?, ?, ?)',
+                                (usr_id, d, meal, itm_id))
+            if cur is not None and cur.rowcount > 0:
+                added.append((d, meal, itm_id))
+    return added
+
+
+def save_meals(conn, usr_id: int, meals: Iterable[Tuple[str, int, int]]) -> int:
+    """
+    Add planned meals, like add_meals().
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        usr_id (int): The user.
+        meals (Iterable[tuple[str, int, int]]): (date, meal, itm_id) per new meal.
+    Returns:
+        int: The number of meals added.
+    """
+    return len(add_meals(conn, usr_id, meals))
+
+
+def prune_meals(conn, before: str, usr_id: int | None = None) -> int:
+    """
+    Delete planned meals dated before a day - a range scan on the primary key per user.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        before (str): First date kept (YYYY-MM-DD).
+        usr_id (int | None): Only this user's meals, or everyone's if None.
+    Returns:
+        int: The number of meals deleted.
+    """
+    if usr_id is None:
+        cur = execute_query(conn, 'DELETE FROM "MealPlan" WHERE date < ?', (before,))
+    else:
+        cur = execute_query(conn, 'DELETE FROM "MealPlan" WHERE usr_id = ? AND date < ?', (usr_id, before))
+    return cur.rowcount if cur else 0
+
+
+def retention_start(retention_days: int, today: datetime.date | None = None) -> str:
+    """
+    The first date a retention window keeps.
+    Args:
+        retention_days (int): Days of past meals kept.
+        today (datetime.date | None): Defaults to today.
+    Returns:
+        str: The date (YYYY-MM-DD) {retention_days} days before {today}.
+    """
+    return ((today or datetime.date.today()) - datetime.timedelta(days=retention_days)).isoformat()
+
+
+def migrate_user(conn, usr_id: int) -> int:
+    """
+    Move one user's legacy generated_menu string into MealPlan and clear it, in one transaction.
+    Entries for a slot that already has a meal are dropped (the first one wins).
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        usr_id (int): The user.
+    Returns:
+        int: The number of meals moved.
+    """
+    with transaction(conn):
+        row = fetch_one(conn, 'SELECT generated_menu FROM "User" WHERE usr_id = ?', (usr_id,))
+        if row is None or not row[0]:
+            return 0
+        moved = save_meals(conn, usr_id, [(d, meal, itm_id) for d, itm_id, meal in parse_menu_entries(row[0])])
+        execute_query(conn, 'UPDATE "User" SET generated_menu = NULL WHERE usr_id = ?', (usr_id,))
+    return moved
+
+
+def migrate_generated_menus(conn) -> int:
+    """
+    Create MealPlan and move every user's legacy generated_menu string into it.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+    Returns:
+        int: The number of meals moved.
+    """
+    ensure_meal_plan_table(conn)
+    users = fetch_all(conn, '''SELECT usr_id FROM "User" WHERE generated_menu IS NOT NULL AND generated_menu != '' ''') or []
+    return sum(migrate_user(conn, usr_id) for usr_id, in users)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Move User.generated_menu strings into the MealPlan table")
+    parser.add_argument('--db', type=str, default=db_file, help='SQLite database file to migrate')
+    parser.add_argument('--prune', action='store_true', help='Also delete meals older than the retention window')
+    parser.add_argument('--retention-days', type=int, default=MEAL_PLAN_RETENTION_DAYS, help='Days of past meals kept by --prune')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    conn = create_connection(args.db)
+    try:
+        print(f"Moved {migrate_generated_menus(conn)} meals into MealPlan")
+        if args.prune:
+            before = retention_start(args.retention_days)
+            print(f"Deleted {prune_meals(conn, before)} meals dated before {before}")
+    finally:
+        close_connection(conn)
@@ -3,12 +3,23 @@ import pandas as pd
 import datetime
 import time
 import json
+import math
 import random
 import re
+from collections import OrderedDict
 from typing import Tuple, List
 
+import numpy as np
+
 import proj2.llm_toolkit as llm_toolkit
 from proj2.sqlQueries import *
+from proj2.catalog_cache import get_catalog, catalog_fingerprint, MENU_ITEM_COLUMNS, RESTAURANT_COLUMNS
+from proj2.opening_hours import OpeningHoursIndex
+from proj2.allergens import AllergenVocabulary, allergen_free
+from proj2.recommendation_cache import RecommendationCache, recommendation_key
+from proj2.meal_plan import add_meals, migrate_user, planned_slots, prune_meals, retention_start
+from proj2.context_packer import CONTEXT_HEADER, ContextPacker, context_lines
+from proj2.item_index import ItemIndex
 
 db_file = os.path.join(os.path.dirname(__file__), 'CSC510_DB.db')
 
@@ -19,6 +30,12 @@ LLM_ATTRIBUTE_ERROR = -1
 ## Increase to increase the sample size the AI can draw from at the cost of increased runtime
 ITEM_CHOICES = 10
 
+## Number of (open restaurants, allergen set) candidate pools each MenuGenerator keeps (LRU)
+CANDIDATE_POOL_CACHE_SIZE = 128
+
+## Maximum number of prompts update_menus runs through the model together - bounds padding waste and memory
+GENERATE_BATCH_SIZE = 8
+
 ## Days of the week in an array - should be the same as in the database*
 DAYS_OF_WEEK = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
@@ -31,14 +48,32 @@ Provide only the itm_id as output
 CSV CONTEXT:
 {context}'''
 
+## Batched planning prompt - one call picks an item for several meals, each with its own CSV CONTEXT
+BATCH_PROMPT_TEMPLATE = '''Choose a meal for a customer for each numbered meal below, based on their preferences: {preferences}
+Make sure that each item makes sense for its meal and comes from that meal's CSV CONTEXT.
+Provide only one line per meal, formatted as <meal number>: <itm_id>
+
+{meals}'''
+BATCH_MEAL_TEMPLATE = '''MEAL {number} ({meal} on {weekday} {date})
+CSV CONTEXT:
+{context}'''
+
 ## Regex used for parsing a number from LLM Output
 LLM_OUTPUT_MATCH = r"<\|start_of_role\|>assistant<\|end_of_role\|>(\d+)<\|end_of_text\|>"
 
+## Regexes used for parsing batched LLM Output: the assistant turn, then "<meal number>: <itm_id>" lines in it
+LLM_BATCH_OUTPUT_MATCH = r"<\|start_of_role\|>assistant<\|end_of_role\|>(.*?)<\|end_of_text\|>"
+LLM_BATCH_LINE_MATCH = r"^\s*(?:MEAL\s*)?(\d+)\s*[:=-]\s*(\d+)\s*$"
+
 ## Preset Meal times - In the future, times will be user-provided
 BREAKFAST_TIME = 1000
 LUNCH_TIME = 1400
 DINNER_TIME = 2000
 
+## ScoringRecommender: calories aimed at per meal number, and how far off (1 standard deviation) still fits well
+MEAL_CALORIE_TARGETS = {1: 500, 2: 700, 3: 800}
+CALORIE_TOLERANCE = 250
+
 def get_meal_and_order_time(meal_number : int) -> Tuple[str, int]:
     """
     Maps a meal number to it's cooresponding meal as a string as well as its cooreponding meal time
@@ -117,12 +152,96 @@ def format_llm_output(output: str) -> int:
         None   
     return result
 
+def format_batch_llm_output(output: str) -> dict:
+    """
+    Grabs a batched LLM output and extracts the item ID chosen for each meal number
+
+    Args:
+        output (str): The output from the llm_toolkit LLM for a BATCH_PROMPT_TEMPLATE prompt
+
+    Returns:
+        dict: Maps meal number -> item ID. Empty if the output has no assistant turn, or more than one
+            (which would mean the model was made to continue the conversation - see format_llm_output)
+    """
+    turns = re.findall(LLM_BATCH_OUTPUT_MATCH, output, re.DOTALL)
+    if len(turns) != 1:
+        return {}
+    picks = {}
+    for number, itm_id in re.findall(LLM_BATCH_LINE_MATCH, turns[0], re.MULTILINE | re.IGNORECASE):
+        picks.setdefault(int(number), int(itm_id))
+    return picks
+
+def missing_slots(menu: str, date: str, meal_numbers: List[int], number_of_days: int = 1, planned: set = None) -> List[Tuple[str, str, int]]:
+    """
+    Lists the meals of a date range that are not on the menu yet
+
+    Args:
+        menu (str): The current menu string (can be empty or None)
+        date (str): The first date in YYYY-MM-DD format
+        meal_numbers (List[int]): The meal numbers wanted each day (1 for breakfast, 2 for lunch, 3 for dinner)
+        number_of_days (int): The number of days, starting at {date}
+        planned (set): (date, meal_number) pairs already planned, e.g. from meal_plan.planned_slots -
+            read from {menu} if None
+
+    Returns:
+        List[Tuple[str, str, int]]: (date, weekday, meal_number) of each missing meal, in menu order
+    """
+    if planned is None:
+        planned = {(d, int(meal)) for d, meal in re.findall(r"\[([^,\]]+),\d+,(\d+)\]", menu or "")}
+    planned = set(planned)
+    slots = []
+    next_date, current_weekday = get_weekday_and_increment(date)
+    for x in range(number_of_days):
+        for meal_number in meal_numbers:
+            if (date, meal_number) not in planned:
+                planned.add((date, meal_number))
+                slots.append((date, current_weekday, meal_number))
+        date = next_date
+        next_date, current_weekday = get_weekday_and_increment(date)
+    return slots
+
+def add_to_menu(menu: str, slots: List[Tuple[str, str, int]], itm_ids: List[int]) -> str:
+    """
+    Appends picked items to a menu string
+
+    Args:
+        menu (str): The current menu string (can be empty or None)
+        slots (List[Tuple[str, str, int]]): (date, weekday, meal_number) of each new meal
+        itm_ids (List[int]): The item_id picked for each slot
+
+    Returns:
+        str: The updated menu string
+    """
+    entries = [f"[{date},{itm_id},{meal_number}]" for (date, _, meal_number), itm_id in zip(slots, itm_ids)]
+    if menu:
+        entries.insert(0, menu)
+    return ",".join(entries) if entries else menu
+
+def pick_by_scores(candidates: List[int], scores: List[float], temperature: float = 0.0) -> int:
+    """
+    Picks a candidate from LLM log-likelihood scores
+
+    Args:
+        candidates (List[int]): The candidate item ids
+        scores (List[float]): The log-likelihood of each candidate (from LLM.rank)
+        temperature (float): 0 picks the best-scoring candidate; higher values sample from
+            softmax(scores / temperature), trading accuracy for variety
+
+    Returns:
+        int: The picked item id
+    """
+    if temperature <= 0:
+        return candidates[max(range(len(scores)), key=scores.__getitem__)]
+    best = max(scores)
+    weights = [math.exp((score - best) / temperature) for score in scores]
+    return random.choices(candidates, weights=weights)[0]
+
 def limit_scope(items: pd.DataFrame, num_choices: int) -> List[int]:
     """
     Limits the number of items to ITEM_CHOICES by randomly selecting items if necessary
 
     Args:
-        items (pd.DataFrame): The DataFrame containing the items
+        items (pd.DataFrame | np.ndarray): The DataFrame (or candidate pool array) containing the items
         num_choices (int): The maximum number of choices to return
 
     Returns:
@@ -134,23 +253,26 @@ def limit_scope(items: pd.DataFrame, num_choices: int) -> List[int]:
         choices = random.sample(choices, num_choices)
     return choices
 
-def filter_allergens(menu_items: pd.DataFrame, allergens: str) -> pd.DataFrame:
+def filter_allergens(menu_items: pd.DataFrame, allergens: str, vocabulary: AllergenVocabulary = None) -> pd.DataFrame:
     """
-    Filters out menu items that contain any of the specified allergens from the provided DataFrame
+    Filters out menu items that contain any of the specified allergens from the provided DataFrame.
+    Allergen names are compared case-insensitively, ignoring surrounding whitespace.
 
     Args:
         menu_items (pd.DataFrame): The DataFrame containing the menu items
         allergens (str): A comma-separated string of allergens to filter out
+        vocabulary (AllergenVocabulary): The vocabulary the frame's "allergen_mask" column was encoded with;
+            if omitted the masks are computed from the "allergens" column
 
     Returns:
-        pd.DataFrame: The filtered DataFrame with menu items containing the specified allergens removed
+        pd.DataFrame: A filtered copy with menu items containing the specified allergens removed
     """
-    for index, rows in menu_items.iterrows():
-        if rows["allergens"] is not None:
-            item_allergens = rows['allergens'].split(',')
-            if any (allergen in item_allergens for allergen in allergens.split(',')):
-                menu_items.drop(index, inplace=True)
-    return menu_items
+    if vocabulary is None or "allergen_mask" not in menu_items:
+        vocabulary = AllergenVocabulary()
+        masks = vocabulary.encode(menu_items["allergens"])
+    else:
+        masks = menu_items["allergen_mask"].to_numpy()
+    return menu_items[allergen_free(masks, vocabulary.mask(allergens))]
 
 def filter_closed_restaurants(restaurant: pd.DataFrame, weekday: str, time: int) -> pd.DataFrame:
     """
@@ -164,43 +286,268 @@ def filter_closed_restaurants(restaurant: pd.DataFrame, weekday: str, time: int)
     Returns:
         pd.DataFrame: The filtered DataFrame with closed restaurants removed
     """
-    for index, rows in restaurant.iterrows():
-        opening_times = json.loads(rows["hours"])[weekday]
-        if len(opening_times) % 2 == 1:
-            print("Odd opening times - cannot process")
-            restaurant = restaurant[restaurant["rtr_id"] != rows["rtr_id"]]
-        elif len(opening_times) >= 2:
-            open = False
-            for x in range(int(len(opening_times) / 2)):
-                if opening_times[x*2] <= time and opening_times[x*2+1] >= time:
-                    open = True
-            if not open:
-                restaurant = restaurant[restaurant["rtr_id"] != rows["rtr_id"]]
-        else:
-            restaurant = restaurant[restaurant["rtr_id"] != rows["rtr_id"]]
-    return restaurant
+    ## Each distinct restaurant's hours are parsed once, however many rows (e.g. menu items) it has
+    hours = restaurant.drop_duplicates("rtr_id")
+    index = OpeningHoursIndex(zip(hours["rtr_id"], hours["hours"]))
+    return restaurant[restaurant["rtr_id"].isin(index.open_at(weekday, time))]
+
+class Recommender:
+    """
+    Picks menu items for meal slots from the catalog. Subclasses decide how (plan_slots and plan_many);
+    loading the catalog, finding the candidates of a meal and updating menus and MealPlan rows are shared.
+    """
+
+    def __init__(self, db_file: str = None, prerank: bool = False):
+        """
+        Loads the catalog
+
+        Args:
+            db_file (str): The database to read the catalog from - the module's db_file if None
+            prerank (bool): Build the TF-IDF index (item_index) of the menu items' names and descriptions
+        """
+        self.db_file = db_file
+        self.prerank = prerank
+        self.catalog_version = None
+        self.candidate_pools = OrderedDict()
+        self.load_catalog()
+
+    def close(self):
+        """
+        Releases what the recommender holds - nothing unless a subclass holds a model
+        """
+
+    def load_catalog(self, force: bool = False) -> bool:
+        """
+        Loads the in-stock menu items and open restaurants from the shared catalog cache.
+        Does nothing if the cached catalog has not changed since the last load.
+
+        Args:
+            force (bool): Rebuild the DataFrames even if the catalog version is unchanged
+
+        Returns:
+            bool: True if the DataFrames were (re)built
+        """
+        catalog = get_catalog(self.db_file or db_file)
+        if not force and catalog.version == self.catalog_version:
+            return False
+        menu_items = pd.DataFrame(catalog.items, columns=MENU_ITEM_COLUMNS)
+        self.menu_items = menu_items[menu_items["instock"] == 1].reset_index(drop=True)
+        ## One allergen bitmask per item so filtering is a single vectorized AND per request
+        self.allergen_vocabulary = AllergenVocabulary()
+        self.menu_items["allergen_mask"] = self.allergen_vocabulary.encode(self.menu_items["allergens"])
+        ## Item ids by row position, so picks never touch the DataFrame
+        self.item_ids = self.menu_items["itm_id"].to_numpy()
+        self.item_index = ItemIndex(self.menu_items["name"].fillna("") + " " + self.menu_items["description"].fillna("")) \
+            if self.prerank else None
+        restaurants = pd.DataFrame(catalog.restaurants, columns=RESTAURANT_COLUMNS)
+        self.restaurants = restaurants[restaurants["status"] == "Open"][["rtr_id", "hours"]].reset_index(drop=True)
+        ## Parsed once per catalog version and shared by every generator in the process
+        self.opening_hours = catalog.view("opening_hours", lambda c: OpeningHoursIndex(
+            (r["rtr_id"], r["hours"]) for r in c.restaurants if r["status"] == "Open"))
+        ## Pools hold row positions into self.menu_items, so they die with it
+        self.candidate_pools.clear()
+        self.catalog_version = catalog.version
+        self.catalog_fingerprint = catalog.view("fingerprint", catalog_fingerprint)
+        return True
+
+    def candidate_pool(self, allergens: str, weekday: str, order_time: int) -> np.ndarray:
+        """
+        Finds the menu items that can be offered for a meal: from a restaurant open at the order time
+        and free of the given allergens. Pools are memoized (LRU) per set of open restaurants and
+        allergen mask, so every slot of a multi-day plan after the first is a dictionary lookup.
+
+        Args:
+            allergens (str): A comma-separated string of allergens to filter out
+            weekday (str): The day of the week (e.g., "Mon", "Tue", etc.)
+            order_time (int): The time the meal is typically ordered at in HHMM format (in 24H time)
 
-class MenuGenerator:
+        Returns:
+            np.ndarray: Row positions in self.menu_items of the candidate items
+        """
+        open_ids = self.opening_hours.open_at(weekday, order_time)
+        excluded = self.allergen_vocabulary.mask(allergens)
+        key = (open_ids, excluded)
+        pool = self.candidate_pools.get(key)
+        if pool is not None:
+            self.candidate_pools.move_to_end(key)
+            return pool
+
+        ## Keeps only items from restaurants that are open during the order time and removes items that contain allergens
+        keep = self.menu_items["rtr_id"].isin(open_ids).to_numpy() & \
+            allergen_free(self.menu_items["allergen_mask"].to_numpy(), excluded)
+        pool = np.flatnonzero(keep)
+
+        self.candidate_pools[key] = pool
+        if len(self.candidate_pools) > CANDIDATE_POOL_CACHE_SIZE:
+            self.candidate_pools.popitem(last=False)
+        return pool
+
+    def update_menu(self, menu: str, preferences: str, allergens: str, date: str, meal_numbers: List[int], number_of_days: int = 1, batch_size: int = 1) -> str:
+        """
+        Updates the menu string with a new menu item based on user preferences, allergens, date, and meal number
+        
+        Args:
+            menu (str): The current menu string (can be empty or None)
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to avoid
+            date (str): The date string in YYYY-MM-DD format
+            meal_number (List[int]): The list of meal numbers to generate (1 for breakfast, 2 for lunch, 3 for dinner). e.g. [1,2,3]
+            number_of_days (int): The number of days to generate meals for, past the {date} specified
+            batch_size (int): The number of meals planned per LLM call - 1 asks for each meal separately,
+                len(meal_numbers) plans a whole day per call
+        
+        Returns:
+            str: The updated menu string
+        """
+        ## Meals already on the menu are kept; only the missing slots are planned
+        slots = missing_slots(menu, date, meal_numbers, number_of_days)
+        return add_to_menu(menu, slots, self.plan_slots(preferences, allergens, slots, batch_size))
+
+    def update_plan(self, conn, usr_id: int, preferences: str, allergens: str, date: str, meal_numbers: List[int], number_of_days: int = 1, batch_size: int = 1,
+                    retention_days: int = None) -> List[Tuple[str, int, int]]:
+        """
+        Plans the missing meals of a date range in a user's MealPlan rows (see update_menu for the
+        string format). A legacy User.generated_menu string is migrated first. Only the requested
+        range is read, so extending a long plan by one day costs one day's lookups and generations.
+
+        Args:
+            conn (sqlite3.Connection): Active database connection
+            usr_id (int): The user whose plan is updated
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to avoid
+            date (str): The date string in YYYY-MM-DD format
+            meal_numbers (List[int]): The meal numbers to plan each day (1 for breakfast, 2 for lunch, 3 for dinner)
+            number_of_days (int): The number of days to plan, starting at {date}
+            batch_size (int): The number of meals planned per LLM call, as in update_menu
+            retention_days (int): Also delete the user's meals dated more than this many days ago - None keeps them
+
+        Returns:
+            List[Tuple[str, int, int]]: (date, meal_number, item_id) of each meal added - a slot planned
+                by someone else meanwhile keeps its meal and is left out
+        """
+        migrate_user(conn, usr_id)
+        if retention_days is not None:
+            prune_meals(conn, retention_start(retention_days), usr_id)
+        last = (datetime.date.fromisoformat(date) + datetime.timedelta(days=number_of_days - 1)).isoformat()
+        slots = missing_slots(None, date, meal_numbers, number_of_days, planned_slots(conn, usr_id, date, last))
+        if not slots:
+            return []
+        itm_ids = self.plan_slots(preferences, allergens, slots, batch_size)
+        return add_meals(conn, usr_id, [(day, meal_number, itm_id) for (day, _, meal_number), itm_id in zip(slots, itm_ids)])
+
+    def update_menus(self, plans: List[dict]) -> List[str]:
+        """
+        Updates several menus (e.g. for many users) at once, submitting every missing meal of every plan
+        to the LLM together so the model runs at batch size GENERATE_BATCH_SIZE instead of 1
+
+        Args:
+            plans (List[dict]): One dict per menu with the update_menu arguments: "menu", "preferences",
+                "allergens", "date", "meal_numbers" and optionally "number_of_days" (default 1)
+
+        Returns:
+            List[str]: The updated menu string for each plan, in order
+        """
+        slots_per_plan = [missing_slots(plan["menu"], plan["date"], plan["meal_numbers"], plan.get("number_of_days", 1))
+                          for plan in plans]
+        itm_ids = self.plan_many([{"preferences": plan["preferences"], "allergens": plan["allergens"], "slots": slots}
+                                  for plan, slots in zip(plans, slots_per_plan)])
+        return [add_to_menu(plan["menu"], slots, ids) for plan, slots, ids in zip(plans, slots_per_plan, itm_ids)]
+
+    def plan_slots(self, preferences: str, allergens: str, slots: List[Tuple[str, str, int]], batch_size: int = 1) -> List[int]:
+        """
+        Picks a menu item for each slot of one user
+
+        Args:
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to avoid
+            slots (List[Tuple[str, str, int]]): (date, weekday, meal_number) of each meal, from missing_slots
+            batch_size (int): The number of meals planned per call, for recommenders that batch
+
+        Returns:
+            List[int]: The item_id picked for each slot, in order
+        """
+        raise NotImplementedError
+
+    def plan_many(self, plans: List[dict]) -> List[List[int]]:
+        """
+        Picks menu items for the slots of several users at once, like update_menus
+
+        Args:
+            plans (List[dict]): One dict per user with "preferences", "allergens" and "slots"
+                ((date, weekday, meal_number) tuples, from missing_slots)
+
+        Returns:
+            List[List[int]]: The item_ids picked for each plan's slots, in order
+        """
+        raise NotImplementedError
+
+class MenuGenerator(Recommender):
     """
     MenuGenerator class that uses an LLM to generate menu items based on user preferences and restrictions
     """
     
-    def __init__(self, tokens: int = 500):
+    def __init__(self, tokens: int = 500, constrained: bool = False, ranked: bool = False, temperature: float = 0.0, db_file: str = None,
+                 precision: str = "fp32", num_threads: int = None, memo: RecommendationCache = None,
+                 context_tokens: int = None, prerank: bool = False):
         """
         Initializes the MenuGenerator with menu items and restaurants from the database and initializes
-        the local LLM.
+        the local LLM. The model weights are shared with every other MenuGenerator in the process.
         
         Args:
             tokens (int): The number of tokens to use for the LLM generation
+            constrained (bool): Restrict single-meal answers to the offered item ids (constrained decoding)
+                instead of generating up to {tokens} tokens and parsing them
+            ranked (bool): Pick single meals by scoring every offered item id with LLM.rank (one forward
+                pass, always valid) instead of generating text; takes precedence over constrained
+            temperature (float): Sampling temperature for ranked picks - 0 always takes the most likely item
+            db_file (str): The database to read the catalog from - the module's db_file if None
+            precision (str): LLM weight precision - "fp32", "bf16" or "int8" (see llm_toolkit.PRECISIONS)
+            num_threads (int): CPU threads the LLM may use - torch's default if None
+            memo (RecommendationCache): Reuse the pick for a meal whose (preferences, allergens, weekday,
+                meal, catalog) was planned before instead of asking the LLM again - off if None
+            context_tokens (int): Token budget of each prompt's menu item block - as many sampled items as
+                fit are offered (see ContextPacker) instead of ITEM_CHOICES per try; None keeps the item count
+            prerank (bool): Offer the candidates most similar to the preferences (TF-IDF, see ItemIndex)
+                instead of a random sample
         """
-        conn = create_connection(db_file)
-        self.menu_items = pd.read_sql_query("SELECT * FROM MenuItem WHERE instock == 1", conn)
-        self.restaurants = pd.read_sql_query("SELECT rtr_id, hours FROM Restaurant WHERE status==\"Open\"", conn)
-        close_connection(conn)
+        self.constrained = constrained
+        self.ranked = ranked
+        self.temperature = temperature
+        self.memo = memo
+        self.context_tokens = context_tokens
+        super().__init__(db_file, prerank)
         
-        self.generator = llm_toolkit.LLM(tokens=tokens)
+        self.generator = llm_toolkit.LLM(tokens=tokens, precision=precision, num_threads=num_threads)
+        ## The system prompt and the text before {preferences} are identical for every meal - encode them once
+        self.generator.cache_prefix(SYSTEM_TEMPLATE, PROMPT_TEMPLATE.split("{preferences}")[0])
+        self.generator.cache_prefix(SYSTEM_TEMPLATE, BATCH_PROMPT_TEMPLATE.split("{preferences}")[0])
+
+    def close(self):
+        """
+        Releases the generator's reference to the shared model, so the weights are freed once no
+        other MenuGenerator (and no preload) holds them
+        """
+        self.generator.close()
 
-    def __get_context(self, allergens: str, weekday: str, order_time: int, num_choices: int) -> str:
+    def load_catalog(self, force: bool = False) -> bool:
+        """
+        Loads the catalog (see Recommender.load_catalog) and serializes its items for prompts
+
+        Args:
+            force (bool): Rebuild the DataFrames even if the catalog version is unchanged
+
+        Returns:
+            bool: True if the DataFrames were (re)built
+        """
+        if not super().load_catalog(force):
+            return False
+        ## Context lines by row position, so prompts never touch the DataFrame
+        self.context_lines = context_lines(self.menu_items)
+        ## Needs the tokenizer, so it is built on first use (see __get_context)
+        self.context_packer = None
+        return True
+
+    def __get_context(self, allergens: str, weekday: str, order_time: int, num_choices: int, preferences: str = "") -> str:
         """
         Generates the context block for the LLM based on the provided allergens, date, and order time
 
@@ -208,41 +555,90 @@ class MenuGenerator:
             allergens (str): A comma-separated string of allergens to filter out
             weekday (str): The day of the week (e.g., "Mon", "Tue", etc.)
             order_time (int): The time the meal is typically ordered at in HHMM format (in 24H time)
-            num_choices (int): The maximum number of choices to provide in the context
-            item_ids (List[int]): The list of item_ids passed - used for checking validity
+            num_choices (int): The maximum number of choices to provide in the context - ignored when
+                packing by token budget (context_tokens), where retries draw a fresh sample instead
+            preferences (str): A comma-separated string of user preferences - the candidates most similar
+                to it are offered first if the generator preranks
         
         Returns:
             str: The context block for the LLM in CSV format
+            List[int]: The item_ids offered - used for checking validity
         """
         start = time.time()
-        
-        combined = pd.merge(self.menu_items, self.restaurants, on="rtr_id", how="left")
 
-        ## Removes restaurants that are closed during the order time
-        combined = filter_closed_restaurants(combined, weekday, order_time)
-        
-        ## Removes items that contain allergens
-        combined = filter_allergens(combined, allergens)
+        ## Items from open restaurants without the allergens (memoized)
+        pool = self.candidate_pool(allergens, weekday, order_time)
 
-        ## Randomly selects ITEM_CHOICES number of items to present to the LLM
-        choices = limit_scope(combined, num_choices)
+        if self.context_tokens is None:
+            if self.item_index is not None:
+                ## The ITEM_CHOICES items closest to the preferences - each retry widens the same ranking
+                rows = self.item_index.rank(pool, preferences)[:num_choices]
+            else:
+                ## Randomly selects ITEM_CHOICES number of items to present to the LLM
+                rows = pool[list(limit_scope(pool, num_choices))]
 
-        context_data = "item_id,name,description,price,calories\n"
-        
-        ## Create the context data with the chosen items
-        item_ids = []
-        for x in choices:
-            row = combined.iloc[x]
-            context_data += f"{row['itm_id']},{row['name']},{row['description']},{row['price']},{row['calories']}\n"
-            item_ids.append(row['itm_id'])
+            ## Create the context data with the chosen items
+            context_data = CONTEXT_HEADER + "".join(self.context_lines[rows])
+            item_ids = self.item_ids[rows].tolist()
+        else:
+            ## Offers the pool by similarity (or in random order), cut where the token budget runs out
+            if self.context_packer is None:
+                self.context_packer = ContextPacker(self.menu_items, self.generator.tokenizer)
+            order = self.item_index.rank(pool, preferences) if self.item_index is not None else np.random.permutation(pool)
+            rows = self.context_packer.pack(order, self.context_tokens)
+            context_data, item_ids = self.context_packer.context(rows)
 
         end = time.time()
         print("Context block generated in %.4f seconds" % (end - start))
         return context_data, item_ids
 
+    def __get_prompt(self, preferences: str, allergens: str, weekday: str, meal_number: int, num_choices: int) -> Tuple[str, List[int]]:
+        """
+        Fills PROMPT_TEMPLATE for one meal with a freshly sampled context block
+
+        Args:
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to filter out
+            weekday (str): The day of the week (e.g., "Mon", "Tue", etc.)
+            meal_number (int): The meal number (1 for breakfast, 2 for lunch, 3 for dinner)
+            num_choices (int): The maximum number of choices to provide in the context
+
+        Returns:
+            str: The user prompt for the LLM
+            List[int]: The item_ids offered in the prompt - used for checking validity
+        """
+        meal, order_time = get_meal_and_order_time(meal_number)
+        context, item_ids = self.__get_context(allergens, weekday, order_time, num_choices, preferences)
+
+        ## Initializes variables in prompt
+        prompt = PROMPT_TEMPLATE
+        prompt = prompt.replace("{preferences}", preferences)
+        prompt = prompt.replace("{context}", context)
+        prompt = prompt.replace("{meal}", meal)
+        return prompt, item_ids
+
+    def __memo_key(self, preferences: str, allergens: str, weekday: str, meal_number: int) -> str:
+        """
+        Builds the recommendation memo key for one meal
+
+        Args:
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to filter out
+            weekday (str): The day of the week (e.g., "Mon", "Tue", etc.)
+            meal_number (int): The meal number (1 for breakfast, 2 for lunch, 3 for dinner)
+
+        Returns:
+            str: The key, covering the catalog and how this generator picks
+        """
+        mode = f"ranked:{self.temperature}" if self.ranked else ("constrained" if self.constrained else "generate")
+        if self.prerank:
+            mode += ":prerank"
+        return recommendation_key(self.catalog_fingerprint, preferences, allergens, weekday, meal_number, mode)
+
     def __pick_menu_item(self, preferences: str, allergens: str, weekday: str, meal_number: int) -> int:
         """
-        Picks a menu item based on user preferences, allergens, date, and meal number
+        Picks a menu item based on user preferences, allergens, date, and meal number, answering from
+        the recommendation memo when the same meal was planned before
 
         Args:
             preferences (str): A comma-separated string of user preferences
@@ -253,24 +649,43 @@ class MenuGenerator:
         Returns:
             int: The item_id of the selected menu item
         """
-        meal, order_time = get_meal_and_order_time(meal_number)
+        if self.memo is None:
+            return self.__ask_menu_item(preferences, allergens, weekday, meal_number)
+        key = self.__memo_key(preferences, allergens, weekday, meal_number)
+        itm_id = self.memo.get(key)
+        if itm_id is None:
+            itm_id = self.__ask_menu_item(preferences, allergens, weekday, meal_number)
+            self.memo.put(key, itm_id)
+        return itm_id
+
+    def __ask_menu_item(self, preferences: str, allergens: str, weekday: str, meal_number: int) -> int:
+        """
+        Asks the LLM to pick a menu item based on user preferences, allergens, date, and meal number
+
+        Args:
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to filter out
+            weekday (str): The day of the week (e.g., "Mon", "Tue", etc.)
+            meal_number (int): The meal number (1 for breakfast, 2 for lunch, 3 for dinner)
 
+        Returns:
+            int: The item_id of the selected menu item
+        """
         num_choices = ITEM_CHOICES
 
+        ## Scoring the offered ids always yields a valid pick - no retries needed
+        if self.ranked:
+            prompt, item_ids = self.__get_prompt(preferences, allergens, weekday, meal_number, num_choices)
+            if len(item_ids) == 0:
+                raise RuntimeError("No menu items are available for this meal - every restaurant is closed or every item has an allergen")
+            scores = self.generator.rank(SYSTEM_TEMPLATE, prompt, item_ids)
+            return pick_by_scores(item_ids, scores, self.temperature)
+
         ## Tries to get output from LLM a number of times, increasing the number of options every time
         for x in range(MAX_LLM_TRIES):
-            context, item_ids = self.__get_context(allergens, weekday, order_time, num_choices)
-
-            ## Gets the prompt
-            system = SYSTEM_TEMPLATE
-            prompt = PROMPT_TEMPLATE
+            prompt, item_ids = self.__get_prompt(preferences, allergens, weekday, meal_number, num_choices)
 
-            ## Initializes variables in prompt
-            prompt = prompt.replace("{preferences}", preferences)
-            prompt = prompt.replace("{context}", context)
-            prompt = prompt.replace("{meal}", meal)
-
-            llm_output = self.generator.generate(system, prompt)
+            llm_output = self.generator.generate(SYSTEM_TEMPLATE, prompt, choices=item_ids if self.constrained else None)
             output = format_llm_output(llm_output)
             if output > 0 and output in item_ids:
                 return output
@@ -280,33 +695,259 @@ class MenuGenerator:
 LLM output:
 {llm_output}''')
     
-    def update_menu(self, menu: str, preferences: str, allergens: str, date: str, meal_numbers: List[int], number_of_days: int = 1) -> str:
+    def __pick_menu_items(self, preferences: str, allergens: str, slots: List[Tuple[str, str, int]]) -> List[int]:
         """
-        Updates the menu string with a new menu item based on user preferences, allergens, date, and meal number
-        
+        Picks menu items for several meals with a single LLM call, answering the meals already in the
+        recommendation memo without the LLM
+
+        Args:
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to filter out
+            slots (List[Tuple[str, str, int]]): (date, weekday, meal_number) for each meal to plan
+
+        Returns:
+            List[int]: The item_id picked for each slot, in order
+        """
+        if self.memo is not None:
+            ## Only the meals the memo cannot answer go into the prompt
+            keys = [self.__memo_key(preferences, allergens, weekday, meal_number) for _, weekday, meal_number in slots]
+            result = [self.memo.get(key) for key in keys]
+            todo = [i for i, itm_id in enumerate(result) if itm_id is None]
+            if todo:
+                picks = self.__ask_menu_items(preferences, allergens, [slots[i] for i in todo])
+                for i, itm_id in zip(todo, picks):
+                    result[i] = itm_id
+                    self.memo.put(keys[i], itm_id)
+            return result
+        return self.__ask_menu_items(preferences, allergens, slots)
+
+    def __ask_menu_items(self, preferences: str, allergens: str, slots: List[Tuple[str, str, int]]) -> List[int]:
+        """
+        Asks the LLM to pick menu items for several meals in a single call. Picks that are missing or not
+        among the item_ids offered for their meal are redone one at a time with __ask_menu_item.
+
+        Args:
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to filter out
+            slots (List[Tuple[str, str, int]]): (date, weekday, meal_number) for each meal to plan
+
+        Returns:
+            List[int]: The item_id picked for each slot, in order
+        """
+        meals = []
+        offered = []
+        for number, (date, weekday, meal_number) in enumerate(slots, start=1):
+            meal, order_time = get_meal_and_order_time(meal_number)
+            context, item_ids = self.__get_context(allergens, weekday, order_time, ITEM_CHOICES, preferences)
+            offered.append(item_ids)
+            meals.append(BATCH_MEAL_TEMPLATE.replace("{number}", str(number)).replace("{meal}", meal)
+                         .replace("{weekday}", weekday).replace("{date}", date).replace("{context}", context))
+
+        prompt = BATCH_PROMPT_TEMPLATE.replace("{preferences}", preferences)
+        prompt = prompt.replace("{meals}", "\n".join(meals))
+        picks = format_batch_llm_output(self.generator.generate(SYSTEM_TEMPLATE, prompt))
+
+        result = []
+        for number, (date, weekday, meal_number) in enumerate(slots, start=1):
+            itm_id = picks.get(number, LLM_ATTRIBUTE_ERROR)
+            if itm_id <= 0 or itm_id not in offered[number - 1]:
+                itm_id = self.__ask_menu_item(preferences, allergens, weekday, meal_number)
+            result.append(itm_id)
+        return result
+
+    def plan_slots(self, preferences: str, allergens: str, slots: List[Tuple[str, str, int]], batch_size: int = 1) -> List[int]:
+        """
+        Picks a menu item for each slot of one user
+
         Args:
-            menu (str): The current menu string (can be empty or None)
             preferences (str): A comma-separated string of user preferences
             allergens (str): A comma-separated string of allergens to avoid
-            date (str): The date string in YYYY-MM-DD format
-            meal_number (List[int]): The list of meal numbers to generate (1 for breakfast, 2 for lunch, 3 for dinner). e.g. [1,2,3]
-            number_of_days (int): The number of days to generate meals for, past the {date} specified
-        
+            slots (List[Tuple[str, str, int]]): (date, weekday, meal_number) of each meal, from missing_slots
+            batch_size (int): The number of meals planned per LLM call, as in update_menu
+
         Returns:
-            str: The updated menu string
+            List[int]: The item_id picked for each slot, in order
         """
-        next_date, current_weekday = get_weekday_and_increment(date)
-        for x in range(number_of_days):
-            for meal_number in meal_numbers:
-                if menu is None or len(menu) < 1:
-                    itm_id = self.__pick_menu_item(preferences, allergens, current_weekday, meal_number)
-                    menu = f"[{date},{itm_id},{meal_number}]"
-                elif re.search(fr"\[{date},\d+,{meal_number}\]", menu) is None:
-                    print(fr"\[{date},\d+,{meal_number}\]")
-                    print(menu)
-                    itm_id = self.__pick_menu_item(preferences, allergens, current_weekday, meal_number)
-                    menu = f"{menu},[{date},{itm_id},{meal_number}]"
-            date = next_date
-            next_date, current_weekday = get_weekday_and_increment(date)
-        return menu
-        
\ No newline at end of file
+        self.load_catalog()
+        itm_ids = []
+        batch_size = max(1, batch_size)
+        for start in range(0, len(slots), batch_size):
+            batch = slots[start:start + batch_size]
+            if len(batch) == 1:
+                _, weekday, meal_number = batch[0]
+                itm_ids.append(self.__pick_menu_item(preferences, allergens, weekday, meal_number))
+            else:
+                itm_ids.extend(self.__pick_menu_items(preferences, allergens, batch))
+        return itm_ids
+
+    def __pick_menu_items_batched(self, requests: List[Tuple[str, str, str, int]]) -> List[int]:
+        """
+        Picks one menu item per request, running the prompts through LLM.generate_batch in groups of
+        GENERATE_BATCH_SIZE. Requests whose answer is invalid are retried together with more choices,
+        like __pick_menu_item.
+
+        Args:
+            requests (List[Tuple[str, str, str, int]]): (preferences, allergens, weekday, meal_number) per meal
+
+        Returns:
+            List[int]: The item_id picked for each request, in order
+
+        Raises:
+            RuntimeError: if some request still has no valid answer after MAX_LLM_TRIES rounds
+        """
+        if self.ranked:
+            return [self.__pick_menu_item(*request) for request in requests]
+        results = [None] * len(requests)
+        keys = [self.__memo_key(*request) for request in requests] if self.memo is not None else None
+        if keys is not None:
+            results = [self.memo.get(key) for key in keys]
+        outputs = {}
+        pending = [i for i in range(len(requests)) if results[i] is None]
+        num_choices = ITEM_CHOICES
+        for x in range(MAX_LLM_TRIES):
+            for start in range(0, len(pending), GENERATE_BATCH_SIZE):
+                group = pending[start:start + GENERATE_BATCH_SIZE]
+                prompts = [self.__get_prompt(*requests[i], num_choices) for i in group]
+                llm_outputs = self.generator.generate_batch([SYSTEM_TEMPLATE] * len(group), [p for p, _ in prompts],
+                                                            [ids for _, ids in prompts] if self.constrained else None)
+                for i, (_, item_ids), llm_output in zip(group, prompts, llm_outputs):
+                    output = format_llm_output(llm_output)
+                    if output > 0 and output in item_ids:
+                        results[i] = output
+                        if keys is not None:
+                            self.memo.put(keys[i], output)
+                    outputs[i] = llm_output
+            pending = [i for i in pending if results[i] is None]
+            if not pending:
+                return results
+            ## If failed, try increasing the number of choices
+            num_choices += ITEM_CHOICES
+        raise RuntimeError(f'''LLM has failed {MAX_LLM_TRIES} times to generate {len(pending)} meal(s). This may be a critical error, a lack of options, or a bad prompt. 
+LLM output:
+{outputs[pending[0]]}''')
+
+    def plan_many(self, plans: List[dict]) -> List[List[int]]:
+        """
+        Picks menu items for the slots of several users at once, like update_menus
+
+        Args:
+            plans (List[dict]): One dict per user with "preferences", "allergens" and "slots"
+                ((date, weekday, meal_number) tuples, from missing_slots)
+
+        Returns:
+            List[List[int]]: The item_ids picked for each plan's slots, in order
+        """
+        self.load_catalog()
+        requests = [(plan["preferences"], plan["allergens"], weekday, meal_number)
+                    for plan in plans
+                    for _, weekday, meal_number in plan["slots"]]
+        itm_ids = self.__pick_menu_items_batched(requests)
+
+        picks = []
+        position = 0
+        for plan in plans:
+            picks.append(itm_ids[position:position + len(plan["slots"])])
+            position += len(plan["slots"])
+        return picks
+
+class ScoringRecommender(Recommender):
+    """
+    Picks menu items without a model: every candidate of a meal is scored at once by its TF-IDF
+    similarity to the preferences, how close its calories are to the meal's target and how often the
+    plan already uses it. Thousands of times cheaper than MenuGenerator, so whole-catalog bulk
+    planning needs no LLM.
+    """
+
+    def __init__(self, db_file: str = None, preference_weight: float = 1.0, calorie_weight: float = 0.5,
+                 variety_penalty: float = 1.0):
+        """
+        Loads the catalog and indexes it
+
+        Args:
+            db_file (str): The database to read the catalog from - the module's db_file if None
+            preference_weight (float): Weight of the preference similarity (0 to 1 per item)
+            calorie_weight (float): Weight of the calorie fit (0 to 1 per item, see MEAL_CALORIE_TARGETS)
+            variety_penalty (float): Subtracted per earlier pick of the same item in the plan
+        """
+        self.preference_weight = preference_weight
+        self.calorie_weight = calorie_weight
+        self.variety_penalty = variety_penalty
+        super().__init__(db_file, prerank=True)
+
+    def load_catalog(self, force: bool = False) -> bool:
+        """
+        Loads the catalog (see Recommender.load_catalog) and the items' calories as one array
+
+        Args:
+            force (bool): Rebuild the DataFrames even if the catalog version is unchanged
+
+        Returns:
+            bool: True if the DataFrames were (re)built
+        """
+        if not super().load_catalog(force):
+            return False
+        self.calories = pd.to_numeric(self.menu_items["calories"], errors="coerce").to_numpy(dtype=np.float64)
+        return True
+
+    def scores(self, pool: np.ndarray, similarity: np.ndarray, meal_number: int, picked: np.ndarray) -> np.ndarray:
+        """
+        Scores the candidates of one meal
+
+        Args:
+            pool (np.ndarray): Row positions of the candidates, from candidate_pool
+            similarity (np.ndarray): Every item's similarity to the preferences, by row position
+            meal_number (int): The meal number (1 for breakfast, 2 for lunch, 3 for dinner)
+            picked (np.ndarray): How often the plan already picked each item, by row position
+
+        Returns:
+            np.ndarray: One score per candidate - higher is better
+        """
+        target = MEAL_CALORIE_TARGETS[meal_number]
+        ## Items without calories get no calorie bonus
+        fit = np.nan_to_num(np.exp(-0.5 * ((self.calories[pool] - target) / CALORIE_TOLERANCE) ** 2))
+        return (self.preference_weight * similarity[pool] + self.calorie_weight * fit
+                - self.variety_penalty * picked[pool])
+
+    def plan_slots(self, preferences: str, allergens: str, slots: List[Tuple[str, str, int]], batch_size: int = 1) -> List[int]:
+        """
+        Picks the best-scoring menu item for each slot of one user, in order, so later slots see the
+        earlier picks in their variety penalty
+
+        Args:
+            preferences (str): A comma-separated string of user preferences
+            allergens (str): A comma-separated string of allergens to avoid
+            slots (List[Tuple[str, str, int]]): (date, weekday, meal_number) of each meal, from missing_slots
+            batch_size (int): Unused - every slot is scored without a model
+
+        Returns:
+            List[int]: The item_id picked for each slot, in order
+        """
+        self.load_catalog()
+        similarity = self.item_index.matrix @ self.item_index.vector(preferences)
+        picked = np.zeros(len(self.item_ids))
+        itm_ids = []
+        for _, weekday, meal_number in slots:
+            _, order_time = get_meal_and_order_time(meal_number)
+            pool = self.candidate_pool(allergens, weekday, order_time)
+            if len(pool) == 0:
+                raise RuntimeError("No menu items are available for this meal - every restaurant is closed or every item has an allergen")
+            row = pool[np.argmax(self.scores(pool, similarity, meal_number, picked))]
+            picked[row] += 1
+            itm_ids.append(int(self.item_ids[row]))
+        return itm_ids
+
+    def plan_many(self, plans: List[dict]) -> List[List[int]]:
+        """
+        Picks menu items for the slots of several users, like update_menus
+
+        Args:
+            plans (List[dict]): One dict per user with "preferences", "allergens" and "slots"
+                ((date, weekday, meal_number) tuples, from missing_slots)
+
+        Returns:
+            List[List[int]]: The item_ids picked for each plan's slots, in order
+        """
+        return [self.plan_slots(plan["preferences"], plan["allergens"], plan["slots"]) for plan in plans]
+
+## Recommenders a planning request can name (see menu_jobs.RECOMMENDER_KINDS)
+RECOMMENDERS = {"llm": MenuGenerator, "scoring": ScoringRecommender}
@@ -0,0 +1,169 @@
+import json
+import os
+import socket
+import time
+
+from proj2.sqlQueries import fetch_one, execute_query, execute_returning_id, transaction
+
+## Job states: queued -> running -> done | failed (running jobs of a dead worker go back to queued)
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+## Seconds a job may stay running before it is assumed its worker died and it is handed out again
+JOB_STALE_AFTER = 600.0
+
+## Runs of a job (including the one a dead worker abandoned) before it is marked failed
+JOB_MAX_ATTEMPTS = 3
+
+## Ways a job can be planned (keys of menu_generation.RECOMMENDERS) - jobs that name none use the worker's default
+RECOMMENDER_KINDS = ("llm", "scoring")
+DEFAULT_RECOMMENDER = "llm"
+
+JOB_COLUMNS = ("job_id", "usr_id", "params", "status", "error", "worker", "attempts",
+               "created_at", "started_at", "finished_at")
+
+JOB_TABLE_SQL = (
+    '''CREATE TABLE IF NOT EXISTS "MenuJob" (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usr_id INTEGER NOT NULL REFERENCES "User"(usr_id) ON DELETE CASCADE,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        error TEXT,
+        worker TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    )''',
+    'CREATE INDEX IF NOT EXISTS menu_job_status ON "MenuJob"(status, job_id)',
+    'CREATE INDEX IF NOT EXISTS menu_job_user ON "MenuJob"(usr_id, status)',
+)
+
+
+def ensure_job_table(conn):
+    """
+    Create the MenuJob table and its indexes if they do not exist yet.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+    Returns:
+        None
+    """
+    for statement in JOB_TABLE_SQL:
+        execute_query(conn, statement)
+
+
+def worker_name() -> str:
+    """
+    Identify this worker process in MenuJob.worker.
+    Returns:
+        str: "<hostname>:<pid>"
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _job_dict(row) -> dict | None:
+    """
+    Convert a MenuJob row into a dict with decoded params.
+    Args:
+        row (tuple | None): Row with the JOB_COLUMNS columns.
+    Returns:
+        dict | None: The job, or None if row is None.
+    """
+    if row is None:
+        return None
+    job = dict(zip(JOB_COLUMNS, row))
+    job["params"] = json.loads(job["params"])
+    return job
+
+
+def enqueue_job(conn, usr_id: int, params: dict) -> int | None:
+    """
+    Queue a menu-planning job for a user. An identical job that is still queued is reused
+    instead of queueing the same work twice.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        usr_id (int): The user whose menu is planned.
+        params (dict): update_menu arguments - {"date", "meal_numbers", "number_of_days"}.
+    Returns:
+        int | None: The job id, or None if the job could not be stored.
+    """
+    encoded = json.dumps(params, sort_keys=True)
+    with transaction(conn):
+        row = fetch_one(conn, 'SELECT job_id FROM "MenuJob" WHERE usr_id = ? AND status = ? AND params = ?',
+                        (usr_id, JOB_QUEUED, encoded))
+        if row is not None:
+            return row[0]
+        return execute_returning_id(conn, 'INSERT INTO "MenuJob"(usr_id, params, status, created_at) VALUES (?, ?, ?, ?)',
+                                    (usr_id, encoded, JOB_QUEUED, time.time()))
+
+
+def get_job(conn, job_id: int) -> dict | None:
+    """
+    Look up a job.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        job_id (int): The job identifier.
+    Returns:
+        dict | None: The job keyed by JOB_COLUMNS (params decoded), or None if it does not exist.
+    """
+    return _job_dict(fetch_one(conn, f'SELECT {", ".join(JOB_COLUMNS)} FROM "MenuJob" WHERE job_id = ?', (job_id,)))
+
+
+def claim_job(conn, worker: str) -> dict | None:
+    """
+    Atomically take the oldest queued job and mark it running. Jobs of users who already have
+    a running job are skipped, so two workers never rewrite the same user's menu at once.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        worker (str): Name of the claiming worker, see worker_name().
+    Returns:
+        dict | None: The claimed job, or None if there is nothing to do.
+    """
+    with transaction(conn):
+        row = fetch_one(conn, f'''SELECT {", ".join(JOB_COLUMNS)} FROM "MenuJob" WHERE status = ?
+                                  AND usr_id NOT IN (SELECT usr_id FROM "MenuJob" WHERE status = ?)
+                                  ORDER BY job_id LIMIT 1''', (JOB_QUEUED, JOB_RUNNING))
+        job = _job_dict(row)
+        if job is None:
+            return None
+        job.update(status=JOB_RUNNING, worker=worker, attempts=job["attempts"] + 1, started_at=time.time())
+        execute_query(conn, 'UPDATE "MenuJob" SET status = ?, worker = ?, attempts = ?, started_at = ? WHERE job_id = ?',
+                      (JOB_RUNNING, worker, job["attempts"], job["started_at"], job["job_id"]))
+    return job
+
+
+def finish_job(conn, job_id: int, error: str | None = None):
+    """
+    Mark a running job done, or failed with an error message.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        job_id (int): The job identifier.
+        error (str | None): Why the job failed; None if it succeeded.
+    Returns:
+        None
+    """
+    execute_query(conn, 'UPDATE "MenuJob" SET status = ?, error = ?, finished_at = ? WHERE job_id = ?',
+                  (JOB_DONE if error is None else JOB_FAILED, error, time.time(), job_id))
+
+
+def requeue_stale_jobs(conn, stale_after: float = JOB_STALE_AFTER, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+    """
+    Hand out jobs again whose worker stopped without finishing them, or fail them once they
+    have used up their attempts.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        stale_after (float): Seconds after which a running job is considered abandoned.
+        max_attempts (int): Attempts after which an abandoned job is marked failed.
+    Returns:
+        int: The number of jobs requeued or failed.
+    """
+    cutoff = time.time() - stale_after
+    with transaction(conn):
+        failed = execute_query(conn, '''UPDATE "MenuJob" SET status = ?, error = 'worker stopped', finished_at = ?
+                                        WHERE status = ? AND started_at < ? AND attempts >= ?''',
+                               (JOB_FAILED, time.time(), JOB_RUNNING, cutoff, max_attempts))
+        requeued = execute_query(conn, 'UPDATE "MenuJob" SET status = ?, worker = NULL WHERE status = ? AND started_at < ?',
+                                 (JOB_QUEUED, JOB_RUNNING, cutoff))
+    return (failed.rowcount if failed else 0) + (requeued.rowcount if requeued else 0)
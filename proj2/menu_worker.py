@@ -0,0 +1,181 @@
+"""
+Menu-planning worker: pulls jobs from the MenuJob table and plans the missing meals of the user's
+MealPlan with the job's recommender (see menu_generation.RECOMMENDERS). Run one or more with
+
+    python -m proj2.menu_worker [--db PATH] [--poll SECONDS] [--once]
+
+Planning throughput scales with the number of worker processes; web workers only queue jobs.
+"""
+import argparse
+import os
+import functools
+import signal
+import threading
+
+from proj2.sqlQueries import create_connection, close_connection, fetch_one
+from proj2.menu_jobs import (
+    DEFAULT_RECOMMENDER,
+    RECOMMENDER_KINDS,
+    claim_job,
+    ensure_job_table,
+    finish_job,
+    requeue_stale_jobs,
+    worker_name,
+)
+from proj2.meal_plan import ensure_meal_plan_table
+
+db_file = os.path.join(os.path.dirname(__file__), 'CSC510_DB.db')
+
+## Seconds an idle worker waits before looking for new jobs
+POLL_INTERVAL = 2.0
+
+
+def pick_recommender(generator, kind: str):
+    """
+    Find the recommender a job asked for.
+    Args:
+        generator (Recommender | dict): One recommender for every job, or a dict mapping a kind
+            ("llm", "scoring") to a recommender or to a factory that is called (and replaced by its
+            result) the first time a job needs it.
+        kind (str): The job's recommender kind.
+    Returns:
+        Recommender: The recommender to plan with.
+    Raises:
+        LookupError: If the worker has no recommender of that kind.
+    """
+    if not isinstance(generator, dict):
+        return generator
+    recommender = generator.get(kind)
+    if recommender is None:
+        raise LookupError(f"This worker has no {kind!r} recommender")
+    if not hasattr(recommender, "update_plan"):
+        recommender = generator[kind] = recommender()
+    return recommender
+
+
+def run_job(conn, generator, job: dict, batch_size: int = 1, default_recommender: str = DEFAULT_RECOMMENDER,
+            retention_days: int | None = None) -> str | None:
+    """
+    Plan one job's meals and store them. Meals are saved before the job is marked done, so a job
+    rerun after a crash only plans what is still missing.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        generator (Recommender | dict): What to plan with, see pick_recommender().
+        job (dict): A job returned by claim_job().
+        batch_size (int): Meals planned per LLM call, see MenuGenerator.update_menu.
+        default_recommender (str): The kind of recommender for jobs that do not name one.
+        retention_days (int | None): Also delete the user's meals older than this many days.
+    Returns:
+        str | None: The error message if the job failed, otherwise None.
+    """
+    params = job["params"]
+    try:
+        generator = pick_recommender(generator, params.get("recommender") or default_recommender)
+        user = fetch_one(conn, 'SELECT preferences, allergies FROM "User" WHERE usr_id = ?', (job["usr_id"],))
+        if user is None:
+            raise LookupError(f"User {job['usr_id']} not found")
+        preferences, allergies = user
+        generator.update_plan(conn, job["usr_id"], preferences or "", allergies or "", params["date"],
+                              params["meal_numbers"], params.get("number_of_days", 1), batch_size,
+                              retention_days=retention_days)
+        finish_job(conn, job["job_id"])
+        return None
+    except Exception as e:
+        print(e)
+        finish_job(conn, job["job_id"], str(e) or type(e).__name__)
+        return str(e) or type(e).__name__
+
+
+def run_worker(db_path: str = db_file, generator=None, poll_interval: float = POLL_INTERVAL,
+               once: bool = False, batch_size: int = 1, stop: threading.Event | None = None,
+               default_recommender: str = DEFAULT_RECOMMENDER, retention_days: int | None = None) -> int:
+    """
+    Process jobs until stopped (or, with once=True, until the queue is empty).
+    Args:
+        db_path (str): Path to the SQLite database file.
+        generator (Recommender | dict | None): What to plan with, see pick_recommender(); if None,
+            each kind of recommender is created the first time a job asks for it.
+        poll_interval (float): Seconds to wait when the queue is empty.
+        once (bool): Return as soon as there is no queued job instead of waiting for more.
+        batch_size (int): Meals planned per LLM call, see MenuGenerator.update_menu.
+        stop (threading.Event | None): Set to stop after the current job.
+        default_recommender (str): The kind of recommender for jobs that do not name one.
+        retention_days (int | None): Delete a job's user's meals older than this many days.
+    Returns:
+        int: The number of jobs processed.
+    """
+    stop = stop or threading.Event()
+    name = worker_name()
+    conn = create_connection(db_path)
+    processed = 0
+    try:
+        ensure_job_table(conn)
+        ensure_meal_plan_table(conn)
+        if generator is None:
+            from proj2.menu_generation import RECOMMENDERS
+            generator = {kind: functools.partial(factory, db_file=db_path) for kind, factory in RECOMMENDERS.items()}
+        while not stop.is_set():
+            requeue_stale_jobs(conn)
+            job = claim_job(conn, name)
+            if job is None:
+                if once:
+                    break
+                stop.wait(poll_interval)
+                continue
+            run_job(conn, generator, job, batch_size, default_recommender, retention_days)
+            processed += 1
+    finally:
+        close_connection(conn)
+    return processed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Menu planning worker for Meal Planner")
+    parser.add_argument('--db', type=str, default=db_file, help='SQLite database file to take jobs from')
+    parser.add_argument('--poll', type=float, default=POLL_INTERVAL, help='Seconds to wait when the queue is empty')
+    parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+    parser.add_argument('--tokens', type=int, default=500, help='Max tokens generated per LLM call')
+    parser.add_argument('--precision', type=str, default="fp32", choices=("fp32", "bf16", "int8"), help='LLM weight precision')
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads for LLM inference')
+    parser.add_argument('--memo', action='store_true', help='Reuse picks for identical meals instead of asking the LLM again')
+    parser.add_argument('--memo-db', type=str, default=None, help='SQLite file sharing memoized picks between workers')
+    parser.add_argument('--batch-size', type=int, default=1, help='Meals planned per LLM call')
+    parser.add_argument('--recommender', type=str, default=DEFAULT_RECOMMENDER, choices=RECOMMENDER_KINDS,
+                        help='Recommender for jobs that do not name one (the LLM is only loaded once a job needs it)')
+    parser.add_argument('--retention-days', type=int, default=None, help="Delete a planned user's meals older than this many days")
+    parser.add_argument('--prerank', action='store_true', help='Offer the items most similar to the preferences instead of a random sample')
+    parser.add_argument('--context-tokens', type=int, default=None, help='Token budget of the menu items offered per prompt')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    from proj2.menu_generation import MenuGenerator, ScoringRecommender
+    from proj2.recommendation_cache import RecommendationCache
+
+    stop = threading.Event()
+    ## Finish the current job on SIGTERM/SIGINT; an interrupted job would otherwise wait
+    ## JOB_STALE_AFTER seconds before another worker picks it up
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    memo = RecommendationCache(db_file=args.memo_db) if args.memo or args.memo_db else None
+    generators = {
+        "llm": functools.partial(MenuGenerator, tokens=args.tokens, db_file=args.db, precision=args.precision,
+                                 num_threads=args.threads, memo=memo, context_tokens=args.context_tokens,
+                                 prerank=args.prerank),
+        "scoring": functools.partial(ScoringRecommender, db_file=args.db),
+    }
+    ## The default kind is ready before the first job, so its model load is not billed to a job
+    pick_recommender(generators, args.recommender)
+    try:
+        count = run_worker(args.db, generators, args.poll, args.once, args.batch_size, stop, args.recommender,
+                           args.retention_days)
+        print(f"Processed {count} menu jobs")
+        if memo is not None:
+            print(f"Recommendation memo: {memo.stats()}")
+    finally:
+        for generator in generators.values():
+            if hasattr(generator, "close"):
+                generator.close()
+        if memo is not None:
+            memo.close()
@@ -0,0 +1,100 @@
+import json
+from bisect import bisect_right
+from typing import Iterable, Tuple
+
+## Days of the week used as keys in Restaurant.hours - same order as menu_generation.DAYS_OF_WEEK
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def parse_hours(hours) -> dict:
+    """
+    Parse a Restaurant.hours value into sorted, non-overlapping opening intervals per weekday
+
+    Args:
+        hours (str | dict | None): JSON like {"Mon": [open, close, open, close, ...], ...} in HHMM format
+
+    Returns:
+        dict: Maps weekday -> (opens, closes), two equally long ascending lists. Weekdays that are
+            missing, empty or malformed (odd number of times) are left out, i.e. treated as closed.
+    """
+    if isinstance(hours, str):
+        try:
+            hours = json.loads(hours)
+        except ValueError:
+            print("Unreadable opening times - cannot process")
+            return {}
+    if not isinstance(hours, dict):
+        return {}
+
+    parsed = {}
+    for weekday, times in hours.items():
+        if not times:
+            continue
+        if len(times) % 2 == 1:
+            print("Odd opening times - cannot process")
+            continue
+        ## Merge overlapping intervals so a single bisect finds the only candidate interval
+        merged = []
+        for start, end in sorted(zip(times[::2], times[1::2])):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        parsed[weekday] = ([start for start, _ in merged], [end for _, end in merged])
+    return parsed
+
+
+class OpeningHoursIndex:
+    """
+    Precomputed opening hours for a set of restaurants, answering "which restaurants are open at
+    (weekday, HHMM)" with one bisect per restaurant instead of re-parsing the hours JSON
+    """
+
+    def __init__(self, restaurants: Iterable[Tuple[int, str]]):
+        """
+        Parses every restaurant's hours once
+
+        Args:
+            restaurants (Iterable[Tuple[int, str]]): (rtr_id, hours JSON) pairs
+        """
+        self._days = {weekday: [] for weekday in WEEKDAYS}
+        for rtr_id, hours in restaurants:
+            for weekday, (opens, closes) in parse_hours(hours).items():
+                self._days.setdefault(weekday, []).append((rtr_id, opens, closes))
+        self._open_at = {}
+
+    def is_open(self, rtr_id: int, weekday: str, time: int) -> bool:
+        """
+        Checks whether one restaurant is open at the given time (opening and closing times inclusive)
+
+        Args:
+            rtr_id (int): The restaurant to check
+            weekday (str): The day of the week (e.g., "Mon", "Tue", etc.)
+            time (int): The time to check in HHMM format (24H time)
+
+        Returns:
+            bool: True if the restaurant is open
+        """
+        return rtr_id in self.open_at(weekday, time)
+
+    def open_at(self, weekday: str, time: int) -> frozenset:
+        """
+        Finds every restaurant that is open at the given time (opening and closing times inclusive)
+
+        Args:
+            weekday (str): The day of the week (e.g., "Mon", "Tue", etc.)
+            time (int): The time to check in HHMM format (24H time)
+
+        Returns:
+            frozenset: The rtr_ids of the open restaurants
+        """
+        key = (weekday, time)
+        result = self._open_at.get(key)
+        if result is None:
+            open_ids = []
+            for rtr_id, opens, closes in self._days.get(weekday, ()):
+                i = bisect_right(opens, time) - 1
+                if i >= 0 and closes[i] >= time:
+                    open_ids.append(rtr_id)
+            result = self._open_at[key] = frozenset(open_ids)
+        return result
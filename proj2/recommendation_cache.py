@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from proj2.sqlQueries import create_connection, close_connection, fetch_one, execute_query
+
+## Entries kept in memory (LRU)
+RECOMMENDATION_CACHE_SIZE = 4096
+
+RECOMMENDATION_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS "Recommendation" (
+    key TEXT PRIMARY KEY,
+    itm_id INTEGER NOT NULL,
+    created_at REAL NOT NULL
+)'''
+
+
+def _normalized(values) -> list:
+    """
+    Normalize a comma-separated string so equivalent spellings share a cache key.
+    Args:
+        values (str | None): e.g. "Spicy, vegan" - order, case and blank entries do not matter.
+    Returns:
+        list[str]: Sorted, de-duplicated, stripped and case-folded entries.
+    """
+    if not isinstance(values, str):
+        return []
+    return sorted({value.strip().casefold() for value in values.split(",") if value.strip()})
+
+
+def recommendation_key(catalog: str, preferences: str, allergens: str, weekday: str, meal_number: int,
+                       mode: str = "") -> str:
+    """
+    Hash everything that decides which item the model is offered and how it picks.
+    Args:
+        catalog (str): Fingerprint of the catalog the candidates come from, see catalog_fingerprint().
+        preferences (str): Comma-separated user preferences.
+        allergens (str): Comma-separated allergens to avoid.
+        weekday (str): The day of the week (e.g., "Mon").
+        meal_number (int): 1 for breakfast, 2 for lunch, 3 for dinner.
+        mode (str): How the generator picks (e.g. ranked/constrained settings).
+    Returns:
+        str: Hex sha1 digest.
+    """
+    payload = json.dumps([catalog, _normalized(preferences), _normalized(allergens), weekday, meal_number, mode])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class RecommendationCache:
+    """
+    Memo of LLM picks: an in-memory LRU, optionally backed by a SQLite table so the picks are
+    shared between processes (menu workers, bulk-planner processes) and survive restarts.
+    Keys include the catalog fingerprint, so a catalog change never serves stale picks.
+    """
+
+    def __init__(self, max_size: int = RECOMMENDATION_CACHE_SIZE, db_file: str | None = None):
+        """
+        Initializes an empty cache
+
+        Args:
+            max_size (int): Entries kept in memory.
+            db_file (str | None): SQLite database to persist picks in; memory only if None.
+        """
+        self.max_size = max_size
+        self.db_file = db_file
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _db(self):
+        """
+        The persistence connection, opened (and the table created) on first use. Lock must be held.
+        Returns:
+            sqlite3.Connection | None: None if the cache is memory only.
+        """
+        if self.db_file is None:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            ## a connection inherited across fork() must not be used by the child
+            self._conn = create_connection(self.db_file)
+            self._conn_pid = os.getpid()
+            execute_query(self._conn, RECOMMENDATION_TABLE_SQL)
+        return self._conn
+
+    def get(self, key: str) -> int | None:
+        """
+        Look up a pick, promoting persisted picks into memory.
+        Args:
+            key (str): From recommendation_key().
+        Returns:
+            int | None: The cached itm_id, or None on a miss.
+        """
+        with self._lock:
+            itm_id = self._entries.get(key)
+            if itm_id is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return itm_id
+            conn = self._db()
+            row = fetch_one(conn, 'SELECT itm_id FROM "Recommendation" WHERE key = ?', (key,)) if conn else None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db_hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key: str, itm_id: int):
+        """
+        Store a pick in memory and, if configured, in the database.
+        Args:
+            key (str): From recommendation_key().
+            itm_id (int): The picked item.
+        Returns:
+            None
+        """
+        with self._lock:
+            self._remember(key, itm_id)
+            conn = self._db()
+            if conn is not None:
+                execute_query(conn, 'INSERT OR REPLACE INTO "Recommendation"(key, itm_id, created_at) VALUES (?, ?, ?)',
+                              (key, itm_id, time.time()))
+
+    def _remember(self, key: str, itm_id: int):
+        """
+        Insert into the in-memory LRU, evicting the least recently used entry. Lock must be held.
+        """
+        self._entries[key] = itm_id
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """
+        Hit-rate metrics since the cache was created.
+        Returns:
+            dict: "hits" (of which "db_hits" came from SQLite), "misses", "hit_rate" and "size" (in memory).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "db_hits": self.db_hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0, "size": len(self._entries)}
+
+    def clear(self):
+        """
+        Forget every pick, in memory and in the database.
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries.clear()
+            conn = self._db()
+            if conn is not None:
+                execute_query(conn, 'DELETE FROM "Recommendation"')
+
+    def close(self):
+        """
+        Close the persistence connection.
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                close_connection(self._conn)
+            self._conn = None
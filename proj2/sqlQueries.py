@@ -1,11 +1,89 @@
+import os
+import logging
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 
+## Connection pool defaults - each process keeps at most DEFAULT_POOL_SIZE connections per database
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_TIMEOUT = 5.0
 
-def create_connection(db_file: str):
+logger = logging.getLogger(__name__)
+
+## Database-open profiles - PRAGMA name -> value, applied in order to every new connection
+## (pooled or from create_connection). "default" keeps SQLite's rollback journal and never
+## rewrites the database header. "concurrent" switches to WAL so readers are never blocked by a
+## writer, and sets busy_timeout so competing writers (e.g. several gunicorn workers) wait for the
+## lock instead of failing with "database is locked". journal_mode=WAL is persistent, so enable it
+## per deployment (PROJ2_DB_PROFILE=concurrent) rather than on the checked-in database.
+DB_PROFILES = {
+    "default": {
+        "foreign_keys": "ON",
+    },
+    "concurrent": {
+        "foreign_keys": "ON",
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "journal_size_limit": 64 * 1024 * 1024,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+    },
+}
+
+## Profile used when none is given - override with the PROJ2_DB_PROFILE environment variable
+DB_PROFILE = os.environ.get("PROJ2_DB_PROFILE", "default")
+
+## WAL checkpointing - how often the scheduler runs, and the WAL size that triggers a TRUNCATE
+CHECKPOINT_INTERVAL = 60.0
+CHECKPOINT_TRUNCATE_BYTES = 32 * 1024 * 1024
+
+
+def resolve_db_profile(profile=None) -> dict:
+    """
+    Look up the pragmas for a database-open profile.
+    Args:
+        profile (str | dict | None): A DB_PROFILES name, an explicit pragma dict, or None for DB_PROFILE.
+    Returns:
+        dict: PRAGMA name -> value, in the order they should be applied.
+    Raises:
+        ValueError: if profile names an unknown profile.
+    """
+    if profile is None:
+        profile = DB_PROFILE
+    if isinstance(profile, dict):
+        return dict(profile)
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}'. Choose one of {sorted(DB_PROFILES)}")
+    return dict(DB_PROFILES[profile])
+
+
+def apply_db_profile(conn, profile=None):
+    """
+    Apply a database-open profile's pragmas to a connection.
+    Args:
+        conn (sqlite3.Connection): Connection to configure.
+        profile (str | dict | None): See resolve_db_profile().
+    Returns:
+        None
+    Raises:
+        sqlite3.Error: if a pragma fails, or journal_mode could not be switched as requested.
+    """
+    for name, value in resolve_db_profile(profile).items():
+        row = conn.execute(f"PRAGMA {name}={value}").fetchone()
+        # journal_mode reports the mode actually in effect; SQLite falls back silently otherwise
+        if name == "journal_mode" and row and str(row[0]).lower() != str(value).lower():
+            raise sqlite3.OperationalError(f"journal_mode={value} was not applied (still {row[0]})")
+
+
+def create_connection(db_file: str, profile=None):
     """
     Create and return a connection to the specified SQLite database.
     Args:
         db_file (str): Path to the SQLite database file.
+        profile (str | dict | None): Database-open profile to apply (defaults to DB_PROFILE).
     Returns:
         sqlite3.Connection | None: Connection object if successful, None otherwise.
     """
@@ -14,6 +92,11 @@ def create_connection(db_file: str):
         conn = sqlite3.connect(db_file)
     except sqlite3.Error as e:
         print(e)
+        return conn
+    try:
+        apply_db_profile(conn, profile)
+    except sqlite3.Error as e:
+        logger.warning("Database profile not fully applied to %s: %s", db_file, e)
     return conn
 
 
@@ -29,9 +112,50 @@ def close_connection(conn):
         conn.close()
 
 
+## Connections currently inside an explicit transaction() block - id(conn) -> state dict with
+## "read_only" (outermost mode), "read_only_depth" (open read-only blocks), "error" and "writes"
+_transactions = {}
+
+## Callbacks notified with (conn, query) after a write statement has been committed
+_write_listeners = []
+
+
+def add_write_listener(callback):
+    """
+    Register a callback that is told about every committed write made through execute_query().
+    Args:
+        callback (Callable[[sqlite3.Connection, str], None]): Called with the connection and SQL text.
+    Returns:
+        None
+    """
+    if callback not in _write_listeners:
+        _write_listeners.append(callback)
+
+
+def _notify_writes(conn, queries):
+    """
+    Call every write listener for each committed query, never letting a listener break the caller.
+    Args:
+        conn (sqlite3.Connection): Connection the writes were committed on.
+        queries (list[str]): SQL text of the committed write statements.
+    Returns:
+        None
+    """
+    for query in queries:
+        for callback in list(_write_listeners):
+            try:
+                callback(conn, query)
+            except Exception as e:
+                print(e)
+
+
 def execute_query(conn, query: str, params=()):
     """
     Execute a single SQL query with optional parameters.
+
+    Writes are committed immediately unless the connection is inside a transaction() block.
+    Reads never open a transaction, so they never pay for a commit. A failed write outside a
+    transaction() rolls back the implicit transaction so the connection does not keep the lock.
     Args:
         conn (sqlite3.Connection): Active database connection.
         query (str): SQL query string to execute.
@@ -39,16 +163,110 @@ def execute_query(conn, query: str, params=()):
     Returns:
         sqlite3.Cursor | None: Cursor object if successful, None if an error occurred.
     """
+    state = _transactions.get(id(conn))
     try:
         cur = conn.cursor()
         cur.execute(query, params)
-        conn.commit()
+        if state is not None:
+            if cur.rowcount > 0:
+                if state["read_only_depth"] > 0:
+                    raise sqlite3.ProgrammingError("Write statement inside a read-only transaction")
+                state["writes"].append(query)
+        elif conn.in_transaction:
+            conn.commit()
+            _notify_writes(conn, [query])
         return cur
     except sqlite3.Error as e:
         print(e)
+        if state is not None:
+            if state["error"] is None:
+                state["error"] = e
+        elif conn.in_transaction:
+            conn.rollback()
         return None
 
 
+def execute_returning_id(conn, query: str, params=()):
+    """
+    Execute an INSERT and return the rowid of the new row in the same round trip.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        query (str): SQL INSERT statement to execute.
+        params (tuple, optional): Parameters to safely substitute into the query.
+    Returns:
+        int | None: The new row's id (cursor.lastrowid), or None if an error occurred.
+    """
+    cur = execute_query(conn, query, params)
+    if cur:
+        return cur.lastrowid
+    return None
+
+
+@contextmanager
+def transaction(conn, read_only: bool = False):
+    """
+    Group several statements into one explicit transaction.
+
+    Write transactions start with BEGIN IMMEDIATE so the write lock is taken up front (no
+    deadlocking lock upgrades between workers), and COMMIT on success. Read-only transactions
+    start with a deferred BEGIN to read from one consistent snapshot and always end with ROLLBACK,
+    so they never commit; a write inside one counts as a failed statement.
+
+    If the block raises, or any execute_query() inside it failed, everything is rolled back and
+    the error is raised, so callers never act on rows (or ids) that were not committed.
+
+    A read-only transaction() nested inside a write transaction joins it and reads its
+    uncommitted state. A write transaction() nested inside a read-only one is rejected.
+    Any implicit transaction already pending on the connection is committed first.
+    Args:
+        conn (sqlite3.Connection): Active database connection.
+        read_only (bool): Use the read-only fast path.
+    Yields:
+        sqlite3.Connection: The same connection, for convenience.
+    Raises:
+        sqlite3.DatabaseError: if a statement inside the block failed and it was rolled back.
+        sqlite3.ProgrammingError: if a write transaction is nested inside a read-only one.
+    """
+    key = id(conn)
+    state = _transactions.get(key)
+    if state is not None:
+        if state["read_only"] and not read_only:
+            raise sqlite3.ProgrammingError("Cannot open a write transaction inside a read-only one")
+        if read_only:
+            state["read_only_depth"] += 1
+        try:
+            yield conn
+        finally:
+            if read_only:
+                state["read_only_depth"] -= 1
+        return
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN" if read_only else "BEGIN IMMEDIATE")
+    state = _transactions[key] = {
+        "read_only": read_only,
+        "read_only_depth": 1 if read_only else 0,
+        "error": None,
+        "writes": [],
+    }
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        if read_only or state["error"] is not None:
+            conn.rollback()
+        else:
+            conn.commit()
+            _notify_writes(conn, state["writes"])
+    finally:
+        _transactions.pop(key, None)
+    if state["error"] is not None:
+        raise sqlite3.DatabaseError(f"Transaction rolled back: {state['error']}") from state["error"]
+
+
 def fetch_all(conn, query: str, params=()):
     """
     Execute a query and return all fetched rows.
@@ -79,3 +297,290 @@ def fetch_one(conn, query: str, params=()):
     if cur:
         return cur.fetchone()
     return None
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of reusable SQLite connections for a single database file.
+
+    Connections are opened lazily, initialized with the database-open profile, health-checked
+    when borrowed and rolled back when returned. A pool that is inherited across a fork
+    (e.g. gunicorn pre-fork workers) discards the parent's connections and starts fresh.
+    """
+
+    def __init__(self, db_file: str, max_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_POOL_TIMEOUT, profile=None):
+        """
+        Initializes an empty pool for the given database file
+
+        Args:
+            db_file (str): Path to the SQLite database file.
+            max_size (int): Maximum number of open connections (idle + borrowed).
+            timeout (float): Seconds acquire() waits for a free connection before giving up.
+            profile (str | dict | None): Database-open profile applied to each new connection (defaults to DB_PROFILE).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.db_file = db_file
+        self.max_size = max_size
+        self.timeout = timeout
+        self.profile = resolve_db_profile(profile)
+        self._cond = threading.Condition()
+        self._idle = []
+        self._borrowed = 0
+        self._pid = os.getpid()
+
+    def _open(self) -> sqlite3.Connection:
+        """
+        Open a new connection and apply the pool's profile.
+        Returns:
+            sqlite3.Connection: A freshly initialized connection.
+        Raises:
+            sqlite3.Error: if the connection cannot be opened or the profile cannot be applied.
+        """
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        try:
+            apply_db_profile(conn, self.profile)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    @staticmethod
+    def _healthy(conn) -> bool:
+        """
+        Check that a pooled connection is still usable.
+        Args:
+            conn (sqlite3.Connection): Connection to probe.
+        Returns:
+            bool: True if a trivial query succeeds, False otherwise.
+        """
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _reset_after_fork(self):
+        """
+        Forget connections inherited from a parent process. Must be called with the lock held.
+        """
+        if self._pid != os.getpid():
+            self._idle = []
+            self._borrowed = 0
+            self._pid = os.getpid()
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Borrow a connection, opening a new one if the pool is below max_size.
+        Returns:
+            sqlite3.Connection: A healthy connection that must be passed back to release().
+        Raises:
+            TimeoutError: if no connection became available within the pool timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._reset_after_fork()
+            while not self._idle and self._borrowed >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No pooled connection for {self.db_file} after {self.timeout}s")
+                self._cond.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            # Reserve the slot now; probing or opening happens outside the lock
+            self._borrowed += 1
+        try:
+            if conn is not None:
+                if self._healthy(conn):
+                    return conn
+                close_connection(conn)
+            return self._open()
+        except BaseException:
+            self._free_slot()
+            raise
+
+    def _free_slot(self):
+        """
+        Give back a slot reserved by acquire() that did not end up holding a connection.
+        """
+        with self._cond:
+            self._borrowed = max(self._borrowed - 1, 0)
+            self._cond.notify()
+
+    def release(self, conn):
+        """
+        Return a borrowed connection to the pool, rolling back any open transaction.
+        Args:
+            conn (sqlite3.Connection): Connection previously returned by acquire().
+        Returns:
+            None
+        """
+        if conn is None:
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                # Borrowed before a fork - this process does not own a slot for it
+                close_connection(conn)
+                return
+            self._borrowed = max(self._borrowed - 1, 0)
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.append(conn)
+            except sqlite3.Error:
+                close_connection(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that borrows a connection for the duration of a with-block.
+        Yields:
+            sqlite3.Connection: A pooled connection, released automatically on exit.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """
+        Close every idle connection. Borrowed connections are closed when released later.
+        Returns:
+            None
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            close_connection(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_file: str, **kwargs) -> ConnectionPool:
+    """
+    Return the process-wide connection pool for a database file, creating it on first use.
+    Args:
+        db_file (str): Path to the SQLite database file.
+        **kwargs: Passed to ConnectionPool when the pool is first created.
+    Returns:
+        ConnectionPool: The shared pool for db_file.
+    """
+    key = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_file, **kwargs)
+        return pool
+
+
+def close_pools():
+    """
+    Close the idle connections of every pool created by get_pool() and forget the pools.
+    Returns:
+        None
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+class CheckpointScheduler:
+    """
+    Background thread that periodically checkpoints a WAL-mode database so the -wal file
+    does not grow without bound between SQLite's automatic checkpoints.
+
+    A PASSIVE checkpoint runs every interval; once the WAL file exceeds truncate_bytes a
+    TRUNCATE checkpoint is attempted to shrink it back to zero.
+    """
+
+    def __init__(self, db_file: str, interval: float = CHECKPOINT_INTERVAL,
+                 truncate_bytes: int = CHECKPOINT_TRUNCATE_BYTES):
+        """
+        Initializes a stopped scheduler for the given database file
+
+        Args:
+            db_file (str): Path to the SQLite database file.
+            interval (float): Seconds between checkpoints.
+            truncate_bytes (int): WAL size in bytes above which a TRUNCATE checkpoint is used.
+        """
+        self.db_file = db_file
+        self.interval = interval
+        self.truncate_bytes = truncate_bytes
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def checkpoint(self):
+        """
+        Run a single checkpoint now.
+        Returns:
+            tuple | None: (busy, wal_frames, checkpointed_frames) from SQLite, or None if skipped/failed.
+        """
+        if not os.path.exists(self.db_file):
+            return None
+        wal_file = self.db_file + "-wal"
+        wal_size = os.path.getsize(wal_file) if os.path.exists(wal_file) else 0
+        mode = "TRUNCATE" if wal_size > self.truncate_bytes else "PASSIVE"
+        with get_pool(self.db_file).connection() as conn:
+            self.last_result = fetch_one(conn, f"PRAGMA wal_checkpoint({mode})")
+        return self.last_result
+
+    def _run(self):
+        """
+        Thread body: checkpoint every interval until stop() is called.
+        """
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print(e)
+
+    def start(self):
+        """
+        Start the background thread if it is not already running.
+        Returns:
+            None
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sqlite-checkpoint", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread and wait for it to exit.
+        Returns:
+            None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_schedulers = {}
+
+
+def start_checkpoint_scheduler(db_file: str, **kwargs) -> CheckpointScheduler:
+    """
+    Start (once per process) a CheckpointScheduler for a database file.
+    Args:
+        db_file (str): Path to the SQLite database file.
+        **kwargs: Passed to CheckpointScheduler when it is first created.
+    Returns:
+        CheckpointScheduler: The running scheduler for db_file.
+    """
+    key = (os.path.abspath(db_file), os.getpid())
+    with _pools_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = _schedulers[key] = CheckpointScheduler(db_file, **kwargs)
+    scheduler.start()
+    return scheduler
@@ -59,8 +59,9 @@ def temp_db_path():
     fd, path = tempfile.mkstemp(suffix=".db")
     os.close(fd)
     yield path
-    with contextlib.suppress(OSError):
-        os.remove(path)
+    for leftover in (path, path + "-wal", path + "-shm"):
+        with contextlib.suppress(OSError):
+            os.remove(leftover)
 
 @pytest.fixture(scope="session")
 def app(temp_db_path):
@@ -0,0 +1,70 @@
+import gzip
+import json
+
+from proj2.sqlQueries import create_connection, close_connection, execute_query
+
+
+def test_api_requires_login(client):
+    r = client.get("/api/restaurants")
+    assert r.status_code == 401
+    assert r.get_json() == {"ok": False, "error": "login_required"}
+
+
+def test_api_restaurants_field_selection(client, seed_minimal_data, login_session):
+    r = client.get("/api/restaurants?fields=rtr_id,name")
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["ok"] is True
+    assert {"rtr_id": seed_minimal_data["rtr_id"], "name": "Cafe One"} in body["data"]
+    assert all(set(row) == {"rtr_id", "name"} for row in body["data"])
+
+
+def test_api_rejects_unknown_field_and_bad_limit(client, seed_minimal_data, login_session):
+    assert client.get("/api/restaurants?fields=password_HS").status_code == 400
+    assert client.get("/api/restaurants?limit=0").status_code == 400
+    assert client.get("/api/restaurants?cursor=abc").status_code == 400
+
+
+def test_api_items_cursor_pagination(client, seed_minimal_data, login_session):
+    rtr_id = seed_minimal_data["rtr_id"]
+    seen = []
+    cursor = None
+    while True:
+        url = f"/api/restaurants/{rtr_id}/items?limit=1&fields=itm_id"
+        if cursor is not None:
+            url += f"&cursor={cursor}"
+        body = client.get(url).get_json()
+        assert len(body["data"]) <= 1
+        seen += [row["itm_id"] for row in body["data"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    full = client.get(f"/api/restaurants/{rtr_id}/items").get_json()["data"]
+    assert seen == [row["itm_id"] for row in full]
+    assert len(seen) >= 2
+
+
+def test_api_items_unknown_restaurant_404(client, seed_minimal_data, login_session):
+    assert client.get("/api/restaurants/999999/items").status_code == 404
+
+
+def test_api_items_gzip_when_accepted(client, temp_db_path, seed_minimal_data, login_session):
+    rtr_id = seed_minimal_data["rtr_id"]
+    conn = create_connection(temp_db_path)
+    try:
+        for i in range(30):
+            execute_query(conn, '''
+              INSERT INTO "MenuItem"(rtr_id,name,description,price,calories,instock,allergens)
+              VALUES (?, ?, ?, 500, 100, 1, "")
+            ''', (rtr_id, f"Gz {i}", "x" * 40))
+        r = client.get(f"/api/restaurants/{rtr_id}/items?limit=200", headers={"Accept-Encoding": "gzip"})
+        assert r.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in r.headers["Vary"]
+        names = [row["name"] for row in json.loads(gzip.decompress(r.data))["data"]]
+        assert "Gz 29" in names
+
+        plain = client.get(f"/api/restaurants/{rtr_id}/items?limit=200")
+        assert "Content-Encoding" not in plain.headers
+    finally:
+        execute_query(conn, 'DELETE FROM "MenuItem" WHERE name LIKE \'Gz %\'')
+        close_connection(conn)
@@ -0,0 +1,59 @@
+import json
+
+from proj2.sqlQueries import create_connection, close_connection, execute_query, execute_returning_id
+
+
+def test_orders_page_revalidates_with_304(client, seed_minimal_data, login_session):
+    first = client.get("/orders")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "private" in first.headers["Cache-Control"]
+    assert "no-cache" in first.headers["Cache-Control"]
+    assert first.headers.get("Last-Modified")
+
+    again = client.get("/orders", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_restaurants_page_honors_if_modified_since(client, seed_minimal_data, login_session):
+    first = client.get("/restaurants")
+    assert first.status_code == 200
+    again = client.get("/restaurants", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert again.status_code == 304
+
+
+def test_catalog_change_changes_etag(client, temp_db_path, seed_minimal_data, login_session):
+    etag = client.get("/orders").headers["ETag"]
+    conn = create_connection(temp_db_path)
+    try:
+        execute_query(conn, 'UPDATE "Restaurant" SET phone = COALESCE(phone, \'\') || \'0\' WHERE rtr_id = ?',
+                      (seed_minimal_data["rtr_id"],))
+    finally:
+        close_connection(conn)
+    resp = client.get("/orders", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_receipt_etag_tracks_order_row(client, temp_db_path, seed_minimal_data, login_session):
+    conn = create_connection(temp_db_path)
+    try:
+        ord_id = execute_returning_id(conn, 'INSERT INTO "Order"(rtr_id, usr_id, details, status) VALUES (?,?,?,?)',
+                                      (seed_minimal_data["rtr_id"], seed_minimal_data["usr_id"],
+                                       json.dumps({"items": []}), "Ordered"))
+    finally:
+        close_connection(conn)
+
+    first = client.get(f"/orders/{ord_id}/receipt.pdf")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get(f"/orders/{ord_id}/receipt.pdf", headers={"If-None-Match": etag}).status_code == 304
+
+    conn = create_connection(temp_db_path)
+    try:
+        execute_query(conn, 'UPDATE "Order" SET status = ? WHERE ord_id = ?', ("Delivered", ord_id))
+    finally:
+        close_connection(conn)
+    assert client.get(f"/orders/{ord_id}/receipt.pdf", headers={"If-None-Match": etag}).status_code == 200
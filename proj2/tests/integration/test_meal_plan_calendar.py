@@ -0,0 +1,25 @@
+from proj2.sqlQueries import create_connection, close_connection, execute_query, fetch_one
+from proj2.meal_plan import load_plan
+
+
+def test_calendar_reads_meal_plan_and_migrates_legacy_menu(client, temp_db_path, seed_minimal_data, login_session):
+    usr_id = seed_minimal_data["usr_id"]
+    conn = create_connection(temp_db_path)
+    before = fetch_one(conn, 'SELECT generated_menu FROM "User" WHERE usr_id = ?', (usr_id,))[0]
+    try:
+        item = fetch_one(conn, 'SELECT itm_id, name FROM "MenuItem" WHERE rtr_id = ? ORDER BY itm_id', (seed_minimal_data["rtr_id"],))
+        ## earlier tests may have migrated the seeded menu already
+        execute_query(conn, 'DELETE FROM "MealPlan" WHERE usr_id = ?', (usr_id,))
+        execute_query(conn, 'UPDATE "User" SET generated_menu = ? WHERE usr_id = ?', (f"[2025-11-02,{item[0]},1]", usr_id))
+
+        r = client.get("/2025/11")
+        assert r.status_code == 200
+        assert f'title="Breakfast: {item[1]}"' in r.get_data(as_text=True)
+        assert fetch_one(conn, 'SELECT generated_menu FROM "User" WHERE usr_id = ?', (usr_id,)) == (None,)
+        assert load_plan(conn, usr_id) == {"2025-11-02": [{"itm_id": item[0], "meal": 1}]}
+
+        assert f'title="Breakfast: {item[1]}"' not in client.get("/2025/12").get_data(as_text=True)
+    finally:
+        execute_query(conn, 'DELETE FROM "MealPlan" WHERE usr_id = ?', (usr_id,))
+        execute_query(conn, 'UPDATE "User" SET generated_menu = ? WHERE usr_id = ?', (before, usr_id))
+        close_connection(conn)
@@ -0,0 +1,65 @@
+from proj2.sqlQueries import create_connection, close_connection, execute_query, fetch_one
+from proj2.menu_worker import run_worker
+from proj2.meal_plan import load_plan, save_meals
+
+
+class FakeGenerator:
+    def update_plan(self, conn, usr_id, preferences, allergens, date, meal_numbers, number_of_days=1, batch_size=1,
+                    retention_days=None):
+        meals = [(date, m, 1000 + m) for m in meal_numbers]
+        save_meals(conn, usr_id, meals)
+        return meals
+
+
+def test_menu_job_requires_login(client):
+    assert client.post("/api/menu/jobs", json={}).status_code == 401
+    assert client.get("/api/menu/jobs/1").status_code == 401
+
+
+def test_menu_job_rejects_bad_input(client, seed_minimal_data, login_session):
+    for body in ({"date": "11/03/2025"}, {"meal_numbers": [4]}, {"number_of_days": 0}, {"meal_numbers": "x"},
+                 {"recommender": "gpt"}):
+        r = client.post("/api/menu/jobs", json=body)
+        assert r.status_code == 400, body
+        assert r.get_json()["error"] == "invalid_input"
+
+
+def test_menu_job_enqueue_poll_and_run(client, temp_db_path, seed_minimal_data, login_session):
+    conn = create_connection(temp_db_path)
+    before = fetch_one(conn, 'SELECT generated_menu FROM "User" WHERE usr_id = ?', (seed_minimal_data["usr_id"],))[0]
+    try:
+        r = client.post("/api/menu/jobs", json={"date": "2025-11-03", "meal_numbers": [3, 1]})
+        assert r.status_code == 202
+        job = r.get_json()["data"]
+        assert job["status"] == "queued"
+        assert job["params"] == {"date": "2025-11-03", "meal_numbers": [1, 3], "number_of_days": 1}
+        assert r.headers["Location"].endswith(f"/api/menu/jobs/{job['job_id']}")
+        scored = client.post("/api/menu/jobs", json={"date": "2025-11-04", "recommender": "scoring"}).get_json()["data"]
+        assert scored["params"]["recommender"] == "scoring"
+
+        assert run_worker(temp_db_path, FakeGenerator(), once=True) == 2
+
+        polled = client.get(f"/api/menu/jobs/{job['job_id']}").get_json()["data"]
+        assert polled["status"] == "done"
+        plan = load_plan(conn, seed_minimal_data["usr_id"], "2025-11-03", "2025-11-04")
+        assert plan["2025-11-03"] == [{"itm_id": 1001, "meal": 1}, {"itm_id": 1003, "meal": 3}]
+        assert len(plan["2025-11-04"]) == 3
+    finally:
+        execute_query(conn, 'DELETE FROM "MealPlan" WHERE usr_id = ?', (seed_minimal_data["usr_id"],))
+        execute_query(conn, 'UPDATE "User" SET generated_menu = ? WHERE usr_id = ?', (before, seed_minimal_data["usr_id"]))
+        close_connection(conn)
+
+
+def test_menu_job_of_another_user_is_hidden(client, temp_db_path, seed_minimal_data, login_session):
+    conn = create_connection(temp_db_path)
+    try:
+        execute_query(conn, '''INSERT INTO "User"(first_name,last_name,email,phone,password_HS,wallet,preferences,allergies,generated_menu)
+                               VALUES ("Other","User","jobs-other@x.com","5550000","x",0,"","","")''')
+        other = fetch_one(conn, 'SELECT usr_id FROM "User" WHERE email = ?', ("jobs-other@x.com",))[0]
+        job_id = execute_query(conn, '''INSERT INTO "MenuJob"(usr_id, params, status, created_at)
+                                        VALUES (?, '{}', 'done', 0)''', (other,)).lastrowid
+        assert client.get(f"/api/menu/jobs/{job_id}").status_code == 404
+        assert client.get("/api/menu/jobs/999999").status_code == 404
+    finally:
+        execute_query(conn, 'DELETE FROM "User" WHERE email = ?', ("jobs-other@x.com",))
+        close_connection(conn)
@@ -6,6 +6,7 @@ import pandas as pd
 import proj2.menu_generation as menu_generation
 from proj2.sqlQueries import *
 from proj2.Flask_app import parse_generated_menu
+from proj2.recommendation_cache import RecommendationCache
 
 db_file = os.path.join(os.path.dirname(__file__), '../../CSC510_DB.db')
 
@@ -212,4 +213,30 @@ def test_MenuGenerator_partial_duplicate_correct_meals():
     parse_partial_duplicate = parse_generated_menu(menugenerator_partial_duplicate)
 
     assert parse_partial_duplicate["2025-10-16"][0]["meal"] == 2
-    assert parse_partial_duplicate["2025-10-16"][1]["meal"] == 3
\ No newline at end of file
+    assert parse_partial_duplicate["2025-10-16"][1]["meal"] == 3
+menugenerator_batched_menus = generator.update_menus([
+    {"menu": None, "preferences": "high protein,low carb", "allergens": "Peanuts,Shellfish", "date": "2025-10-14", "meal_numbers": [1, 2, 3]},
+    {"menu": "[2025-10-14,5,1]", "preferences": "vegetarian", "allergens": "", "date": "2025-10-14", "meal_numbers": [1, 2], "number_of_days": 2},
+])
+
+def test_MenuGenerator_update_menus_valid_items():
+    for menu in menugenerator_batched_menus:
+        for day in parse_generated_menu(menu).values():
+            for entry in day:
+                assert entry["itm_id"] == 5 or menu_items[menu_items["itm_id"] == entry["itm_id"]].shape[0] == 1
+
+def test_MenuGenerator_update_menus_correct_meals():
+    first = parse_generated_menu(menugenerator_batched_menus[0])
+    second = parse_generated_menu(menugenerator_batched_menus[1])
+    assert [e["meal"] for e in first["2025-10-14"]] == [1, 2, 3]
+    assert second["2025-10-14"][0] == {"itm_id": 5, "meal": 1}
+    assert [e["meal"] for e in second["2025-10-14"]] == [1, 2]
+    assert [e["meal"] for e in second["2025-10-15"]] == [1, 2]
+
+def test_MenuGenerator_memo_answers_identical_requests():
+    memo_generator = menu_generation.MenuGenerator(memo=RecommendationCache())
+    first = memo_generator.update_menu(None, "high protein,low carb", "Peanuts,Shellfish", "2025-10-14", [1, 2, 3])
+    second = memo_generator.update_menu(None, "low carb, High Protein", "shellfish,peanuts", "2025-10-14", [1, 2, 3])
+    assert first == second
+    assert memo_generator.memo.stats()["hits"] == 3
+    memo_generator.close()
@@ -38,4 +38,52 @@ def test_prompt():
         re.search(match, output).group(2)
         assert False
     except Exception:
-        assert True
\ No newline at end of file
+        assert True
+
+def test_generate_batch_matches_generate_format():
+    outputs = test_generator.generate_batch(["This is a test", "This is a longer test context"], ["test", "another test"])
+    match = r"<\|start_of_role\|>assistant<\|end_of_role\|>(.*)<\|end_of_text\|>"
+    assert len(outputs) == 2
+    for output in outputs:
+        assert re.search(match, output, re.DOTALL) is not None, "Unable to get batched LLM output from llm_toolkit"
+
+def test_generate_batch_empty():
+    assert test_generator.generate_batch([], []) == []
+
+def test_cache_prefix_reuse_keeps_output_format():
+    prefix_generator = llm_toolkit.LLM(tokens = 100)
+    assert prefix_generator.cache_prefix(menu_generation.SYSTEM_TEMPLATE, "Choose a meal for a customer") > 0
+    output = prefix_generator.generate(menu_generation.SYSTEM_TEMPLATE, "Choose a meal for a customer based on their preferences: vegan")
+    match = r"<\|start_of_role\|>assistant<\|end_of_role\|>(.*)<\|end_of_text\|>"
+    assert re.search(match, output, re.DOTALL) is not None
+    # either the cached prefix was reused, or the model rejected it and caching was switched off
+    assert prefix_generator.prefill_tokens_saved > 0 or prefix_generator.prefixes == []
+
+def test_token_trie_allowed():
+    trie = llm_toolkit.TokenTrie([[1, 2, 0], [1, 3, 0], [4, 0]])
+    assert sorted(trie.allowed([])) == [1, 4]
+    assert sorted(trie.allowed([1])) == [2, 3]
+    assert trie.allowed([1, 2, 0]) == []
+    assert trie.allowed([9]) == []
+    assert trie.depth == 3
+
+def test_generate_constrained_to_choices():
+    output = test_generator.generate(menu_generation.SYSTEM_TEMPLATE, "Pick an item id: 262 or 110", choices=[262, 110])
+    assert menu_generation.format_llm_output(output) in (262, 110)
+
+def test_rank_scores_every_candidate():
+    scores = test_generator.rank(menu_generation.SYSTEM_TEMPLATE, "Pick an item id: 262 or 110", [262, 110, 7])
+    assert len(scores) == 3
+    assert all(score <= 0 for score in scores)
+    assert test_generator.rank(menu_generation.SYSTEM_TEMPLATE, "anything", []) == []
+
+def test_reduced_precision_modes_generate():
+    for precision in ("bf16", "int8"):
+        generator = llm_toolkit.LLM(tokens = 20, precision = precision, num_threads = 2)
+        try:
+            output = generator.generate(menu_generation.SYSTEM_TEMPLATE, "Pick an item id: 262 or 110", choices=[262, 110])
+            assert menu_generation.format_llm_output(output) in (262, 110)
+            assert generator.generated_tokens > 0
+        finally:
+            generator.close()
+    assert "ibm-granite/granite-4.0-h-350M:int8" not in llm_toolkit.loaded_models()
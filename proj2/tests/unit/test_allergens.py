@@ -0,0 +1,40 @@
+import numpy as np
+
+from proj2.allergens import AllergenVocabulary, allergen_free, split_allergens
+
+
+def test_split_allergens_normalizes_and_handles_missing():
+    assert split_allergens("Gluten, Soy,,Sesame ") == ["gluten", "soy", "sesame"]
+    assert split_allergens(None) == []
+    assert split_allergens(float("nan")) == []
+    assert split_allergens("") == []
+
+
+def test_encode_assigns_one_bit_per_allergen():
+    vocab = AllergenVocabulary()
+    masks = vocab.encode(["Gluten, Soy", None, "soy", "Fish"])
+    assert masks.dtype == np.uint64
+    assert len(vocab) == 3
+    assert masks.tolist() == [0b011, 0, 0b010, 0b100]
+
+
+def test_mask_ignores_unknown_allergens():
+    vocab = AllergenVocabulary(["Gluten", "Soy"])
+    assert vocab.mask("Soy, Kiwi") == vocab.bits["soy"]
+    assert vocab.mask(None) == 0
+    assert len(vocab) == 2
+
+
+def test_allergen_free_excludes_any_overlap():
+    vocab = AllergenVocabulary()
+    masks = vocab.encode(["Gluten, Soy", "", "Peanuts", "Soy"])
+    assert allergen_free(masks, vocab.mask("Soy")).tolist() == [False, True, True, False]
+    assert allergen_free(masks, vocab.mask("")).tolist() == [True] * 4
+
+
+def test_large_vocabulary_falls_back_to_python_ints():
+    vocab = AllergenVocabulary()
+    masks = vocab.encode([f"a{i}" for i in range(70)])
+    assert masks.dtype == object
+    safe = allergen_free(masks, vocab.mask("a69"))
+    assert safe.sum() == 69 and not safe[69]
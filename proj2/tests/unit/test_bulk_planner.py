@@ -0,0 +1,84 @@
+import pytest
+
+from proj2.sqlQueries import create_connection, close_connection, execute_query, fetch_all
+from proj2.bulk_planner import plan_all, write_meals
+from proj2.meal_plan import ensure_meal_plan_table
+
+PARAMS = {"date": "2025-11-03", "meal_numbers": [1], "number_of_days": 1}
+
+
+class FakeGenerator:
+    def plan_many(self, plans):
+        if any(plan["preferences"] == "fail" for plan in plans):
+            raise RuntimeError("shard failed")
+        return [[len(plan["preferences"])] * len(plan["slots"]) for plan in plans]
+
+
+def fake_factory(db_path, **options):
+    return FakeGenerator()
+
+
+@pytest.fixture()
+def db(tmp_path):
+    path = (tmp_path / "bulk.sqlite").as_posix()
+    conn = create_connection(path)
+    execute_query(conn, '''CREATE TABLE "User"(usr_id INTEGER PRIMARY KEY AUTOINCREMENT, preferences TEXT,
+                           allergies TEXT, generated_menu TEXT)''')
+    for i in range(1, 8):
+        execute_query(conn, 'INSERT INTO "User"(preferences, allergies, generated_menu) VALUES (?, "", NULL)', ("x" * i,))
+    ensure_meal_plan_table(conn)
+    yield path, conn
+    close_connection(conn)
+
+
+def meals(conn):
+    return fetch_all(conn, 'SELECT usr_id, date, meal, itm_id FROM "MealPlan" ORDER BY usr_id, date, meal')
+
+
+def test_plan_all_in_process_with_batched_commits(db):
+    path, conn = db
+    lines = []
+    stats = plan_all(path, PARAMS, workers=0, shard_size=3, commit_every=2, factory=fake_factory, report=lines.append)
+    assert (stats["users"], stats["meals"], stats["skipped"], stats["failed"]) == (7, 7, 0, 0)
+    assert meals(conn) == [(i, "2025-11-03", 1, i) for i in range(1, 8)]
+    assert len(lines) == 3 and lines[-1].startswith("Planned 7/7 users")
+
+
+def test_plan_all_process_pool(db):
+    path, conn = db
+    stats = plan_all(path, PARAMS, workers=2, shard_size=2, factory=fake_factory, report=None)
+    assert stats["meals"] == 7
+    assert meals(conn) == [(i, "2025-11-03", 1, i) for i in range(1, 8)]
+
+
+def test_failed_shard_is_counted_and_others_are_written(db):
+    path, conn = db
+    execute_query(conn, 'UPDATE "User" SET preferences = "fail" WHERE usr_id = 1')
+    stats = plan_all(path, PARAMS, workers=0, shard_size=3, factory=fake_factory, report=None)
+    assert (stats["meals"], stats["failed"]) == (4, 3)
+    assert [row[0] for row in meals(conn)] == [4, 5, 6, 7]
+
+
+def test_planned_and_legacy_meals_are_kept(db):
+    path, conn = db
+    execute_query(conn, 'UPDATE "User" SET generated_menu = "[2025-11-03,9,1]" WHERE usr_id = 2')
+    execute_query(conn, 'INSERT INTO "MealPlan"(usr_id, date, meal, itm_id) VALUES (3, "2025-11-03", 1, 8)')
+    stats = plan_all(path, PARAMS, workers=0, factory=fake_factory, report=None)
+    assert (stats["users"], stats["meals"]) == (5, 5)
+    assert meals(conn)[1:3] == [(2, "2025-11-03", 1, 9), (3, "2025-11-03", 1, 8)]
+    assert fetch_all(conn, 'SELECT generated_menu FROM "User" WHERE usr_id = 2') == [(None,)]
+
+
+def test_write_meals_skips_slots_planned_meanwhile(db):
+    _, conn = db
+    execute_query(conn, 'INSERT INTO "MealPlan"(usr_id, date, meal, itm_id) VALUES (2, "2025-11-03", 1, 9)')
+    assert write_meals(conn, [(1, [("2025-11-03", 1, 5)]), (2, [("2025-11-03", 1, 6), ("2025-11-03", 3, 6)])]) == 2
+    assert meals(conn) == [(1, "2025-11-03", 1, 5), (2, "2025-11-03", 1, 9), (2, "2025-11-03", 3, 6)]
+
+
+def test_plan_all_prunes_old_meals_first(db):
+    path, conn = db
+    execute_query(conn, 'INSERT INTO "MealPlan"(usr_id, date, meal, itm_id) VALUES (1, "2000-01-01", 1, 8)')
+    stats = plan_all(path, PARAMS, workers=0, factory=fake_factory, report=None, retention_days=30)
+    assert (stats["pruned"], stats["meals"]) == (1, 7)
+    assert all(row[1] == "2025-11-03" for row in meals(conn))
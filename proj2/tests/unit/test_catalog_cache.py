@@ -0,0 +1,121 @@
+import sqlite3
+
+import pytest
+
+from proj2.catalog_cache import CatalogCache, close_catalog_caches, get_catalog_cache
+from proj2.sqlQueries import close_pools, create_connection, close_connection, execute_query, transaction
+
+
+@pytest.fixture(autouse=True)
+def _cleanup():
+    yield
+    close_catalog_caches()
+    close_pools()
+
+
+@pytest.fixture()
+def db_path(tmp_path):
+    path = (tmp_path / "catalog.sqlite").as_posix()
+    conn = create_connection(path)
+    conn.executescript('''
+        CREATE TABLE "Restaurant" (rtr_id INTEGER PRIMARY KEY, name TEXT, description TEXT, phone TEXT,
+            email TEXT, address TEXT, city TEXT, state TEXT, zip TEXT, hours TEXT, status TEXT);
+        CREATE TABLE "MenuItem" (itm_id INTEGER PRIMARY KEY, rtr_id INTEGER, name TEXT, description TEXT,
+            price INTEGER, calories INTEGER, instock INTEGER, restock TEXT, allergens TEXT);
+        INSERT INTO "Restaurant"(rtr_id, name, status) VALUES (1, 'Cafe', 'Open');
+        INSERT INTO "MenuItem"(itm_id, rtr_id, name, price, calories, instock) VALUES (1, 1, 'Soup', 500, 200, 1);
+        INSERT INTO "MenuItem"(itm_id, rtr_id, name, price, calories, instock) VALUES (2, 1, 'Pie', 700, 400, 0);
+    ''')
+    close_connection(conn)
+    return path
+
+
+def test_snapshot_is_served_from_memory_until_invalidated(db_path):
+    cache = CatalogCache(db_path)
+    first = cache.get()
+    assert first.version == 1
+    assert [m["name"] for m in first.in_stock_items] == ["Soup"]
+    assert set(first.items_by_id) == {1, 2}
+    assert cache.get() is first
+
+    cache.invalidate()
+    assert cache.get() is first  # re-read found identical rows
+    assert first.version == 1
+
+
+def test_snapshot_is_reread_after_ttl(db_path):
+    cache = CatalogCache(db_path, ttl=0)
+    first = cache.get()
+    loaded_at = first.loaded_at
+    assert cache.get() is first
+    assert first.loaded_at > loaded_at
+
+
+def test_commit_from_another_connection_is_noticed(db_path):
+    cache = CatalogCache(db_path, check_interval=0)
+    before = cache.get()
+    other = sqlite3.connect(db_path)
+    try:
+        other.execute('UPDATE "MenuItem" SET price = 550 WHERE itm_id = 1')
+        other.commit()
+    finally:
+        other.close()
+    after = cache.get()
+    assert after.version == before.version + 1
+    assert after.items_by_id[1]["price"] == 550
+    cache.close()
+
+
+def test_get_catalog_cache_normalizes_path(db_path, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    assert get_catalog_cache("catalog.sqlite") is get_catalog_cache(db_path)
+
+
+def test_catalog_write_invalidates_shared_cache(db_path):
+    cache = get_catalog_cache(db_path)
+    before = cache.get()
+    conn = create_connection(db_path)
+    try:
+        execute_query(conn, 'UPDATE "MenuItem" SET instock = 1 WHERE itm_id = 2')
+    finally:
+        close_connection(conn)
+    after = cache.get()
+    assert after.version > before.version
+    assert len(after.in_stock_items) == 2
+
+
+def test_non_catalog_write_keeps_cache(db_path):
+    cache = get_catalog_cache(db_path)
+    before = cache.get()
+    conn = create_connection(db_path)
+    try:
+        execute_query(conn, 'CREATE TABLE "Order"(ord_id INTEGER PRIMARY KEY, details TEXT)')
+        execute_query(conn, 'INSERT INTO "Order"(details) VALUES (\'MenuItem\')')
+    finally:
+        close_connection(conn)
+    assert cache.get() is before
+
+
+def test_catalog_write_in_transaction_invalidates_after_commit(db_path):
+    cache = get_catalog_cache(db_path)
+    before = cache.get()
+    conn = create_connection(db_path)
+    try:
+        with transaction(conn):
+            execute_query(conn, 'INSERT INTO "Restaurant"(rtr_id, name) VALUES (2, \'Deli\')')
+            assert cache.get() is before
+    finally:
+        close_connection(conn)
+    assert 2 in cache.get().restaurants_by_id
+
+
+def test_view_is_memoized_per_snapshot(db_path):
+    cache = CatalogCache(db_path)
+    calls = []
+    snapshot = cache.get()
+    build = lambda c: calls.append(1) or len(c.items)
+    assert snapshot.view("count", build) == 2
+    assert snapshot.view("count", build) == 2
+    assert calls == [1]
+    cache.invalidate()
+    assert cache.get() is snapshot  # unchanged rows keep the memoized views
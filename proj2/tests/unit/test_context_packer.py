@@ -0,0 +1,64 @@
+import csv
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from proj2.context_packer import CONTEXT_HEADER, ContextPacker, truncate_text
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word (commas split too), like a tiny BPE."""
+
+    def encode(self, text, add_special_tokens=True):
+        return text.replace(",", " , ").split()
+
+    def decode(self, tokens):
+        return " ".join(tokens).replace(" , ", ", ")
+
+
+def items():
+    return pd.DataFrame({
+        "itm_id": [10, 20, 30, 40],
+        "name": ["Soup", "Burger", "Salad", "Pie"],
+        "description": ["Hot tomato soup.", "Beef patty, cheese, pickles and a very long story about the farm it came from",
+                        "Greens.", None],
+        "price": [500, 1200, 800, 600],
+        "calories": [200, 900, 150, 450],
+    })
+
+
+def test_truncate_text_is_deterministic():
+    tokenizer = WordTokenizer()
+    assert truncate_text(tokenizer, "one two three", 3) == "one two three"
+    assert truncate_text(tokenizer, "one two three four", 2) == "one two..."
+    assert truncate_text(tokenizer, None, 2) is None
+
+
+def test_packer_cuts_descriptions_and_counts_lines():
+    packer = ContextPacker(items(), WordTokenizer(), description_tokens=4)
+    assert packer.lines[1] == '20,Burger,"Beef patty, cheese...",1200,900\n'
+    assert packer.lines[0] == "10,Soup,Hot tomato soup.,500,200\n"
+    assert packer.costs.tolist() == [len(WordTokenizer().encode(line)) for line in packer.lines]
+
+
+def test_pack_takes_the_prefix_that_fits():
+    packer = ContextPacker(items(), WordTokenizer(), description_tokens=4)
+    order = np.array([2, 0, 1, 3])
+    budget = packer.header_cost + packer.costs[2] + packer.costs[0]
+    assert packer.pack(order, budget).tolist() == [2, 0]
+    assert packer.pack(order, budget - 1).tolist() == [2]
+    assert packer.pack(order, 10 ** 6).tolist() == [2, 0, 1, 3]
+    ## one item is always offered, even if it alone is over budget
+    assert packer.pack(order, 0).tolist() == [2]
+    assert packer.pack(np.array([], dtype=int), 100).tolist() == []
+
+
+def test_context_is_valid_csv_with_item_ids():
+    packer = ContextPacker(items(), WordTokenizer(), description_tokens=4)
+    context, item_ids = packer.context(np.array([1, 3]))
+    assert item_ids == [20, 40]
+    assert context.startswith(CONTEXT_HEADER)
+    rows = list(csv.reader(StringIO(context)))
+    assert rows[1] == ["20", "Burger", "Beef patty, cheese...", "1200", "900"]
+    assert rows[2] == ["40", "Pie", "", "600", "450"]
@@ -0,0 +1,40 @@
+import numpy as np
+
+from proj2.item_index import ItemIndex, tokenize
+
+TEXTS = [
+    "Spicy Ramen Rich pork broth with noodles and chili oil",
+    "Garden Salad Fresh greens with vinaigrette",
+    "Vegan Curry Chickpeas and vegetables in a spicy coconut sauce",
+    "Cheeseburger Beef patty with cheddar",
+]
+
+
+def test_tokenize_normalizes_words():
+    assert tokenize("Spicy NOODLES, no Peanuts & the glass") == ["spicy", "noodle", "peanut", "glass"]
+    assert tokenize(None) == []
+
+
+def test_rows_are_unit_tf_idf_vectors():
+    index = ItemIndex(TEXTS)
+    assert index.matrix.dtype == np.float32
+    assert np.allclose(np.linalg.norm(index.matrix, axis=1), 1.0)
+    assert index.vocabulary["spicy"] < index.vocabulary["chili"]  # more frequent terms first
+    assert ItemIndex(TEXTS, max_features=5).matrix.shape == (4, 5)
+
+
+def test_rank_puts_matching_items_first():
+    index = ItemIndex(TEXTS)
+    rows = np.arange(4)
+    assert index.rank(rows, "vegan, spicy")[0] == 2
+    assert set(index.rank(rows, "spicy")[:2]) == {0, 2}
+    assert index.rank(np.array([3, 1, 0]), "noodles")[0] == 0
+    scores = index.scores(rows, "beef burger")
+    assert scores.argmax() == 3 and scores[1] == 0
+
+
+def test_rank_without_matches_keeps_every_row():
+    index = ItemIndex(TEXTS)
+    ranked = index.rank(np.array([0, 1, 2, 3]), "sushi")
+    assert sorted(ranked.tolist()) == [0, 1, 2, 3]
+    assert not index.vector("").any()
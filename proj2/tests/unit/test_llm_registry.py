@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import proj2.llm_toolkit as llm_toolkit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
+
+
+@pytest.fixture(autouse=True)
+def fake_loader(monkeypatch):
+    loads = []
+
+    def load(name, precision="fp32"):
+        loads.append(name if precision == "fp32" else f"{name}:{precision}")
+        return f"tokenizer:{name}", object(), "cpu"
+
+    monkeypatch.setattr(llm_toolkit, "_load_model", load)
+    llm_toolkit.unload_models()
+    yield loads
+    llm_toolkit.unload_models()
+
+
+def test_import_does_not_import_torch():
+    code = "import sys, proj2.llm_toolkit, proj2.menu_generation; print('torch' in sys.modules, 'transformers' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_model_is_loaded_once_and_shared(fake_loader):
+    first = llm_toolkit.acquire_model("m")
+    second = llm_toolkit.acquire_model("m")
+    assert fake_loader == ["m"]
+    assert first[1] is second[1]
+    assert llm_toolkit.loaded_models() == {"m": 2}
+
+
+def test_model_is_unloaded_with_last_reference(fake_loader):
+    llm_toolkit.acquire_model("m")
+    llm_toolkit.acquire_model("m")
+    llm_toolkit.release_model("m")
+    assert llm_toolkit.loaded_models() == {"m": 1}
+    llm_toolkit.release_model("m")
+    assert llm_toolkit.loaded_models() == {}
+    llm_toolkit.release_model("m")
+    llm_toolkit.acquire_model("m")
+    assert fake_loader == ["m", "m"]
+
+
+def test_preloaded_model_stays_loaded(fake_loader):
+    llm_toolkit.preload_model("m")
+    assert llm_toolkit.loaded_models() == {"m": 0}
+    llm_toolkit.acquire_model("m")
+    llm_toolkit.release_model("m")
+    assert llm_toolkit.loaded_models() == {"m": 0}
+    assert fake_loader == ["m"]
+
+
+def test_preload_from_env(fake_loader, monkeypatch):
+    monkeypatch.delenv(llm_toolkit.PRELOAD_ENV, raising=False)
+    llm_toolkit.preload_from_env()
+    assert fake_loader == []
+    monkeypatch.setenv(llm_toolkit.PRELOAD_ENV, "1, other, 1:int8, org/model:bf16")
+    llm_toolkit.preload_from_env()
+    assert fake_loader == [llm_toolkit.DEFAULT_MODEL, "other", f"{llm_toolkit.DEFAULT_MODEL}:int8", "org/model:bf16"]
+
+
+def test_each_precision_is_a_separate_model(fake_loader):
+    llm_toolkit.acquire_model("m")
+    llm_toolkit.acquire_model("m", "int8")
+    llm_toolkit.acquire_model("m", "int8")
+    assert llm_toolkit.loaded_models() == {"m": 1, "m:int8": 2}
+    llm_toolkit.release_model("m", "int8")
+    llm_toolkit.release_model("m", "int8")
+    assert llm_toolkit.loaded_models() == {"m": 1}
+    with pytest.raises(ValueError):
+        llm_toolkit.acquire_model("m", "fp8")
+
+
+def test_llm_close_releases_its_reference(fake_loader):
+    llm = llm_toolkit.LLM(tokens=10, model_name="m", precision="bf16")
+    other = llm_toolkit.LLM(tokens=10, model_name="m", precision="bf16")
+    assert llm.model is other.model and llm.device == "cpu"
+    llm.close()
+    llm.close()
+    assert llm_toolkit.loaded_models() == {"m:bf16": 1}
+    other.close()
+    assert llm_toolkit.loaded_models() == {}
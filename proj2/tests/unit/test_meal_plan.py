@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+
+from proj2.sqlQueries import create_connection, close_connection, execute_query, fetch_one
+from proj2.meal_plan import (
+    add_meals,
+    ensure_meal_plan_table,
+    load_plan,
+    migrate_generated_menus,
+    migrate_user,
+    parse_menu_entries,
+    planned_slots,
+    prune_meals,
+    retention_start,
+    save_meals,
+)
+
+
+@pytest.fixture()
+def conn(tmp_path):
+    conn = create_connection((tmp_path / "plan.sqlite").as_posix())
+    execute_query(conn, 'CREATE TABLE "User"(usr_id INTEGER PRIMARY KEY AUTOINCREMENT, generated_menu TEXT)')
+    execute_query(conn, '''INSERT INTO "User"(generated_menu) VALUES ('[2025-11-02,1,3],[2025-11-03,2],[2025-11-02,5,3]')''')
+    execute_query(conn, '''INSERT INTO "User"(generated_menu) VALUES ('')''')
+    ensure_meal_plan_table(conn)
+    yield conn
+    close_connection(conn)
+
+
+def test_parse_menu_entries_defaults_to_dinner():
+    assert parse_menu_entries("[2025-11-02, 1, 1],[2025-11-03,22]") == [("2025-11-02", 1, 1), ("2025-11-03", 22, 3)]
+    assert parse_menu_entries(None) == [] and parse_menu_entries("garbage") == []
+
+
+def test_migrate_user_moves_string_once(conn):
+    assert migrate_user(conn, 1) == 2
+    assert fetch_one(conn, 'SELECT generated_menu FROM "User" WHERE usr_id = 1') == (None,)
+    assert load_plan(conn, 1) == {"2025-11-02": [{"itm_id": 1, "meal": 3}], "2025-11-03": [{"itm_id": 2, "meal": 3}]}
+    assert migrate_user(conn, 1) == 0
+    assert migrate_user(conn, 2) == 0 and migrate_user(conn, 99) == 0
+
+
+def test_load_plan_and_planned_slots_respect_range(conn):
+    save_meals(conn, 2, [("2025-10-31", 1, 4), ("2025-11-01", 2, 5), ("2025-11-30", 1, 6), ("2025-11-30", 3, 7)])
+    plan = load_plan(conn, 2, "2025-11-01", "2025-11-30")
+    assert list(plan) == ["2025-11-01", "2025-11-30"]
+    assert plan["2025-11-30"] == [{"itm_id": 6, "meal": 1}, {"itm_id": 7, "meal": 3}]
+    assert planned_slots(conn, 2, "2025-10-31", "2025-11-01") == {("2025-10-31", 1), ("2025-11-01", 2)}
+
+
+def test_save_meals_keeps_existing_slots(conn):
+    assert save_meals(conn, 2, [("2025-11-02", 1, 4)]) == 1
+    assert save_meals(conn, 2, [("2025-11-02", 1, 9), ("2025-11-02", 2, 9)]) == 1
+    assert load_plan(conn, 2)["2025-11-02"] == [{"itm_id": 4, "meal": 1}, {"itm_id": 9, "meal": 2}]
+
+
+def test_migrate_generated_menus_and_user_delete_cascade(conn):
+    assert migrate_generated_menus(conn) == 2
+    execute_query(conn, 'DELETE FROM "User" WHERE usr_id = 1')
+    assert load_plan(conn, 1) == {}
+
+
+def test_add_meals_returns_only_new_slots(conn):
+    save_meals(conn, 2, [("2025-11-02", 1, 4)])
+    assert add_meals(conn, 2, [("2025-11-02", 1, 9), ("2025-11-03", 1, 9)]) == [("2025-11-03", 1, 9)]
+
+
+def test_prune_meals_before_retention_start(conn):
+    save_meals(conn, 1, [("2025-10-01", 1, 4), ("2025-11-01", 1, 5)])
+    save_meals(conn, 2, [("2025-10-01", 1, 4)])
+    assert retention_start(31, datetime.date(2025, 11, 1)) == "2025-10-01"
+    assert prune_meals(conn, "2025-10-02", usr_id=1) == 1
+    assert list(load_plan(conn, 2)) == ["2025-10-01"]
+    assert prune_meals(conn, "2025-10-02") == 1
+    assert list(load_plan(conn, 1)) == ["2025-11-01"] and load_plan(conn, 2) == {}
@@ -0,0 +1,122 @@
+import pytest
+
+from proj2.sqlQueries import create_connection, close_connection, execute_query, fetch_all, fetch_one
+from proj2.meal_plan import save_meals
+from proj2.menu_jobs import (
+    claim_job,
+    ensure_job_table,
+    enqueue_job,
+    finish_job,
+    get_job,
+    requeue_stale_jobs,
+)
+from proj2.menu_worker import run_job, run_worker
+
+PARAMS = {"date": "2025-11-03", "meal_numbers": [1, 3], "number_of_days": 1}
+
+
+class FakeGenerator:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def update_plan(self, conn, usr_id, preferences, allergens, date, meal_numbers, number_of_days=1, batch_size=1,
+                    retention_days=None):
+        self.calls.append((usr_id, preferences, allergens, date, meal_numbers, number_of_days))
+        if self.fail:
+            raise RuntimeError("model exploded")
+        meals = [(date, meal_numbers[0], 7)]
+        save_meals(conn, usr_id, meals)
+        return meals
+
+
+@pytest.fixture()
+def db(tmp_path):
+    path = (tmp_path / "jobs.sqlite").as_posix()
+    conn = create_connection(path)
+    execute_query(conn, '''CREATE TABLE "User"(usr_id INTEGER PRIMARY KEY AUTOINCREMENT, preferences TEXT,
+                           allergies TEXT, generated_menu TEXT)''')
+    execute_query(conn, '''INSERT INTO "User"(preferences, allergies, generated_menu) VALUES ('spicy', 'Soy', '')''')
+    execute_query(conn, '''INSERT INTO "User"(preferences, allergies, generated_menu) VALUES ('', '', NULL)''')
+    ensure_job_table(conn)
+    yield path, conn
+    close_connection(conn)
+
+
+def test_enqueue_reuses_identical_queued_job(db):
+    _, conn = db
+    first = enqueue_job(conn, 1, PARAMS)
+    assert enqueue_job(conn, 1, dict(PARAMS)) == first
+    assert enqueue_job(conn, 1, dict(PARAMS, number_of_days=2)) != first
+    job = get_job(conn, first)
+    assert job["status"] == "queued" and job["params"] == PARAMS
+
+
+def test_claim_skips_users_with_a_running_job(db):
+    _, conn = db
+    a = enqueue_job(conn, 1, PARAMS)
+    b = enqueue_job(conn, 1, dict(PARAMS, date="2025-11-04"))
+    c = enqueue_job(conn, 2, PARAMS)
+    assert claim_job(conn, "w1")["job_id"] == a
+    assert claim_job(conn, "w2")["job_id"] == c
+    assert claim_job(conn, "w3") is None
+    finish_job(conn, a)
+    job = claim_job(conn, "w3")
+    assert job["job_id"] == b and job["attempts"] == 1
+    assert get_job(conn, b)["status"] == "running"
+
+
+def test_stale_jobs_are_requeued_then_failed(db):
+    _, conn = db
+    job_id = enqueue_job(conn, 1, PARAMS)
+    claim_job(conn, "dead")
+    assert requeue_stale_jobs(conn, stale_after=60) == 0
+    assert requeue_stale_jobs(conn, stale_after=-1, max_attempts=2) == 1
+    assert get_job(conn, job_id)["status"] == "queued"
+    claim_job(conn, "dead")
+    assert requeue_stale_jobs(conn, stale_after=-1, max_attempts=2) == 1
+    job = get_job(conn, job_id)
+    assert job["status"] == "failed" and job["error"] == "worker stopped"
+
+
+def test_worker_writes_meal_plan(db):
+    path, conn = db
+    done = enqueue_job(conn, 1, PARAMS)
+    generator = FakeGenerator()
+    assert run_worker(path, generator, once=True) == 1
+    assert generator.calls == [(1, "spicy", "Soy", "2025-11-03", [1, 3], 1)]
+    assert fetch_all(conn, 'SELECT usr_id, date, meal, itm_id FROM "MealPlan"') == [(1, "2025-11-03", 1, 7)]
+    job = get_job(conn, done)
+    assert job["status"] == "done" and job["finished_at"] is not None
+
+
+def test_failed_job_records_error(db):
+    _, conn = db
+    job_id = enqueue_job(conn, 1, PARAMS)
+    assert run_job(conn, FakeGenerator(fail=True), claim_job(conn, "w")) == "model exploded"
+    job = get_job(conn, job_id)
+    assert (job["status"], job["error"]) == ("failed", "model exploded")
+
+
+def test_job_uses_the_recommender_it_names(db):
+    path, conn = db
+    llm, scoring = FakeGenerator(), FakeGenerator()
+    built = []
+    generators = {"llm": llm, "scoring": lambda: built.append(1) or scoring}
+    enqueue_job(conn, 1, dict(PARAMS, recommender="scoring"))
+    enqueue_job(conn, 2, PARAMS)
+    assert run_worker(path, generators, once=True) == 2
+    assert [call[0] for call in scoring.calls] == [1] and [call[0] for call in llm.calls] == [2]
+    assert built == [1] and generators["scoring"] is scoring
+
+    job_id = enqueue_job(conn, 1, dict(PARAMS, date="2025-11-05"))
+    assert run_job(conn, {"llm": llm}, claim_job(conn, "w"), default_recommender="scoring") == \
+        "This worker has no 'scoring' recommender"
+    assert get_job(conn, job_id)["status"] == "failed"
+
+
+def test_deleting_a_user_drops_their_jobs(db):
+    _, conn = db
+    job_id = enqueue_job(conn, 2, PARAMS)
+    execute_query(conn, 'DELETE FROM "User" WHERE usr_id = 2')
+    assert get_job(conn, job_id) is None
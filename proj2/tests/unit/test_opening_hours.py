@@ -0,0 +1,47 @@
+import json
+
+from proj2.opening_hours import OpeningHoursIndex, parse_hours
+
+
+def _hours(**days):
+    return json.dumps(days)
+
+
+def test_parse_hours_merges_and_sorts_intervals():
+    parsed = parse_hours(_hours(Mon=[1700, 2100, 1100, 1400, 1300, 1500]))
+    assert parsed["Mon"] == ([1100, 1700], [1500, 2100])
+
+
+def test_parse_hours_treats_empty_odd_and_bad_json_as_closed():
+    assert parse_hours(_hours(Mon=[], Tue=[1100])) == {}
+    assert parse_hours("not json") == {}
+    assert parse_hours(None) == {}
+
+
+def test_open_at_is_inclusive_and_handles_split_shifts():
+    index = OpeningHoursIndex([
+        (1, _hours(Mon=[1100, 1400, 1700, 2100])),
+        (2, _hours(Mon=[800, 1000])),
+        (3, _hours(Tue=[0, 2400])),
+    ])
+    assert index.open_at("Mon", 1100) == {1}
+    assert index.open_at("Mon", 1000) == {2}
+    assert index.open_at("Mon", 1500) == frozenset()
+    assert index.open_at("Mon", 2100) == {1}
+    assert index.open_at("Tue", 1200) == {3}
+    assert index.open_at("Sun", 1200) == frozenset()
+    assert index.is_open(1, "Mon", 1800)
+    assert not index.is_open(2, "Mon", 1800)
+
+
+def test_open_at_matches_linear_scan():
+    rows = [
+        (1, _hours(Mon=[600, 900, 1100, 1500, 1400, 1800])),
+        (2, _hours(Mon=[1000, 2200])),
+        (3, _hours(Mon=[2300, 2400])),
+    ]
+    index = OpeningHoursIndex(rows)
+    for t in range(0, 2401, 50):
+        expected = {rtr_id for rtr_id, hours in rows
+                    if any(o <= t <= c for o, c in zip(json.loads(hours)["Mon"][::2], json.loads(hours)["Mon"][1::2]))}
+        assert index.open_at("Mon", t) == expected
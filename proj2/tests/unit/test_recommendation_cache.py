@@ -0,0 +1,47 @@
+from proj2.catalog_cache import CatalogSnapshot, catalog_fingerprint
+from proj2.recommendation_cache import RecommendationCache, recommendation_key
+
+
+def test_key_ignores_order_case_and_spacing():
+    a = recommendation_key("cat", "Spicy, vegan", "Soy,Peanuts", "Mon", 3)
+    b = recommendation_key("cat", "vegan,spicy,", "peanuts, soy", "Mon", 3)
+    assert a == b
+    assert a != recommendation_key("cat", "vegan,spicy", "peanuts,soy", "Tue", 3)
+    assert a != recommendation_key("cat", "vegan,spicy", "peanuts,soy", "Mon", 2)
+    assert a != recommendation_key("other", "vegan,spicy", "peanuts,soy", "Mon", 3)
+    assert a != recommendation_key("cat", "vegan,spicy", "peanuts,soy", "Mon", 3, mode="ranked:0.0")
+    assert recommendation_key("cat", None, "", "Mon", 1) == recommendation_key("cat", "", None, "Mon", 1)
+
+
+def test_catalog_fingerprint_depends_on_content_only():
+    rows = [{"rtr_id": 1, "name": "A"}], [{"itm_id": 2, "price": 100, "instock": 1}]
+    assert catalog_fingerprint(CatalogSnapshot(1, *rows)) == catalog_fingerprint(CatalogSnapshot(7, *rows))
+    assert catalog_fingerprint(CatalogSnapshot(1, rows[0], [{"itm_id": 2, "price": 101, "instock": 1}])) != catalog_fingerprint(CatalogSnapshot(1, *rows))
+
+
+def test_lru_eviction_and_hit_rate():
+    cache = RecommendationCache(max_size=2)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"hits": 3, "db_hits": 0, "misses": 2, "hit_rate": 0.6, "size": 2}
+
+
+def test_sqlite_persistence_is_shared(tmp_path):
+    path = (tmp_path / "memo.sqlite").as_posix()
+    first = RecommendationCache(db_file=path)
+    second = RecommendationCache(db_file=path)
+    try:
+        first.put("k", 42)
+        assert second.get("k") == 42
+        assert second.get("k") == 42
+        assert second.stats()["db_hits"] == 1
+        first.clear()
+        assert RecommendationCache(db_file=path).get("k") is None
+    finally:
+        first.close()
+        second.close()
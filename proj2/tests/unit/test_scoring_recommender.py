@@ -0,0 +1,106 @@
+import datetime
+import json
+
+import pytest
+
+from proj2.catalog_cache import close_catalog_caches
+from proj2.meal_plan import ensure_meal_plan_table, load_plan
+from proj2.menu_generation import RECOMMENDERS, Recommender, ScoringRecommender, missing_slots
+from proj2.menu_jobs import RECOMMENDER_KINDS
+from proj2.sqlQueries import close_pools, create_connection, close_connection, execute_query
+
+ALL_DAY = json.dumps({day: [0, 2400] for day in ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]})
+ITEMS = [
+    (1, "Spicy Chicken Curry", "Chicken in a hot curry sauce.", 800, None),
+    (2, "Oatmeal", "Warm oats with berries.", 450, None),
+    (3, "Spicy Tofu Bowl", "Tofu, rice and chili.", 700, "Soy"),
+    (4, "Garden Salad", "Fresh greens.", 300, None),
+    (5, "Chocolate Cake", "Rich chocolate layers.", 900, "Dairy"),
+]
+
+
+@pytest.fixture(autouse=True)
+def _cleanup():
+    yield
+    close_catalog_caches()
+    close_pools()
+
+
+@pytest.fixture()
+def db_path(tmp_path):
+    path = (tmp_path / "scoring.sqlite").as_posix()
+    conn = create_connection(path)
+    conn.executescript('''
+        CREATE TABLE "Restaurant" (rtr_id INTEGER PRIMARY KEY, name TEXT, description TEXT, phone TEXT,
+            email TEXT, address TEXT, city TEXT, state TEXT, zip TEXT, hours TEXT, status TEXT);
+        CREATE TABLE "MenuItem" (itm_id INTEGER PRIMARY KEY, rtr_id INTEGER, name TEXT, description TEXT,
+            price INTEGER, calories INTEGER, instock INTEGER, restock TEXT, allergens TEXT);
+        CREATE TABLE "User" (usr_id INTEGER PRIMARY KEY, generated_menu TEXT);
+        INSERT INTO "User"(usr_id) VALUES (1);
+    ''')
+    execute_query(conn, 'INSERT INTO "Restaurant"(rtr_id, name, hours, status) VALUES (1, "Cafe", ?, "Open")', (ALL_DAY,))
+    for itm_id, name, description, calories, allergens in ITEMS:
+        execute_query(conn, '''INSERT INTO "MenuItem"(itm_id, rtr_id, name, description, price, calories, instock, allergens)
+                               VALUES (?, 1, ?, ?, 1000, ?, 1, ?)''', (itm_id, name, description, calories, allergens))
+    ensure_meal_plan_table(conn)
+    close_connection(conn)
+    return path
+
+
+def test_recommender_kinds_match():
+    assert tuple(RECOMMENDERS) == RECOMMENDER_KINDS
+    assert all(issubclass(cls, Recommender) for cls in RECOMMENDERS.values())
+
+
+def test_preferences_then_calories_decide(db_path):
+    scorer = ScoringRecommender(db_file=db_path)
+    assert scorer.plan_slots("spicy chicken", "", [("2025-11-03", "Mon", 3)]) == [1]
+    ## no matching preference: the item closest to the meal's calorie target wins
+    assert scorer.plan_slots("", "", [("2025-11-03", "Mon", 1)]) == [2]
+    assert scorer.plan_slots("tofu", "soy", [("2025-11-03", "Mon", 2)]) != [3]
+
+
+def test_variety_penalty_spreads_picks(db_path):
+    slots = missing_slots(None, "2025-11-03", [3], 3)
+    assert len(set(ScoringRecommender(db_file=db_path).plan_slots("spicy", "", slots))) == 3
+    assert ScoringRecommender(db_file=db_path, variety_penalty=0).plan_slots("spicy chicken", "", slots) == [1, 1, 1]
+
+
+def test_plan_many_and_update_plan(db_path):
+    scorer = ScoringRecommender(db_file=db_path)
+    slots = [("2025-11-03", "Mon", 3)]
+    assert scorer.plan_many([{"preferences": "chocolate", "allergens": "", "slots": slots},
+                             {"preferences": "chocolate", "allergens": "dairy", "slots": slots}])[0] == [5]
+    conn = create_connection(db_path)
+    try:
+        assert scorer.update_plan(conn, 1, "salad", "", "2025-11-03", [2]) == [("2025-11-03", 2, 4)]
+        assert load_plan(conn, 1) == {"2025-11-03": [{"itm_id": 4, "meal": 2}]}
+    finally:
+        close_connection(conn)
+
+
+def test_no_candidates_is_an_error(db_path):
+    conn = create_connection(db_path)
+    execute_query(conn, 'UPDATE "Restaurant" SET status = "Closed"')
+    close_connection(conn)
+    with pytest.raises(RuntimeError):
+        ScoringRecommender(db_file=db_path).plan_slots("", "", [("2025-11-03", "Mon", 3)])
+
+
+def test_update_plan_extends_incrementally_and_prunes(db_path):
+    scorer = ScoringRecommender(db_file=db_path)
+    today = datetime.date.today()
+    days = [(today + datetime.timedelta(days=n)).isoformat() for n in range(4)]
+    conn = create_connection(db_path)
+    try:
+        old = (today - datetime.timedelta(days=100)).isoformat()
+        execute_query(conn, 'INSERT INTO "MealPlan"(usr_id, date, meal, itm_id) VALUES (1, ?, 3, 1)', (old,))
+        first = scorer.update_plan(conn, 1, "", "", days[0], [1, 3], 3)
+        assert [(day, meal) for day, meal, _ in first] == [(d, m) for d in days[:3] for m in (1, 3)]
+        ## one more day: only its two meals are planned and returned
+        added = scorer.update_plan(conn, 1, "", "", days[0], [1, 3], 4, retention_days=90)
+        assert [(day, meal) for day, meal, _ in added] == [(days[3], 1), (days[3], 3)]
+        assert scorer.update_plan(conn, 1, "", "", days[0], [1, 3], 4) == []
+        assert list(load_plan(conn, 1)) == days
+    finally:
+        close_connection(conn)
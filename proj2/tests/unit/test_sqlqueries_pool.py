@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from proj2.sqlQueries import ConnectionPool, get_pool, close_pools, execute_query, fetch_one
+
+
+def test_pool_reuses_released_connection(tmp_path):
+    pool = ConnectionPool((tmp_path / "pool.sqlite").as_posix(), max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    pool.close_all()
+
+
+def test_pool_applies_profile_on_creation(tmp_path):
+    pool = ConnectionPool((tmp_path / "pool.sqlite").as_posix(), profile={"foreign_keys": "ON"})
+    with pool.connection() as conn:
+        assert fetch_one(conn, "PRAGMA foreign_keys") == (1,)
+    pool.close_all()
+
+
+def test_pool_times_out_when_exhausted(tmp_path):
+    pool = ConnectionPool((tmp_path / "pool.sqlite").as_posix(), max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    try:
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+    finally:
+        pool.release(conn)
+    pool.close_all()
+
+
+def test_pool_waiter_gets_connection_on_release(tmp_path):
+    pool = ConnectionPool((tmp_path / "pool.sqlite").as_posix(), max_size=1, timeout=2)
+    conn = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    pool.release(conn)
+    waiter.join(timeout=2)
+    assert got == [conn]
+    pool.release(got[0])
+    pool.close_all()
+
+
+def test_pool_replaces_unhealthy_connection(tmp_path):
+    pool = ConnectionPool((tmp_path / "pool.sqlite").as_posix(), max_size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.close()  # simulate a connection that died while idle
+    with pool.connection() as fresh:
+        assert fresh is not conn
+        assert fetch_one(fresh, "SELECT 1") == (1,)
+    pool.close_all()
+
+
+def test_pool_rolls_back_open_transaction_on_release(tmp_path):
+    pool = ConnectionPool((tmp_path / "pool.sqlite").as_posix(), max_size=1)
+    with pool.connection() as conn:
+        execute_query(conn, "CREATE TABLE T(a INTEGER)")
+        conn.execute("INSERT INTO T(a) VALUES (1)")  # left uncommitted on purpose
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (0,)
+    pool.close_all()
+
+
+def test_get_pool_is_shared_per_database(tmp_path):
+    path = (tmp_path / "shared.sqlite").as_posix()
+    try:
+        assert get_pool(path) is get_pool(path)
+        assert get_pool(path) is not get_pool((tmp_path / "other.sqlite").as_posix())
+    finally:
+        close_pools()
+
+
+def test_pool_frees_slot_when_open_fails(tmp_path):
+    pool = ConnectionPool((tmp_path / "pool.sqlite").as_posix(), max_size=1, timeout=0.05,
+                          profile={"foreign_keys": "ON; SELECT 1"})
+    for _ in range(2):
+        with pytest.raises(Exception):
+            pool.acquire()
+    assert pool._borrowed == 0
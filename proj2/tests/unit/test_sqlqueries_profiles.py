@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from proj2.sqlQueries import (
+    ConnectionPool,
+    CheckpointScheduler,
+    close_pools,
+    create_connection,
+    close_connection,
+    execute_query,
+    fetch_one,
+    resolve_db_profile,
+)
+
+
+def test_concurrent_profile_enables_wal_and_busy_timeout(tmp_path):
+    conn = create_connection((tmp_path / "wal.sqlite").as_posix(), profile="concurrent")
+    try:
+        assert fetch_one(conn, "PRAGMA journal_mode") == ("wal",)
+        assert fetch_one(conn, "PRAGMA busy_timeout") == (5000,)
+        assert fetch_one(conn, "PRAGMA synchronous") == (1,)  # NORMAL
+        assert fetch_one(conn, "PRAGMA temp_store") == (2,)  # MEMORY
+    finally:
+        close_connection(conn)
+
+
+def test_default_profile_keeps_rollback_journal(tmp_path):
+    conn = create_connection((tmp_path / "plain.sqlite").as_posix(), profile="default")
+    try:
+        assert fetch_one(conn, "PRAGMA journal_mode") == ("delete",)
+    finally:
+        close_connection(conn)
+
+
+def test_pool_applies_profile_dict(tmp_path):
+    pool = ConnectionPool((tmp_path / "p.sqlite").as_posix(), profile={"cache_size": -4000})
+    with pool.connection() as conn:
+        assert fetch_one(conn, "PRAGMA cache_size") == (-4000,)
+    pool.close_all()
+
+
+def test_unknown_profile_raises():
+    with pytest.raises(ValueError):
+        resolve_db_profile("does-not-exist")
+
+
+def test_checkpoint_truncates_large_wal(tmp_path):
+    path = (tmp_path / "ckpt.sqlite").as_posix()
+    conn = create_connection(path, profile="concurrent")
+    try:
+        execute_query(conn, "CREATE TABLE T(a TEXT)")
+        for _ in range(50):
+            execute_query(conn, "INSERT INTO T(a) VALUES (?)", ("x" * 1000,))
+        assert os.path.getsize(path + "-wal") > 0
+
+        scheduler = CheckpointScheduler(path, truncate_bytes=0)
+        busy, _, _ = scheduler.checkpoint()
+        assert busy == 0
+        assert os.path.getsize(path + "-wal") == 0
+    finally:
+        close_connection(conn)
+        close_pools()
+
+
+def test_checkpoint_skips_missing_database(tmp_path):
+    scheduler = CheckpointScheduler((tmp_path / "missing.sqlite").as_posix())
+    assert scheduler.checkpoint() is None
+
+
+def test_checkpoint_scheduler_start_stop(tmp_path):
+    path = (tmp_path / "bg.sqlite").as_posix()
+    close_connection(create_connection(path, profile="concurrent"))
+    scheduler = CheckpointScheduler(path, interval=0.01)
+    scheduler.start()
+    try:
+        scheduler._stop.wait(0.1)
+    finally:
+        scheduler.stop()
+        close_pools()
+    assert scheduler.last_result is not None
+
+
+def test_every_profile_enforces_foreign_keys(tmp_path):
+    for name in ("default", "concurrent"):
+        conn = create_connection((tmp_path / f"{name}.sqlite").as_posix(), profile=name)
+        try:
+            assert fetch_one(conn, "PRAGMA foreign_keys") == (1,)
+        finally:
+            close_connection(conn)
+
+
+def test_pool_raises_when_wal_cannot_be_enabled():
+    pool = ConnectionPool(":memory:", profile="concurrent")
+    with pytest.raises(Exception):
+        pool.acquire()
+    assert pool._borrowed == 0
@@ -0,0 +1,129 @@
+import sqlite3
+
+import pytest
+
+from proj2.sqlQueries import (
+    create_connection,
+    close_connection,
+    execute_query,
+    execute_returning_id,
+    fetch_all,
+    fetch_one,
+    transaction,
+)
+
+
+@pytest.fixture()
+def conn(tmp_path):
+    c = create_connection((tmp_path / "tx.sqlite").as_posix())
+    execute_query(c, "CREATE TABLE T(id INTEGER PRIMARY KEY AUTOINCREMENT, a TEXT)")
+    yield c
+    close_connection(c)
+
+
+def test_reads_do_not_leave_or_commit_a_transaction(conn):
+    assert fetch_all(conn, "SELECT * FROM T") == []
+    assert not conn.in_transaction
+
+
+def test_write_outside_transaction_is_committed(conn):
+    execute_query(conn, "INSERT INTO T(a) VALUES (?)", ("x",))
+    assert not conn.in_transaction
+
+
+def test_execute_returning_id_uses_lastrowid(conn):
+    first = execute_returning_id(conn, "INSERT INTO T(a) VALUES (?)", ("x",))
+    second = execute_returning_id(conn, "INSERT INTO T(a) VALUES (?)", ("y",))
+    assert (first, second) == (1, 2)
+    assert fetch_one(conn, "SELECT a FROM T WHERE id = ?", (second,)) == ("y",)
+
+
+def test_execute_returning_id_returns_none_on_error(conn):
+    assert execute_returning_id(conn, 'INSERT INTO "Missing"(a) VALUES (1)') is None
+
+
+def test_transaction_commits_on_success(conn):
+    with transaction(conn):
+        execute_query(conn, "INSERT INTO T(a) VALUES ('x')")
+        execute_query(conn, "INSERT INTO T(a) VALUES ('y')")
+        assert conn.in_transaction
+    assert not conn.in_transaction
+    assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (2,)
+
+
+def test_transaction_rolls_back_on_exception(conn):
+    with pytest.raises(RuntimeError):
+        with transaction(conn):
+            execute_query(conn, "INSERT INTO T(a) VALUES ('x')")
+            raise RuntimeError("boom")
+    assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (0,)
+
+
+def test_transaction_rolls_back_and_raises_when_a_statement_fails(conn):
+    with pytest.raises(sqlite3.DatabaseError):
+        with transaction(conn):
+            new_id = execute_returning_id(conn, "INSERT INTO T(a) VALUES ('x')")
+            assert new_id == 1
+            assert execute_query(conn, "NOT VALID SQL") is None
+    assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (0,)
+    assert not conn.in_transaction
+
+
+def test_read_only_transaction_never_commits(conn):
+    execute_query(conn, "INSERT INTO T(a) VALUES ('x')")
+    with pytest.raises(sqlite3.DatabaseError):
+        with transaction(conn, read_only=True):
+            assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (1,)
+            execute_query(conn, "INSERT INTO T(a) VALUES ('y')")
+    assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (1,)
+
+
+def test_nested_transaction_joins_outer(conn):
+    with transaction(conn):
+        with transaction(conn):
+            execute_query(conn, "INSERT INTO T(a) VALUES ('x')")
+        assert conn.in_transaction
+    assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (1,)
+
+
+def test_write_transaction_inside_read_only_is_rejected(conn):
+    with transaction(conn, read_only=True):
+        with pytest.raises(sqlite3.ProgrammingError):
+            with transaction(conn):
+                pass
+    assert not conn.in_transaction
+
+
+def test_read_only_block_inside_write_transaction_rejects_writes(conn):
+    with pytest.raises(sqlite3.DatabaseError):
+        with transaction(conn):
+            execute_query(conn, "INSERT INTO T(a) VALUES ('x')")
+            with transaction(conn, read_only=True):
+                assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (1,)
+                execute_query(conn, "INSERT INTO T(a) VALUES ('y')")
+    assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (0,)
+
+
+def test_failed_write_outside_transaction_releases_lock(conn, tmp_path):
+    execute_query(conn, "CREATE UNIQUE INDEX t_a ON T(a)")
+    execute_query(conn, "INSERT INTO T(a) VALUES ('x')")
+    assert execute_query(conn, "INSERT INTO T(a) VALUES ('x')") is None
+    assert not conn.in_transaction
+
+    other = sqlite3.connect((tmp_path / "tx.sqlite").as_posix(), timeout=0)
+    try:
+        other.execute("INSERT INTO T(a) VALUES ('y')")
+        other.commit()
+    finally:
+        other.close()
+    with transaction(conn):
+        execute_query(conn, "INSERT INTO T(a) VALUES ('z')")
+    assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (3,)
+
+
+def test_pending_implicit_transaction_is_committed_before_begin(conn):
+    conn.execute("INSERT INTO T(a) VALUES ('raw')")
+    assert conn.in_transaction
+    with transaction(conn):
+        execute_query(conn, "INSERT INTO T(a) VALUES ('x')")
+    assert fetch_one(conn, "SELECT COUNT(*) FROM T") == (2,)
@@ -0,0 +1,72 @@
+# scripts/bench_allergens.py
+"""
+Benchmark: row-by-row allergen filtering (the original filter_allergens) against the
+bitmask index in proj2/allergens.py.
+
+    python scripts/bench_allergens.py [--items 5000] [--repeat 20]
+"""
+import argparse
+import pathlib
+import random
+import sys
+import timeit
+
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from proj2.allergens import AllergenVocabulary, allergen_free  # noqa: E402
+
+ALLERGENS = ["Coconut", "Dairy", "Egg", "Fish", "Gluten", "Nuts", "Peanuts", "Pork", "Poultry",
+             "Sesame", "Shellfish", "Soy", "Vinegar"]
+
+
+def filter_allergens_iterrows(menu_items: pd.DataFrame, allergens: str) -> pd.DataFrame:
+    """The original implementation: iterrows() plus one drop() per excluded row."""
+    for index, rows in menu_items.iterrows():
+        if rows["allergens"] is not None:
+            item_allergens = rows['allergens'].split(',')
+            if any(allergen in item_allergens for allergen in allergens.split(',')):
+                menu_items.drop(index, inplace=True)
+    return menu_items
+
+
+def make_items(n: int) -> pd.DataFrame:
+    rng = random.Random(510)
+    return pd.DataFrame({
+        "itm_id": range(1, n + 1),
+        "allergens": [",".join(rng.sample(ALLERGENS, rng.randint(0, 3))) for _ in range(n)],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    user_allergens = "Peanuts,Shellfish"
+
+    vocabulary = AllergenVocabulary()
+    items["allergen_mask"] = vocabulary.encode(items["allergens"])
+    masks = items["allergen_mask"].to_numpy()
+
+    expected = filter_allergens_iterrows(items.copy(), user_allergens)["itm_id"].tolist()
+    actual = items[allergen_free(masks, vocabulary.mask(user_allergens))]["itm_id"].tolist()
+    assert actual == expected, "bitmask filter disagrees with the row-by-row filter"
+
+    legacy_runs = max(1, args.repeat // 10)
+    legacy = timeit.timeit(lambda: filter_allergens_iterrows(items.copy(), user_allergens), number=legacy_runs) / legacy_runs
+    bitmask = timeit.timeit(lambda: items[allergen_free(masks, vocabulary.mask(user_allergens))], number=args.repeat) / args.repeat
+    encode = timeit.timeit(lambda: AllergenVocabulary().encode(items["allergens"]), number=1)
+
+    print(f"{args.items} items, excluding {user_allergens!r}")
+    print(f"  iterrows + drop : {legacy * 1000:9.2f} ms/call")
+    print(f"  bitmask AND     : {bitmask * 1000:9.2f} ms/call  ({legacy / bitmask:,.0f}x faster)")
+    print(f"  one-time encode : {encode * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
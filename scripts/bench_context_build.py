@@ -0,0 +1,80 @@
+# scripts/bench_context_build.py
+"""
+Benchmark: building the CSV context block by concatenating one DataFrame row at a time (the original
+MenuGenerator.__get_context) against joining the per-item lines cached by context_lines().
+
+    python scripts/bench_context_build.py [--items 5000] [--choices 10,100,1000] [--repeat 50]
+"""
+import argparse
+import pathlib
+import random
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from proj2.context_packer import CONTEXT_HEADER, context_lines  # noqa: E402
+from proj2.menu_generation import limit_scope  # noqa: E402
+
+
+def build_context_concat(menu_items: pd.DataFrame, pool: np.ndarray, choices) -> tuple:
+    """The original implementation: iloc lookup and string += per chosen item."""
+    context_data = "item_id,name,description,price,calories\n"
+    item_ids = []
+    for x in choices:
+        row = menu_items.iloc[pool[x]]
+        context_data += f"{row['itm_id']},{row['name']},{row['description']},{row['price']},{row['calories']}\n"
+        item_ids.append(row['itm_id'])
+    return context_data, item_ids
+
+
+def build_context_join(lines: np.ndarray, ids: np.ndarray, pool: np.ndarray, choices) -> tuple:
+    """The cached implementation: fancy-index the precomputed lines and join once."""
+    rows = pool[list(choices)]
+    return CONTEXT_HEADER + "".join(lines[rows]), ids[rows].tolist()
+
+
+def make_items(n: int) -> pd.DataFrame:
+    rng = random.Random(510)
+    return pd.DataFrame({
+        "itm_id": range(1, n + 1),
+        "name": [f"Item {i}" for i in range(1, n + 1)],
+        "description": [rng.choice(["Grilled salmon glazed with teriyaki sauce.",
+                                    "Romaine lettuce, parmesan cheese, croutons, and Caesar dressing."])
+                        for _ in range(n)],
+        "price": [rng.randint(500, 2500) for _ in range(n)],
+        "calories": [rng.randint(200, 900) for _ in range(n)],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--choices", type=str, default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    pool = np.arange(len(items))
+    start = timeit.default_timer()
+    lines = context_lines(items)
+    ids = items["itm_id"].to_numpy()
+    cache = timeit.default_timer() - start
+
+    print(f"{args.items} items, line cache built once in {cache * 1000:.1f} ms")
+    print(f"  {'choices':>7} {'concat ms':>10} {'join ms':>9} {'speed-up':>9}")
+    for num_choices in (int(n) for n in args.choices.split(",")):
+        choices = list(limit_scope(pool, num_choices))
+        ## identical output wherever no field needs CSV quoting (the commas here are quoted by the cache)
+        assert build_context_join(lines, ids, pool, choices)[1] == build_context_concat(items, pool, choices)[1]
+        concat = timeit.timeit(lambda: build_context_concat(items, pool, choices), number=args.repeat) / args.repeat
+        join = timeit.timeit(lambda: build_context_join(lines, ids, pool, choices), number=args.repeat) / args.repeat
+        print(f"  {num_choices:7d} {concat * 1000:10.3f} {join * 1000:9.3f} {concat / join:8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# scripts/bench_llm_precision.py
+"""
+Benchmark: generation throughput and memory of the default model in each llm_toolkit precision
+(fp32, bf16, int8). Each mode runs in its own process so resident memory is not shared between modes.
+Needs torch/transformers and the model weights.
+
+    python scripts/bench_llm_precision.py [--modes fp32,bf16,int8] [--repeat 3] [--tokens 64] [--threads N]
+"""
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import proj2.llm_toolkit as llm_toolkit  # noqa: E402
+
+CONTEXT = "You are a helpful restaurant assistant. Answer briefly."
+PROMPT = "Describe a balanced high protein, low carb dinner in three sentences."
+
+
+def resident_mb() -> float:
+    """Current resident set size of this process in MiB (Linux), or peak RSS elsewhere."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_mode(precision: str, repeat: int, tokens: int, threads) -> dict:
+    """Loads the model in one precision and measures it; runs inside the child process."""
+    before = resident_mb()
+    start = time.perf_counter()
+    llm = llm_toolkit.LLM(tokens=tokens, precision=precision, num_threads=threads)
+    load_time = time.perf_counter() - start
+    loaded = resident_mb()
+    llm.generate(CONTEXT, PROMPT)  # warm-up
+    llm.generated_tokens = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        llm.generate(CONTEXT, PROMPT)
+    elapsed = time.perf_counter() - start
+    return {"precision": precision, "device": llm.device, "load_s": load_time,
+            "tokens_per_s": llm.generated_tokens / elapsed, "model_mb": loaded - before,
+            "rss_mb": resident_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", default=",".join(llm_toolkit.PRECISIONS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.repeat, args.tokens, args.threads)))
+        return
+
+    print(f"{llm_toolkit.DEFAULT_MODEL}, {args.repeat} runs of {args.tokens} tokens")
+    print(f"  {'mode':6} {'device':6} {'load s':>7} {'tok/s':>8} {'model MiB':>10} {'RSS MiB':>8}")
+    for mode in args.modes.split(","):
+        command = [sys.executable, __file__, "--child", mode, "--repeat", str(args.repeat), "--tokens", str(args.tokens)]
+        if args.threads:
+            command += ["--threads", str(args.threads)]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"  {mode:6} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}")
+            continue
+        row = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"  {row['precision']:6} {row['device']:6} {row['load_s']:7.1f} {row['tokens_per_s']:8.1f} "
+              f"{row['model_mb']:10.0f} {row['rss_mb']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# scripts/bench_llm_rank.py
+"""
+Benchmark: picking a menu item with LLM.generate (free text + regex) against LLM.rank
+(one scoring pass over the offered item ids). Needs torch/transformers and the model weights.
+
+    python scripts/bench_llm_rank.py [--repeat 5] [--tokens 500]
+"""
+import argparse
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import proj2.llm_toolkit as llm_toolkit  # noqa: E402
+import proj2.menu_generation as menu_generation  # noqa: E402
+
+CONTEXT = '''item_id,name,description,price,calories
+262,Kimchi Fried Rice,Fried rice with kimchi, vegetables, and a fried egg.,1400,650
+110,Chicken Pot Pie,Flaky crust filled with chicken, vegetables, and a creamy sauce.,1600,700
+235,Crispy Brussels Sprouts,Crispy Brussels sprouts with balsamic glaze and parmesan cheese.,1200,450
+74,Sweet Potato Fries,Crispy sweet potato fries with a sprinkle of sea salt.,750,320
+186,Pan-Seared Duck Breast,Pan-seared duck breast with cherry reduction and wild rice pilaf.,3200,750
+107,Pan-Seared Salmon,Pan-seared salmon with roasted vegetables and balsamic glaze.,2000,550
+252,Fried Green Tomatoes,Fried green tomatoes with remoulade sauce.,1000,350
+175,Arancini,Fried risotto balls filled with mozzarella and meat ragu.,800,400
+70,Potato Salad,Classic potato salad with mayonnaise, mustard, and celery.,600,350
+195,Seasonal Fruit Tart,Pastry tart filled with seasonal fruit and pastry cream.,1200,400
+'''
+CANDIDATES = [262, 110, 235, 74, 186, 107, 252, 175, 70, 195]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tokens", type=int, default=500)
+    args = parser.parse_args()
+
+    prompt = (menu_generation.PROMPT_TEMPLATE.replace("{preferences}", "high protein,low carb")
+              .replace("{meal}", "dinner").replace("{context}", CONTEXT))
+    llm = llm_toolkit.LLM(tokens=args.tokens)
+    llm.generate(menu_generation.SYSTEM_TEMPLATE, prompt)  # warm-up
+
+    valid = 0
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        output = menu_generation.format_llm_output(llm.generate(menu_generation.SYSTEM_TEMPLATE, prompt))
+        valid += output in CANDIDATES
+    generate_time = (time.perf_counter() - start) / args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        scores = llm.rank(menu_generation.SYSTEM_TEMPLATE, prompt, CANDIDATES)
+    rank_time = (time.perf_counter() - start) / args.repeat
+    best = menu_generation.pick_by_scores(CANDIDATES, scores)
+
+    print(f"{len(CANDIDATES)} candidates, {args.repeat} runs, device={llm.device}")
+    print(f"  generate : {generate_time:8.3f} s/pick, {valid}/{args.repeat} valid answers")
+    print(f"  rank     : {rank_time:8.3f} s/pick, always valid (argmax {best})  {generate_time / rank_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
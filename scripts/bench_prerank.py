@@ -0,0 +1,66 @@
+# scripts/bench_prerank.py
+"""
+Benchmark: how many of the ITEM_CHOICES items offered to the LLM match the user's preferences when
+they are a random sample (limit_scope) versus the TF-IDF top-k of proj2/item_index.py, and what the
+ranking costs. Runs on the catalog of the project database; no model needed.
+
+    python scripts/bench_prerank.py [--db proj2/CSC510_DB.db] [--repeat 200]
+"""
+import argparse
+import pathlib
+import sys
+import timeit
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from proj2.catalog_cache import get_catalog  # noqa: E402
+from proj2.item_index import ItemIndex, tokenize  # noqa: E402
+from proj2.menu_generation import ITEM_CHOICES, limit_scope  # noqa: E402
+
+PREFERENCES = ["spicy", "vegan", "chicken", "seafood, shrimp", "cheese", "pasta", "salad, fresh",
+               "beef", "chocolate, dessert", "rice, curry"]
+
+
+def relevant(terms: set, text_terms: list) -> bool:
+    return bool(terms.intersection(text_terms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=str(ROOT / "proj2" / "CSC510_DB.db"))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    items = [item for item in get_catalog(args.db).items if item["instock"] == 1]
+    texts = [f"{item['name']} {item['description'] or ''}" for item in items]
+    item_terms = [tokenize(text) for text in texts]
+    pool = np.arange(len(items))
+
+    start = timeit.default_timer()
+    index = ItemIndex(texts)
+    build = timeit.default_timer() - start
+
+    print(f"{len(items)} items, {len(index.vocabulary)} terms, index built in {build * 1000:.1f} ms")
+    print(f"  {'preferences':20} {'matching':>8} {'random':>7} {'top-k':>6}")
+    random_total = ranked_total = 0
+    for preferences in PREFERENCES:
+        terms = set(tokenize(preferences))
+        matching = sum(relevant(terms, t) for t in item_terms)
+        random_hits = np.mean([sum(relevant(terms, item_terms[pool[x]]) for x in limit_scope(pool, ITEM_CHOICES))
+                               for _ in range(args.repeat)])
+        ranked_hits = sum(relevant(terms, item_terms[row]) for row in index.rank(pool, preferences)[:ITEM_CHOICES])
+        random_total += random_hits
+        ranked_total += ranked_hits
+        print(f"  {preferences:20} {matching:8d} {random_hits:7.2f} {ranked_hits:6d}")
+    print(f"  offered items matching the preferences: random {random_total / len(PREFERENCES):.2f}, "
+          f"top-k {ranked_total / len(PREFERENCES):.2f} of {ITEM_CHOICES}")
+
+    rank = timeit.timeit(lambda: index.rank(pool, "spicy vegan curry"), number=args.repeat) / args.repeat
+    print(f"  rank whole pool: {rank * 1000:.3f} ms/call")
+
+
+if __name__ == "__main__":
+    main()